@@ -0,0 +1,276 @@
+"""
+Benchmark suite for SDE loading, chain expansion, scheduler planning and reaction pricing.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py                     # run everything, write results JSON
+    python benchmarks/run_benchmarks.py --only chain_eris   # run a subset (substring match)
+    python benchmarks/run_benchmarks.py --compare base.json new.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(REPO_ROOT, 'benchmarks', 'fixtures')
+RESULTS_FOLDER = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+DEFAULT_SDE = os.path.join(REPO_ROOT, 'static_data')
+
+# The scheduler and reaction modules import their siblings by bare name
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scheduler'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'reactions'))
+sys.path.insert(0, REPO_ROOT)
+
+# Fixed product sets, by typeID so they don't depend on name spelling
+PRODUCTS = {
+    'rifter': 587,      # T1 frigate
+    'eris': 22460,      # T2 interdictor (manufacturing + reactions chain)
+    'naglfar': 19722,   # capital
+}
+BATCH_ROUNDS = 5        # times each product is expanded in the batch throughput benchmark
+PRICE_SEED = 20250101
+FORGE_ORDERS = 300_000  # roughly The Forge's order book at Jita 4-4
+FORGE_TYPES = 15_000
+
+
+def quiet(fn, *args, **kwargs):
+    """Runs fn with stdout discarded (the engines print progress per node)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return {
+        'unit': 's',
+        'repeat': repeat,
+        'min': min(durations),
+        'median': statistics.median(durations),
+        'mean': statistics.fmean(durations),
+        'max': max(durations),
+    }
+
+
+def synthetic_prices(type_ids, seed=PRICE_SEED):
+    """Deterministic select_hub_prices()-shaped table with log-uniform prices and a realistic spread."""
+    rng = np.random.default_rng(seed)
+    type_ids = np.unique(np.asarray(type_ids, dtype=np.int64))
+    sell = np.exp(rng.uniform(np.log(1.0), np.log(5e8), len(type_ids)))
+    buy = sell * rng.uniform(0.7, 0.99, len(type_ids))
+    return pd.DataFrame({'input_sell': sell, 'input_buy': buy, 'output_buy': buy, 'output_sell': sell},
+                        index=pd.Index(type_ids, name='type_id'))
+
+
+def synthetic_orders(hubs, orders=FORGE_ORDERS, types=FORGE_TYPES, seed=PRICE_SEED):
+    """Deterministic order rows (location, type, is_buy, price, volume) at the first hub, shaped like an order book."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([np.full(orders, hubs[0][2]), rng.integers(0, types, orders), rng.random(orders) < 0.4,
+                            np.exp(rng.uniform(np.log(1.0), np.log(5e8), orders)),
+                            rng.integers(1, 100_000, orders)]).astype(np.float64)
+
+
+def load_asset_snapshot():
+    with open(os.path.join(FIXTURES, 'asset_snapshot.json'), 'r') as f:
+        snapshot = json.load(f)
+    snapshot['assets'] = {int(type_id): qty for type_id, qty in snapshot['assets'].items()}
+    return snapshot
+
+
+def bench_cold_start(sde_path, repeat, store=False):
+    """
+    Fresh interpreter: import the loader and load the SDE (pandas SdeLoader), or with store=True
+    load the compiled store and expand the Eris chain, as chain_query.py does.
+    """
+    code = f"import sys; sys.path.insert(0, {os.path.join(REPO_ROOT, 'scheduler')!r}); "
+    if store:
+        code += (f"from sde_store import load_sde; from dependency_calculator import DependencyCalculator; "
+                 f"sde = load_sde({sde_path!r}); "
+                 f"DependencyCalculator(sde).get_total_requirements(sde.get_type_name({PRODUCTS['eris']}), 1)")
+    else:
+        code += f"from sde_loader import SdeLoader; SdeLoader({sde_path!r})"
+
+    def run():
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL)
+    return measure(run, repeat, warmup=0)
+
+
+def run_benchmarks(sde_path, repeat, only=None):
+    from sde_loader import SdeLoader
+    from dependency_calculator import DependencyCalculator
+    from industrial_scheduler import IndustrialScheduler
+    from main import IndustryCalculator
+    from profit_engine import ProfitEngine
+
+    results = {}
+
+    def selected(name):
+        return not only or any(pattern in name for pattern in only)
+
+    def record(name, fn, runs=repeat, **extra):
+        if not selected(name):
+            return
+        print(f"  {name} ...", end='', flush=True)
+        results[name] = {**measure(fn, runs), **extra}
+        print(f" median {results[name]['median'] * 1000:.2f} ms")
+
+    if selected('cold_start'):
+        print("  cold_start ...", end='', flush=True)
+        results['cold_start'] = bench_cold_start(sde_path, max(3, repeat // 2))
+        print(f" median {results['cold_start']['median'] * 1000:.2f} ms")
+
+    if selected('cold_start_store'):
+        from sde_store import load_sde
+        quiet(load_sde, sde_path)  # compiles the store once if it is missing or stale
+        print("  cold_start_store ...", end='', flush=True)
+        results['cold_start_store'] = bench_cold_start(sde_path, max(3, repeat // 2), store=True)
+        print(f" median {results['cold_start_store']['median'] * 1000:.2f} ms")
+
+    record('sde_load', lambda: quiet(SdeLoader, sde_path), runs=max(3, repeat // 2))
+    sde = quiet(SdeLoader, sde_path)
+    calculator = IndustryCalculator(data_path=sde_path)
+    names = {key: sde.get_type_name(type_id) for key, type_id in PRODUCTS.items()}
+
+    # Per-chain latency
+    for key, name in names.items():
+        record(f'chain_{key}', lambda name=name: quiet(calculator.calculate_production_chain, name, 1))
+        dep_calc = DependencyCalculator(sde)
+        record(f'requirements_{key}', lambda name=name: quiet(dep_calc.get_total_requirements, name, 1))
+
+    # Name lookups: a partial name resolved, and suggestions for a misspelled one (fuzzy index prebuilt)
+    index = sde.name_index
+    index.build_trigrams()
+    partial = names['eris'].lower()
+    typo = names['eris'][1::-1] + names['eris'][2:]
+    record('name_resolve', lambda: index.resolve(partial), runs=repeat * 10)
+    record('name_suggest', lambda: index.suggest(typo), runs=repeat * 10, names=len(index))
+
+    # Batch throughput: every product, several rounds, one DependencyCalculator
+    def batch():
+        dep_calc = DependencyCalculator(sde)
+        for _ in range(BATCH_ROUNDS):
+            for name in names.values():
+                quiet(dep_calc.get_total_requirements, name, 1)
+    chains = BATCH_ROUNDS * len(names)
+    record('batch_requirements', batch, runs=max(1, repeat // 2), chains=chains)
+    if 'batch_requirements' in results:
+        results['batch_requirements']['chains_per_second'] = chains / results['batch_requirements']['median']
+
+    # Scheduler planning against the recorded asset snapshot (no ESI access)
+    snapshot = load_asset_snapshot()
+
+    inventory = {sde.get_type_name(t): q for t, q in snapshot['assets'].items()}
+    target = sde.get_type_name(snapshot['target']['type_id'])
+
+    def plan():
+        scheduler = IndustrialScheduler(sde, use_esi=False)
+        quiet(scheduler.plan, target, snapshot['target']['quantity'], inventory, 9, 9, 9)
+    record('scheduler_plan', plan)
+
+    # Reaction profitability: engine build (once per SDE) and recompute (once per price refresh)
+    reactions = sde.inv_types.reset_index()
+    reaction_ids = sde.industry_activity.loc[sde.industry_activity['activityID'] == 11, 'typeID']
+    reactions = reactions[reactions['typeID'].isin(reaction_ids)][['typeID', 'typeName']]
+    prices = synthetic_prices(np.concatenate([sde.activity_materials['materialTypeID'].to_numpy(),
+                                              sde.activity_products['productTypeID'].to_numpy()]))
+
+    def build_engine():
+        return ProfitEngine(reactions, sde.industry_activity, sde.activity_materials, sde.activity_products)
+    record('reaction_engine_build', build_engine)
+    engine = build_engine()
+    record('reaction_recompute', lambda: engine.compute(prices, 0.035, 0.025), runs=repeat * 10,
+           reactions=len(engine))
+
+    # Market statistics (best, VWAP, percentile, depth) over a Forge-sized order book
+    from calculator import MARKET_HUBS, order_statistics
+    orders = synthetic_orders(MARKET_HUBS)
+    record('market_stats', lambda: order_statistics(orders, MARKET_HUBS), orders=len(orders))
+
+    # Attaching to the published price snapshot (what every price consumer does instead of parsing JSON)
+    if selected('price_snapshot_attach'):
+        import tempfile
+        from price_snapshot import PriceSnapshot, publish
+        with tempfile.TemporaryDirectory() as folder:
+            path = publish(order_statistics(orders, MARKET_HUBS), os.path.join(folder, 'prices.bin'), 0.05)
+            record('price_snapshot_attach', lambda: PriceSnapshot(path).to_frame())
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base_path, new_path):
+    """Prints median timings of two result files side by side."""
+    with open(base_path, 'r') as f:
+        base = json.load(f)
+    with open(new_path, 'r') as f:
+        new = json.load(f)
+    print(f"{'Benchmark':<26} | {'Base (ms)':>12} | {'New (ms)':>12} | {'Change':>8}")
+    print("-" * 68)
+    for name in sorted(set(base['benchmarks']) | set(new['benchmarks'])):
+        old_b, new_b = base['benchmarks'].get(name), new['benchmarks'].get(name)
+        if not old_b or not new_b:
+            print(f"{name:<26} | {'-' if not old_b else old_b['median'] * 1000:>12} | "
+                  f"{'-' if not new_b else new_b['median'] * 1000:>12} |")
+            continue
+        change = (new_b['median'] / old_b['median'] - 1) * 100
+        print(f"{name:<26} | {old_b['median'] * 1000:>12.2f} | {new_b['median'] * 1000:>12.2f} | {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the industry planning and pricing engines.")
+    parser.add_argument('--sde', default=DEFAULT_SDE, help="SDE folder (needs invTypes.csv)")
+    parser.add_argument('--repeat', type=int, default=10, help="Timed runs per benchmark")
+    parser.add_argument('--only', nargs='*', help="Only run benchmarks whose name contains one of these")
+    parser.add_argument('--output', help="Results JSON path [Default: benchmarks/results/<commit>-<time>.json]")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="Compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    print("--- Running benchmarks ---")
+    started = datetime.now(timezone.utc)
+    benchmarks = run_benchmarks(args.sde, args.repeat, args.only)
+    commit = git_commit()
+    output = args.output or os.path.join(
+        RESULTS_FOLDER, f"{commit or 'unknown'}-{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'commit': commit,
+                'started_at': started.isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'sde': os.path.abspath(args.sde),
+            },
+            'benchmarks': benchmarks,
+        }, f, indent=2)
+    print(f"--- Results saved to {output} ---")
+
+
+if __name__ == '__main__':
+    main()
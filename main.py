@@ -1,12 +1,45 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
 import math
 from collections import deque
 
+# The scheduler modules import their siblings directly, so they are imported the same way here: one copy of
+# each module (and one metrics registry) per process
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scheduler'))
+from where_used import WhereUsedIndex
+from instrumentation import metrics
+from bonuses import BonusEngine
+from invention import with_invention, expected_output
+from name_index import NameIndex, describe_miss, prompt_for_name
+from sde_store import current_store
+
+
+class ProductionJob:
+    """One product's job in a production chain. Slotted and keyed by product typeID to keep plans small."""
+    __slots__ = ('blueprint_id', 'product_id', 'activity_id', 'time', 'products_per_run', 'total_required',
+                 'children', 'fractional_runs', 'runs_needed', 'ratio', 'closest_whole_ratio', 'rounded_up_ratio')
+
+    def __init__(self, blueprint_id, product_id, activity_id, time, products_per_run):
+        self.blueprint_id = blueprint_id
+        self.product_id = product_id
+        self.activity_id = activity_id
+        self.time = time
+        self.products_per_run = products_per_run
+        self.total_required = 0
+        self.children = []  # (material typeID, quantity per run)
+        self.fractional_runs = self.runs_needed = self.ratio = 0
+        self.closest_whole_ratio = self.rounded_up_ratio = 0
+
+
 class IndustryCalculator:
     # Map activity IDs to human-readable names
     ACTIVITY_IDS = {
         1: 'Manufacturing',
-        11: 'Reactions'
+        11: 'Reactions',
+        8: 'Invention',
+        5: 'Copying'
     }
     
     # Add items here to treat them as raw materials, even if a blueprint exists
@@ -15,21 +48,70 @@ class IndustryCalculator:
         'Nitrogen Fuel Block'
     }
 
-    def __init__(self, data_path='./static_data'):
-        """Load data from the EVE Online SDE files."""
-        self.industry_activity = pd.read_csv(f'{data_path}/industryActivity.csv')
-        self.activity_materials = pd.read_csv(f'{data_path}/industryActivityMaterials.csv')
-        self.activity_products = pd.read_csv(f'{data_path}/industryActivityProducts.csv')
-        self.inv_types = pd.read_csv(f'{data_path}/invTypes.csv')
+    def __init__(self, data_path='./static_data', build_costs_path='./reactions/build_costs.csv', apply_bonuses=True):
+        """
+        Load data from the EVE Online SDE files. With apply_bonuses, chains use the blueprint levels and
+        structure profiles configured in scheduler/bonuses.py and whole jobs with EVE's per-job rounding.
+        T2 chains include the invention and copying jobs configured in scheduler/invention.py.
+        """
+        self._inventions = None
+        with metrics.span('sde_load'):
+            if os.path.exists(f'{data_path}/invTypes.csv'):
+                # Narrow dtypes and only the invTypes columns used here; typeNames are categorical
+                self.industry_activity = pd.read_csv(f'{data_path}/industryActivity.csv',
+                                                     dtype={'typeID': 'int32', 'activityID': 'int8', 'time': 'int32'})
+                self.activity_materials = pd.read_csv(f'{data_path}/industryActivityMaterials.csv', dtype={
+                    'typeID': 'int32', 'activityID': 'int8', 'materialTypeID': 'int32', 'quantity': 'int32'})
+                self.activity_products = pd.read_csv(f'{data_path}/industryActivityProducts.csv', dtype={
+                    'typeID': 'int32', 'activityID': 'int8', 'productTypeID': 'int32', 'quantity': 'int32'})
+                self.inv_types = pd.read_csv(f'{data_path}/invTypes.csv', usecols=['typeID', 'typeName'],
+                                             dtype={'typeID': 'int32', 'typeName': 'category'})
+                self.inv_types.set_index('typeID', inplace=True)
+                # Invention success chances, if the export includes them
+                probabilities_path = f'{data_path}/industryActivityProbabilities.csv'
+                self.activity_probabilities = (pd.read_csv(probabilities_path)
+                                               if os.path.exists(probabilities_path) else None)
+            else:
+                # No CSV exports: use the store ingested from the official SDE (scheduler/ingest_sde.py)
+                self._load_store(data_path)
+
+        # Build-vs-buy unit costs written by reactions/calculator.py for the last price snapshot
+        try:
+            self.build_costs = pd.read_csv(build_costs_path, index_col='type_id')
+        except FileNotFoundError:
+            self.build_costs = None
+
+        self._where_used = None
+        self._name_index = None
+        # The recipe graph with invention and copying; lookups on self stay manufacturing and reactions only
+        self.sde = with_invention(self)
+        self.bonuses = BonusEngine(self.sde) if apply_bonuses else None
+
+    def _load_store(self, data_path):
+        """Reads the tables and inventions from the compiled store in data_path."""
+        store = current_store(data_path)
+        if store is None:
+            raise FileNotFoundError(f"Neither the SDE CSV exports nor a current compiled store are in {data_path}.")
+        self.inv_types, self.industry_activity, self.activity_materials, self.activity_products = store.tables()
         self.inv_types.set_index('typeID', inplace=True)
+        self.activity_probabilities = None
+        self._inventions = list(store.iter_inventions())
+
+    @property
+    def name_index(self):
+        """Exact, case-insensitive, prefix and fuzzy name lookups, built on first use."""
+        if self._name_index is None:
+            self._name_index = NameIndex(self.inv_types.index.tolist(), self.inv_types['typeName'].tolist())
+        return self._name_index
 
     def get_type_id(self, type_name):
-        """Get typeID from typeName."""
-        result = self.inv_types[self.inv_types['typeName'] == type_name]
-        return result.index[0] if not result.empty else None
+        """Get typeID from typeName, in any case."""
+        metrics.count('sde_lookups', method='get_type_id')
+        return self.name_index.lookup(type_name)
 
     def get_type_name(self, type_id):
         """Get typeName from typeID."""
+        metrics.count('sde_lookups', method='get_type_name')
         try:
             return self.inv_types.loc[type_id, 'typeName']
         except KeyError:
@@ -40,6 +122,7 @@ class IndustryCalculator:
         Find the blueprint/formula that produces a given product.
         Prioritizes manufacturing over reactions if both exist.
         """
+        metrics.count('sde_lookups', method='get_blueprint_for_product')
         # Check manufacturing first, then reactions
         for activity_id in [1, 11]:
             blueprint = self.activity_products[
@@ -52,119 +135,154 @@ class IndustryCalculator:
 
     def get_materials(self, blueprint_type_id, activity_id):
         """Get materials required for a specific blueprint and activity."""
+        metrics.count('sde_lookups', method='get_materials')
         return self.activity_materials[
             (self.activity_materials['typeID'] == blueprint_type_id) & 
             (self.activity_materials['activityID'] == activity_id)
         ]
 
+    def iter_materials(self, blueprint_type_id, activity_id):
+        """Yields (materialTypeID, quantity) for one run of a blueprint activity."""
+        materials = self.get_materials(blueprint_type_id, activity_id)
+        return zip(materials['materialTypeID'].tolist(), materials['quantity'].tolist())
+
     def get_production_time(self, blueprint_type_id, activity_id):
         """Get the production time for a specific blueprint and activity."""
+        metrics.count('sde_lookups', method='get_production_time')
         time_info = self.industry_activity[
             (self.industry_activity['typeID'] == blueprint_type_id) & 
             (self.industry_activity['activityID'] == activity_id)
         ]
-        return time_info.iloc[0]['time'] if not time_info.empty else 0
-        
+        return int(time_info.iloc[0]['time']) if not time_info.empty else 0
+
+    def iter_inventions(self):
+        """Yields (T1 blueprint typeID, T2 blueprint typeID, runs per success, base chance or NaN)."""
+        if self._inventions is not None:
+            return iter(self._inventions)
+        inventions = self.activity_products[self.activity_products['activityID'] == 8]
+        if self.activity_probabilities is not None:
+            inventions = inventions.merge(self.activity_probabilities, how='left',
+                                          on=['typeID', 'activityID', 'productTypeID'])
+        else:
+            inventions = inventions.assign(probability=np.nan)
+        return zip(inventions['typeID'].tolist(), inventions['productTypeID'].tolist(),
+                   inventions['quantity'].tolist(), inventions['probability'].tolist())
+
+    @property
+    def where_used(self):
+        """Reverse-dependency index, built on first use."""
+        if self._where_used is None:
+            self._where_used = WhereUsedIndex(self.activity_materials, self.activity_products)
+        return self._where_used
+
+    def get_direct_consumers(self, type_id):
+        """Get the typeIDs of products whose recipe uses this type directly."""
+        return self.where_used.direct_consumers(type_id)
+
+    def get_dependent_products(self, type_id):
+        """Get the typeIDs of every product that depends on this type, directly or transitively."""
+        return self.where_used.transitive_consumers(type_id)
+
+    def depends_on(self, product_type_id, material_type_id):
+        """Check whether a product's production chain uses a material anywhere."""
+        return self.where_used.depends_on(product_type_id, material_type_id)
+
     def calculate_production_chain(self, final_product_name, concurrent_runs=1):
         """Recursively calculate the production chain across different activities."""
         final_product_id = self.get_type_id(final_product_name)
         if not final_product_id:
-            print(f"Error: Final product '{final_product_name}' not found.")
+            print(f"Error: Final product {describe_miss(final_product_name, self.name_index.suggest(final_product_name))}")
             return
 
         print(f"\nCalculating production chain for {concurrent_runs} concurrent run(s) of {final_product_name}...")
 
-        raw_materials_needed = {}
-        production_jobs = {}
+        raw_materials_needed = {}  # typeID -> quantity
+        production_jobs = {}  # product typeID -> ProductionJob
         
         # Memoization to avoid reprocessing nodes
         processed_components = set()
+        # Recipes with material/time bonuses applied, or the raw SDE quantities
+        recipes = self.bonuses or self.sde
 
         def process_component(product_id, required_quantity):
             product_name = self.get_type_name(product_id)
 
             # Base case: Item is in the forced raw list or has no blueprint
-            blueprint_info = self.get_blueprint_for_product(product_id)
+            blueprint_info = self.sde.get_blueprint_for_product(product_id)
             if product_name in self.FORCE_RAW_MATERIALS or blueprint_info is None:
-                raw_materials_needed[product_name] = raw_materials_needed.get(product_name, 0) + required_quantity
+                raw_materials_needed[product_id] = raw_materials_needed.get(product_id, 0) + required_quantity
                 return
             
-            blueprint_id = blueprint_info['typeID']
-            activity_id = blueprint_info['activityID']
-            products_per_run = blueprint_info['quantity']
-            
-            job_name = self.get_type_name(blueprint_id)
-
-            if job_name not in production_jobs:
-                prod_time = self.get_production_time(blueprint_id, activity_id)
-                production_jobs[job_name] = {
-                    'total_required': 0, 'time': prod_time, 'products_per_run': products_per_run,
-                    'activity_id': activity_id, 'blueprint_id': blueprint_id, 'children': []
-                }
+            blueprint_id = int(blueprint_info['typeID'])
+            activity_id = int(blueprint_info['activityID'])
+            # For inventions, the expected blueprint runs per attempt
+            products_per_run = expected_output(blueprint_info)
+
+            job = production_jobs.get(product_id)
+            if job is None:
+                job = production_jobs[product_id] = ProductionJob(
+                    blueprint_id, product_id, activity_id, recipes.get_production_time(blueprint_id, activity_id),
+                    products_per_run)
             
-            production_jobs[job_name]['total_required'] += required_quantity
+            job.total_required += required_quantity
             
-            if blueprint_id in processed_components:
+            if product_id in processed_components:
+                metrics.count('cache_hits', cache='processed_components')
                 return
 
-            materials = self.get_materials(blueprint_id, activity_id)
-            for _, material in materials.iterrows():
-                mat_id = material['materialTypeID']
-                qty_per_run = material['quantity']
-                production_jobs[job_name]['children'].append({'id': mat_id, 'qty_per_run': qty_per_run})
+            for mat_id, qty_per_run in recipes.iter_materials(blueprint_id, activity_id):
+                job.children.append((mat_id, qty_per_run))
                 total_material_needed = (required_quantity / products_per_run) * qty_per_run
                 process_component(mat_id, total_material_needed)
             
-            processed_components.add(blueprint_id)
+            processed_components.add(product_id)
 
 
-        process_component(final_product_id, concurrent_runs)
+        with metrics.span('traversal'):
+            process_component(final_product_id, concurrent_runs)
 
-        final_blueprint_info = self.get_blueprint_for_product(final_product_id)
-        if not final_blueprint_info.empty:
-            final_job_name = self.get_type_name(final_blueprint_info['typeID'])
-        else:
+        if final_product_id not in production_jobs:
             print(f"Could not find a blueprint for {final_product_name}")
             return
             
-        for job, details in production_jobs.items():
-            details['fractional_runs'] = details['total_required'] / details['products_per_run']
-            details['runs_needed'] = math.ceil(details['fractional_runs'])
-            details['ratio'] = 0
+        for details in production_jobs.values():
+            details.fractional_runs = details.total_required / details.products_per_run
+            details.runs_needed = math.ceil(details.fractional_runs)
+            details.ratio = 0
+
+        if self.bonuses is not None:
+            # Whole jobs: runs per job and the inputs they consume after per-job rounding
+            job_runs, raw_materials_needed = self.bonuses.rounded_chain(
+                {product_id: (job.blueprint_id, job.activity_id, job.products_per_run)
+                 for product_id, job in production_jobs.items()}, final_product_id, concurrent_runs)
+            for product_id, job in production_jobs.items():
+                job.runs_needed = job_runs.get(product_id, 0)
 
-        production_jobs[final_job_name]['ratio'] = float(concurrent_runs)
+        production_jobs[final_product_id].ratio = float(concurrent_runs)
         
-        q = deque([production_jobs[final_job_name]['blueprint_id']])
-        visited_for_ratio = {production_jobs[final_job_name]['blueprint_id']}
+        q = deque([final_product_id])
+        visited_for_ratio = {final_product_id}
         while q:
-            parent_bp_id = q.popleft()
-            parent_job_name = self.get_type_name(parent_bp_id)
-            parent_details = production_jobs[parent_job_name]
+            parent_id = q.popleft()
+            parent_details = production_jobs[parent_id]
 
-            if parent_details['time'] == 0: continue
+            if parent_details.time == 0: continue
             
-            for child in parent_details.get('children', []):
-                child_id = child['id']
-                child_bp_info = self.get_blueprint_for_product(child_id)
+            for child_id, qty_per_run in parent_details.children:
+                child_details = production_jobs.get(child_id)
                 
-                if child_bp_info is not None:
-                    child_bp_id = child_bp_info['typeID']
-                    child_job_name = self.get_type_name(child_bp_id)
-                    
-                    if child_job_name in production_jobs:
-                        child_details = production_jobs[child_job_name]
-                        
-                        if child_details['time'] > 0:
-                            child_supply_rate = child_details['products_per_run'] / child_details['time']
-                            demand_rate_from_parent = (child['qty_per_run'] / parent_details['time']) * parent_details['ratio']
-                            child_details['ratio'] += demand_rate_from_parent / child_supply_rate
-
-                            if child_bp_id not in visited_for_ratio:
-                                q.append(child_bp_id)
-                                visited_for_ratio.add(child_bp_id)
+                if child_details is not None:
+                    if child_details.time > 0:
+                        child_supply_rate = child_details.products_per_run / child_details.time
+                        demand_rate_from_parent = (qty_per_run / parent_details.time) * parent_details.ratio
+                        child_details.ratio += demand_rate_from_parent / child_supply_rate
+
+                        if child_id not in visited_for_ratio:
+                            q.append(child_id)
+                            visited_for_ratio.add(child_id)
 
         # --- Find best whole number ratio multiplier using squared error from ceiling ---
-        ratios_to_optimize = [details['ratio'] for details in production_jobs.values() if details['ratio'] > 0]
+        ratios_to_optimize = [details.ratio for details in production_jobs.values() if details.ratio > 0]
         best_multiplier = 1
         if ratios_to_optimize:
             lowest_cost = float('inf')
@@ -176,19 +294,20 @@ class IndustryCalculator:
                     best_multiplier = m
         
         for details in production_jobs.values():
-            details['closest_whole_ratio'] = details['ratio'] * best_multiplier
-            details['rounded_up_ratio'] = math.ceil(details['closest_whole_ratio'])
+            details.closest_whole_ratio = details.ratio * best_multiplier
+            details.rounded_up_ratio = math.ceil(details.closest_whole_ratio)
 
         # --- Display Results ---
         print("\n--- Raw Materials Required (Multibuy Format) ---")
         if not raw_materials_needed:
             print("None")
         else:
-            for name, qty in sorted(raw_materials_needed.items()):
+            for name, qty in sorted((self.get_type_name(t), q) for t, q in raw_materials_needed.items()):
                 print(f"{name} {math.ceil(qty)}")
 
         for activity_id, activity_name in self.ACTIVITY_IDS.items():
-            jobs_in_activity = {k: v for k, v in production_jobs.items() if v['activity_id'] == activity_id}
+            jobs_in_activity = {self.get_type_name(job.blueprint_id): job for job in production_jobs.values()
+                                if job.activity_id == activity_id}
             if not jobs_in_activity: continue
 
             print(f"\n--- {activity_name} Jobs (Optimal Multiplier: {best_multiplier}) ---")
@@ -197,16 +316,41 @@ class IndustryCalculator:
             print(header)
             print("-" * len(header))
 
-            sorted_jobs = sorted(jobs_in_activity.items(), key=lambda item: item[1]['ratio'], reverse=True)
+            sorted_jobs = sorted(jobs_in_activity.items(), key=lambda item: item[1].ratio, reverse=True)
 
             for job, details in sorted_jobs:
-                 line = (f"{job:<40} | {details['runs_needed']:<12} | {details['fractional_runs']:<18.4f} | "
-                         f"{details['ratio']:<15.4f} | {details['closest_whole_ratio']:<20.4f} | {details['rounded_up_ratio']:<15}")
+                 line = (f"{job:<40} | {details.runs_needed:<12} | {details.fractional_runs:<18.4f} | "
+                         f"{details.ratio:<15.4f} | {details.closest_whole_ratio:<20.4f} | {details.rounded_up_ratio:<15}")
                  print(line)
 
+        if self.build_costs is not None:
+            self.display_build_vs_buy(final_product_id, concurrent_runs, production_jobs, raw_materials_needed)
+
+    def display_build_vs_buy(self, final_product_id, concurrent_runs, production_jobs, raw_materials_needed):
+        """Shows the cheaper of buying or building for every item in the chain, from the precomputed costs."""
+        items = {details.product_id: details.total_required for details in production_jobs.values()}
+        items.update(raw_materials_needed)
+
+        print("\n--- Build vs Buy (last price snapshot) ---")
+        header = f"{'Item':<40} | {'Decision':<8} | {'Unit Cost':>16} | {'Market Price':>16} | {'Total':>18}"
+        print(header)
+        print("-" * len(header))
+        for type_id, qty in sorted(items.items(), key=lambda item: self.get_type_name(item[0])):
+            if type_id not in self.build_costs.index:
+                continue
+            cost = self.build_costs.loc[type_id]
+            print(f"{self.get_type_name(type_id):<40} | {cost['decision']:<8} | {cost['unit_cost']:>16,.2f} | "
+                  f"{cost['market_price']:>16,.2f} | {cost['unit_cost'] * qty:>18,.2f}")
+
+        if final_product_id in self.build_costs.index:
+            final_cost = self.build_costs.loc[final_product_id]
+            print(f"\nVertically integrated cost of {self.get_type_name(final_product_id)}: "
+                  f"{final_cost['build_cost'] * concurrent_runs:,.2f} ISK for {concurrent_runs} unit(s) "
+                  f"(market: {final_cost['market_price'] * concurrent_runs:,.2f} ISK)")
+
 if __name__ == '__main__':
     calculator = IndustryCalculator(data_path='./static_data')
-    product_name = input("Enter the name of the final product (e.g., Eris, Dominix): ")
+    _, product_name = prompt_for_name(calculator.name_index, "Enter the name of the final product (e.g., Eris, Dominix): ")
     
     concurrent_runs_input = input("Enter number of concurrent final product runs [Default: 1]: ")
     try:
@@ -216,3 +360,4 @@ if __name__ == '__main__':
         runs = 1
         
     calculator.calculate_production_chain(product_name, runs)
+    metrics.export()
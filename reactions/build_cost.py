@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# Activities that can produce an item, in order of preference (same as get_blueprint_for_product)
+BUILD_ACTIVITIES = [1, 11]
+
+
+class BuildCostModel:
+    """
+    Build-vs-buy costing over the whole recipe DAG.
+
+    For every item the unit cost is min(market price, cost to build one unit from its inputs),
+    where the inputs are themselves costed the same way. Items are resolved level by level in
+    topological order, so one compute() per price snapshot prices every chain in the SDE.
+    """
+
+    def __init__(self, activity_materials, activity_products, activities=BUILD_ACTIVITIES):
+        products = activity_products[activity_products['activityID'].isin(activities)].copy()
+        products['priority'] = products['activityID'].map({a: i for i, a in enumerate(activities)})
+        # One recipe per product: first blueprint of the preferred activity
+        recipes = (products.sort_values('priority', kind='stable')
+                   .drop_duplicates('productTypeID')[['productTypeID', 'typeID', 'activityID', 'quantity']])
+
+        edges = recipes.merge(activity_materials, on=['typeID', 'activityID'], suffixes=('_out', ''))
+        # Recipes without materials (e.g. SKIN licenses) are not treated as buildable
+        recipes = recipes[recipes['productTypeID'].isin(edges['productTypeID'])]
+        node_ids = np.union1d(recipes['productTypeID'].to_numpy(), edges['materialTypeID'].to_numpy())
+        self.type_ids = node_ids.astype(np.int64)
+        self.index = pd.Series(np.arange(len(node_ids)), index=self.type_ids)
+
+        self.blueprint_ids = np.zeros(len(node_ids), dtype=np.int64)
+        self.blueprint_ids[self.index[recipes['productTypeID']].to_numpy()] = recipes['typeID'].to_numpy()
+        self.has_recipe = self.blueprint_ids > 0
+
+        self.edge_product = self.index[edges['productTypeID']].to_numpy()
+        self.edge_material = self.index[edges['materialTypeID']].to_numpy()
+        # Material needed per unit of product
+        self.edge_qty = (edges['quantity'] / edges['quantity_out']).to_numpy(dtype=np.float64)
+
+    def compute(self, prices, price_column='input_sell'):
+        """
+        Costs every item against a select_hub_prices() table.
+        Returns a DataFrame indexed by type_id with market_price, build_cost, unit_cost,
+        decision ('buy', 'build' or 'unpriced'), blueprint_id and level (0 for bought-only items).
+        """
+        n = len(self.type_ids)
+        market = prices[price_column].reindex(self.type_ids).to_numpy(dtype=np.float64)
+        market = np.where(market > 0, market, np.nan)
+
+        build = np.full(n, np.nan)
+        unit = np.where(self.has_recipe, np.nan, market)
+        level = np.zeros(n, dtype=np.int32)
+        resolved = ~self.has_recipe
+        pending = np.bincount(self.edge_product, weights=~resolved[self.edge_material], minlength=n)
+
+        depth = 0
+        while True:
+            ready = ~resolved & (pending == 0)
+            if not ready.any():
+                break
+            depth += 1
+            sel = ready[self.edge_product]
+            # NaN input costs propagate, so an unpriceable input makes building unpriceable
+            cost = np.bincount(self.edge_product[sel],
+                               weights=self.edge_qty[sel] * unit[self.edge_material[sel]], minlength=n)
+            build[ready] = cost[ready]
+            unit[ready] = np.fmin(market[ready], build[ready])
+            level[ready] = depth
+            resolved |= ready
+            pending -= np.bincount(self.edge_product, weights=ready[self.edge_material], minlength=n)
+
+        # Items on recipe cycles can't be built from resolved inputs; fall back to the market
+        unit[~resolved] = market[~resolved]
+
+        decision = np.where(np.isnan(unit), 'unpriced', np.where(unit < market, 'build', 'buy'))
+        decision = np.where(np.isnan(market) & ~np.isnan(unit), 'build', decision)
+        return pd.DataFrame({
+            'market_price': market,
+            'build_cost': build,
+            'unit_cost': unit,
+            'decision': decision,
+            'blueprint_id': self.blueprint_ids,
+            'level': level,
+        }, index=pd.Index(self.type_ids, name='type_id'))
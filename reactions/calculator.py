@@ -1,113 +1,450 @@
 import pandas as pd
+import numpy as np
 import requests
 import time
 import os
+import sys
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+from profit_engine import ProfitEngine
+from build_cost import BuildCostModel
+from results_store import append_run
+from price_snapshot import PriceSnapshot, publish
+
+# The cache file lock and the compiled SDE store are shared with the scheduler
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scheduler'))
+from file_lock import file_lock
+from sde_store import current_store
 
 # --- CONFIGURATION ---
 SDE_FOLDER = '../static_data'
 OUTPUT_CSV = 'reaction_profits.csv'
-JITA_REGION_ID = '10000002'  # The region ID for The Forge, which contains Jita
+BUILD_COSTS_CSV = 'build_costs.csv'  # Build-vs-buy unit costs for every item, read by ../main.py
+DISPLAY_TOP_N = 10  # Rows printed to the console after a run
 CACHE_FILE = 'price_cache.json'
+# Also publish the cache as a memory-mapped snapshot that processes attach to without parsing
+PRICE_SNAPSHOT = True
 CACHE_EXPIRATION_HOURS = 1  # How long to keep price cache before refreshing
 
+# Market hubs to pull orders from: (hub name, region ID, station or structure ID).
+# Hubs in the same region share a single download of that region's order book.
+# Player structures (IDs above 1,000,000,000,000) are fetched from the structure market
+# endpoint and need an access token with esi-markets.structure_markets.v1 in ESI_ACCESS_TOKEN.
+MARKET_HUBS = [
+    ('Jita', '10000002', 60003760),     # Jita IV - Moon 4 - Caldari Navy Assembly Plant
+    ('Amarr', '10000043', 60008494),    # Amarr VIII (Oris) - Emperor Family Academy
+    ('Dodixie', '10000032', 60011866),  # Dodixie IX - Moon 20 - Federation Navy Assembly Plant
+]
+ESI_ACCESS_TOKEN = os.environ.get('ESI_ACCESS_TOKEN')
+
+# Concurrency for order book downloads. All workers share one connection pool and rate limiter.
+MAX_FETCH_WORKERS = 8
+MAX_REQUESTS_PER_SECOND = 20
+# A failed page is retried this many times, waiting 1s, 2s, 4s, ... in between. If it still fails,
+# the hubs behind that order book are left out and the fetch is not cached.
+FETCH_RETRIES = 3
+
+# Which per-type price feeds the calculations: 'best' (top of book), 'vwap' (volume-weighted
+# average over the whole book) or 'percentile' (average of the best PRICE_PERCENTILE of volume,
+# which a single tiny troll order can't move)
+PRICE_SOURCE = 'best'
+PRICE_PERCENTILE = 0.05
+
 # Fees - adjust these if your skills/standings are different
 BROKER_FEE = 0.035  # 3.5%
 SALES_TAX = 0.025  # 2.5%
 
+# Scales formula times from industryActivity when projecting weekly throughput,
+# e.g. 0.8 with Reactions V and no structure/rig time bonuses.
+REACTION_TIME_MULTIPLIER = 1.0
+
 # --- END OF CONFIGURATION ---
 
+ESI_BASE_URL = "https://esi.evetech.net/latest"
+STRUCTURE_ID_THRESHOLD = 1_000_000_000_000
+
+# Statistics kept per hub and type; 'buy'/'sell' are the best prices
+STAT_COLUMNS = ['buy', 'sell', 'buy_vwap', 'sell_vwap', 'buy_pct', 'sell_pct', 'buy_depth', 'sell_depth']
+# Price source -> suffix of the buy/sell statistic it reads
+PRICE_SOURCES = {'best': '', 'vwap': '_vwap', 'percentile': '_pct'}
+
+# Engine result column -> CSV header, in output order
+DISPLAY_COLUMNS = {
+    'name': 'Reaction Name',
+    'net_profit_per_week': 'Net Profit per Week',
+    'net_profit_instant': 'Net Profit (Instant Buy/Sell)',
+    'profit_pct_instant': 'Profit % (Instant)',
+    'net_profit_orders': 'Net Profit (Order-based)',
+    'profit_pct_orders': 'Profit % (Order-based)',
+    'input_cost_sell': 'Input Cost (Hub Sell)',
+    'output_revenue_buy': 'Output Revenue (Hub Buy)',
+    'input_cost_buy': 'Input Cost (Hub Buy)',
+    'output_revenue_sell': 'Output Revenue (Hub Sell)',
+    'input_cost_integrated': 'Input Cost (Build-or-Buy)',
+    'net_profit_integrated': 'Net Profit (Integrated)',
+    'inputs': 'Inputs',
+    'products': 'Products',
+}
+
+
+class RateLimiter:
+    """Spaces out requests issued from several threads to a fixed rate."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self.lock:
+            slot = max(time.monotonic(), self.next_slot)
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _make_session(pool_size):
+    """Creates a requests session whose connection pool is sized for the fetch workers."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    # Add a User-Agent header, which is good practice for ESI
+    session.headers['User-Agent'] = 'EVEProfitabilityCalculator/1.0'
+    return session
+
+
+def _parse_expires(response):
+    """Returns the response's Expires header as epoch seconds, or None."""
+    try:
+        return parsedate_to_datetime(response.headers['expires']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
 
-def get_market_prices():
+def _fetch_order_page(session, limiter, url, page, headers=None):
     """
-    Fetches market prices from ESI. Uses a cache to avoid excessive API calls.
+    Fetches one page of market orders, retrying failures FETCH_RETRIES times.
+    Returns (orders, total_pages, expires); raises the last RequestException if every attempt fails.
     """
-    # Check if cache exists, is recent, and is not empty
-    if os.path.exists(CACHE_FILE):
-        cache_mod_time = os.path.getmtime(CACHE_FILE)
-        if (time.time() - cache_mod_time) / 3600 < CACHE_EXPIRATION_HOURS:
-            try:
-                print("Loading prices from cache...")
-                with open(CACHE_FILE, 'r') as f:
-                    cached_data = json.load(f)
-                    # FIX: Only return cached data if it's not empty
-                    if cached_data:
-                        print("Cache successfully loaded.")
-                        return cached_data
-                    else:
-                        print("Cache file is empty. Fetching new data.")
-            except (json.JSONDecodeError, FileNotFoundError):
-                print("Cache file is corrupted or missing. Fetching new data.")
-
-    print("Fetching live market prices from ESI (this may take a few minutes)...")
-    prices = {}
-    # Corrected URL to use region_id
-    url = f"https://esi.evetech.net/latest/markets/{JITA_REGION_ID}/orders/"
-    
-    # We need prices for all items, so we fetch all pages.
-    page = 1
-    # Add a User-Agent header, which is good practice for ESI
-    headers = {'User-Agent': 'EVEProfitabilityCalculator/1.0'}
-
-    while True:
+    for attempt in range(FETCH_RETRIES + 1):
+        limiter.wait()
         try:
-            params = {'order_type': 'all', 'page': page}
-            # Pass the headers with the request
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status() # Raises an exception for bad status codes
-            
-            data = response.json()
-            if not data:
-                break # No more data, exit loop
-            
-            for order in data:
-                # We only care about Jita IV Moon 4 (Caldari Navy Assembly Plant), stationID 60003760
-                if order.get('location_id') != 60003760:
-                    continue
-
-                type_id = str(order['type_id'])
-                if type_id not in prices:
-                    prices[type_id] = {'buy': 0, 'sell': float('inf')}
-                
-                if order['is_buy_order']:
-                    prices[type_id]['buy'] = max(prices[type_id]['buy'], order['price'])
-                else:
-                    prices[type_id]['sell'] = min(prices[type_id]['sell'], order['price'])
+            response = session.get(url, params={'order_type': 'all', 'page': page}, headers=headers)
+            response.raise_for_status()  # Raises an exception for bad status codes
+            return response.json(), int(response.headers.get('x-pages', 1)), _parse_expires(response)
+        except (requests.exceptions.RequestException, ValueError) as e:  # ValueError: truncated JSON
+            print(f"Error fetching {url} page {page} (attempt {attempt + 1}/{FETCH_RETRIES + 1}): {e}")
+            if attempt == FETCH_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def _order_rows(orders, location_ids):
+    """Keeps the orders at the wanted locations as float64 rows of (location, type, is_buy, price, volume)."""
+    rows = [(o['location_id'], o['type_id'], o['is_buy_order'], o['price'], o['volume_remain'])
+            for o in orders if o.get('location_id') in location_ids]
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
 
+
+def order_statistics(rows, hubs, percentile=PRICE_PERCENTILE):
+    """
+    Computes every hub's per-type statistics from raw order rows (see _order_rows) in one
+    vectorized pass over groups of (location, type, side): the best price, the volume-weighted
+    average price, the average price of the best `percentile` of volume, and the depth (total
+    volume). Returns a DataFrame indexed by type_id with (hub, statistic) columns; NaN where a
+    hub has no orders for a type.
+    """
+    hub_by_location = {location_id: name for name, _, location_id in hubs}
+    hub_order = [name for name, _, _ in hubs]
+    columns = pd.MultiIndex.from_product([hub_order, STAT_COLUMNS], names=['hub', 'side'])
+    if not len(rows):
+        return pd.DataFrame(index=pd.Index([], name='type_id', dtype=np.int64), columns=columns, dtype=np.float64)
+
+    location, type_id = rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64)
+    is_buy, price, volume = rows[:, 2] > 0, rows[:, 3], rows[:, 4]
+    # Best orders first within each group: highest buys, lowest sells
+    order = np.lexsort((np.where(is_buy, -price, price), is_buy, type_id, location))
+    location, type_id, is_buy, price, volume = (a[order] for a in (location, type_id, is_buy, price, volume))
+
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (location[1:] != location[:-1]) | (type_id[1:] != type_id[:-1]) | (is_buy[1:] != is_buy[:-1])
+    starts = np.flatnonzero(new_group)
+    group = np.cumsum(new_group) - 1
+
+    depth = np.add.reduceat(volume, starts)
+    vwap = np.add.reduceat(price * volume, starts) / depth
+    # Volume each order contributes to the best `percentile` of its group's depth
+    filled = np.cumsum(volume) - volume
+    filled -= filled[starts][group]
+    taken = np.clip(percentile * depth[group] - filled, 0.0, volume)
+    pct = np.add.reduceat(price * taken, starts) / np.add.reduceat(taken, starts)
+
+    group_buy = is_buy[starts]
+    stats = pd.DataFrame({'hub': pd.Series(location[starts]).map(hub_by_location).to_numpy(),
+                          'type_id': type_id[starts], 'buy': group_buy,
+                          '': price[starts], '_vwap': vwap, '_pct': pct, '_depth': depth})
+    wide = stats.pivot(index=['type_id'], columns=['hub', 'buy'], values=['', '_vwap', '_pct', '_depth'])
+    wide.columns = pd.MultiIndex.from_tuples(
+        [(hub, ('buy' if buy else 'sell') + suffix) for suffix, hub, buy in wide.columns], names=['hub', 'side'])
+    hub_order = [name for name in hub_order if name in wide.columns.get_level_values('hub')]
+    return wide.reindex(columns=pd.MultiIndex.from_product([hub_order, STAT_COLUMNS], names=['hub', 'side']))
+
+
+def fetch_hub_prices(hubs=MARKET_HUBS, access_token=ESI_ACCESS_TOKEN):
+    """
+    Downloads the order books behind all hubs concurrently and returns the order statistics
+    (see order_statistics) per type for every hub as one DataFrame indexed by type_id with
+    (hub, side) columns. Missing orders are NaN. attrs['expires'] holds the earliest ESI Expires time.
+    If an order book can't be fetched completely, its hubs are left out and listed in attrs['failed_hubs'].
+    """
+    session = _make_session(MAX_FETCH_WORKERS)
+    limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+
+    # One order book download per region (NPC stations) or per structure
+    sources = {}
+    for name, region_id, location_id in hubs:
+        if location_id >= STRUCTURE_ID_THRESHOLD:
+            if not access_token:
+                print(f"Skipping structure hub {name}: ESI_ACCESS_TOKEN is not set.")
+                continue
+            url = f"{ESI_BASE_URL}/markets/structures/{location_id}/"
+            sources.setdefault(url, {'locations': set(), 'headers': {'Authorization': f'Bearer {access_token}'}})
+        else:
+            url = f"{ESI_BASE_URL}/markets/{region_id}/orders/"
+            sources.setdefault(url, {'locations': set(), 'headers': None})
+        sources[url]['locations'].add(location_id)
+
+    blocks = {url: [] for url in sources}
+    failed = set()  # Sources with a page that couldn't be fetched; a partial order book is never used
+    expires = []
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as pool:
+        # The first page of each source tells us how many pages there are
+        first_pages = {pool.submit(_fetch_order_page, session, limiter, url, 1, src['headers']): url
+                       for url, src in sources.items()}
+        page_futures = {}
+        for future in as_completed(first_pages):
+            url = first_pages[future]
+            try:
+                orders, total_pages, page_expires = future.result()
+            except (requests.exceptions.RequestException, ValueError):
+                failed.add(url)
+                continue
+            if page_expires:
+                expires.append(page_expires)
+            blocks[url].append(_order_rows(orders, sources[url]['locations']))
+            print(f"  ... {url} has {total_pages} page(s)")
+            for page in range(2, total_pages + 1):
+                page_futures[pool.submit(_fetch_order_page, session, limiter, url, page, sources[url]['headers'])] = url
+
+        for done, future in enumerate(as_completed(page_futures), start=1):
+            url = page_futures[future]
+            try:
+                orders, _, _ = future.result()
+            except (requests.exceptions.RequestException, ValueError):
+                failed.add(url)
+                continue
+            blocks[url].append(_order_rows(orders, sources[url]['locations']))
             # Show progress
-            if page % 20 == 0:
-                print(f"  ... fetched page {page}")
+            if done % 50 == 0:
+                print(f"  ... fetched {done}/{len(page_futures)} pages")
 
-            page += 1
-            time.sleep(0.1) # Be gentle with the API
+    failed_locations = set().union(*(sources[url]['locations'] for url in failed))
+    failed_hubs = [name for name, _, location_id in hubs if location_id in failed_locations]
+    if failed_hubs:
+        print(f"Could not fetch the complete order book for {', '.join(failed_hubs)}; leaving them out.")
+    rows = [block for url, url_blocks in blocks.items() if url not in failed for block in url_blocks]
+    hub_prices = order_statistics(np.concatenate(rows) if rows else np.empty((0, 5)), hubs)
+    # When ESI will next refresh the order books (epoch seconds), for callers that poll
+    hub_prices.attrs['expires'] = min(expires) if expires else None
+    hub_prices.attrs['failed_hubs'] = failed_hubs
+    return hub_prices
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching page {page}: {e}")
-            break
-            
-    # Clean up prices where sell might still be infinity
-    for type_id in prices:
-        if prices[type_id]['sell'] == float('inf'):
-            prices[type_id]['sell'] = 0
 
-    print(f"Fetched prices for {len(prices)} unique item types in Jita.")
+def _snapshot_path(cache_file):
+    """The memory-mapped snapshot lives next to the JSON cache."""
+    return os.path.splitext(cache_file)[0] + '.bin'
 
-    # FIX: Only save the cache if we actually fetched some price data
-    if prices:
+
+def _save_price_cache(hub_prices, cache_file):
+    """
+    Stores the per-hub table as {hub: {type_id: [statistics in STAT_COLUMNS order]}} with NaN written
+    as null, and publishes it as the memory-mapped snapshot.
+    """
+    if PRICE_SNAPSHOT:
+        try:
+            publish(hub_prices, _snapshot_path(cache_file), PRICE_PERCENTILE)
+        except OSError as e:  # E.g. Windows won't replace a file another process has mapped, or the disk is full
+            print(f"Could not publish the price snapshot ({e}); readers will use the JSON cache.")
+    cache = {'columns': STAT_COLUMNS, 'percentile': PRICE_PERCENTILE, 'hubs': {}}
+    for hub in hub_prices.columns.get_level_values('hub').unique():
+        table = hub_prices[hub][STAT_COLUMNS].dropna(how='all')
+        values = table.astype(object).where(table.notna(), None).to_numpy().tolist()
+        cache['hubs'][hub] = dict(zip(map(str, table.index), values))
+    # Written next to the cache and renamed into place, so readers never see a partial file
+    tmp_path = f"{cache_file}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_file)
+
+
+def _load_price_cache(hubs, cache_file):
+    """
+    Loads the cached per-hub table, or returns None if it doesn't cover every configured hub
+    or was written with other statistics.
+    """
+    with open(cache_file, 'r') as f:
+        cached_data = json.load(f)
+    if not isinstance(cached_data, dict) or cached_data.get('columns') != STAT_COLUMNS \
+            or cached_data.get('percentile') != PRICE_PERCENTILE:
+        return None
+    cached_hubs = cached_data.get('hubs')
+    if not cached_hubs or any(name not in cached_hubs for name, _, _ in hubs):
+        return None
+    tables = {}
+    for name, _, _ in hubs:
+        entries = cached_hubs[name]
+        tables[name] = pd.DataFrame(list(entries.values()), columns=STAT_COLUMNS, dtype=np.float64,
+                                    index=pd.Index([int(t) for t in entries], name='type_id'))
+    hub_prices = pd.concat(tables, axis=1, names=['hub', 'side'])
+    return hub_prices.sort_index()
+
+
+def _fresh_snapshot_prices(hubs, cache_file):
+    """Attaches to the price snapshot if it is recent and has the configured hubs and statistics, else None."""
+    path = _snapshot_path(cache_file)
+    if not PRICE_SNAPSHOT or not os.path.exists(path):
+        return None
+    try:
+        snapshot = PriceSnapshot(path)
+    except (OSError, ValueError):
+        return None
+    hub_names = [name for name, _, _ in hubs]
+    if (time.time() - snapshot.written_at) / 3600 >= CACHE_EXPIRATION_HOURS \
+            or snapshot.columns != STAT_COLUMNS or snapshot.percentile != PRICE_PERCENTILE \
+            or any(name not in snapshot.hubs for name in hub_names):
+        return None
+    print(f"Attached to the price snapshot ({len(snapshot)} types).")
+    hub_prices = snapshot.to_frame(hub_names)
+    hub_prices.attrs['written_at'] = snapshot.written_at
+    return hub_prices
+
+
+def _fresh_cached_prices(hubs, cache_file):
+    """
+    Returns the cached prices if the snapshot or the JSON cache is recent and covers the
+    configured hubs, else None.
+    """
+    hub_prices = _fresh_snapshot_prices(hubs, cache_file)
+    if hub_prices is not None:
+        return hub_prices
+    if not os.path.exists(cache_file):
+        return None
+    cache_mod_time = os.path.getmtime(cache_file)
+    if (time.time() - cache_mod_time) / 3600 >= CACHE_EXPIRATION_HOURS:
+        return None
+    try:
+        print("Loading prices from cache...")
+        hub_prices = _load_price_cache(hubs, cache_file)
+        if hub_prices is not None and not hub_prices.empty:
+            print("Cache successfully loaded.")
+            hub_prices.attrs['written_at'] = cache_mod_time
+            return hub_prices
+        print("Cache does not cover the configured hubs. Fetching new data.")
+    except (json.JSONDecodeError, FileNotFoundError, TypeError, ValueError):
+        print("Cache file is corrupted or missing. Fetching new data.")
+    return None
+
+
+def get_market_prices(hubs=MARKET_HUBS, cache_file=CACHE_FILE):
+    """
+    Fetches per-hub market prices from ESI. Uses a cache to avoid excessive API calls.
+    When several runs find the cache stale at once, one refreshes it while the others wait and reuse it.
+    """
+    hub_prices = _fresh_cached_prices(hubs, cache_file)
+    if hub_prices is not None:
+        return hub_prices
+
+    with file_lock(cache_file):
+        # Another run may have refreshed the cache while we waited for the lock
+        hub_prices = _fresh_cached_prices(hubs, cache_file)
+        if hub_prices is not None:
+            return hub_prices
+        return _refresh_price_cache(hubs, cache_file)
+
+
+def refresh_market_prices(newer_than=None, hubs=MARKET_HUBS, cache_file=CACHE_FILE):
+    """
+    Fetches new prices even though the cache may still be fresh, e.g. once ESI's Expires has passed.
+    Takes the same lock as get_market_prices; if another run saved prices written at or after
+    newer_than (epoch seconds) while we waited, those are reused instead of downloading again.
+    """
+    with file_lock(cache_file):
+        if newer_than is not None:
+            hub_prices = _fresh_cached_prices(hubs, cache_file)
+            if hub_prices is not None and hub_prices.attrs.get('written_at', 0) >= newer_than:
+                return hub_prices
+        return _refresh_price_cache(hubs, cache_file)
+
+
+def _refresh_price_cache(hubs, cache_file):
+    print(f"Fetching live market prices from ESI for {len(hubs)} hub(s)...")
+    written_at = time.time()
+    hub_prices = fetch_hub_prices(hubs)
+    hub_prices.attrs['written_at'] = written_at
+    print(f"Fetched prices for {len(hub_prices)} unique item types across {len(hubs)} hub(s).")
+
+    # Only save the cache if every hub's order book was fetched completely
+    if hub_prices.attrs.get('failed_hubs'):
+        print("Some hubs are missing. Cache will not be updated.")
+    elif not hub_prices.empty:
         print("Saving prices to cache...")
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(prices, f)
+        _save_price_cache(hub_prices, cache_file)
     else:
         print("No prices fetched. Cache will not be updated.")
 
-    return prices
+    return hub_prices
 
 
-def main():
-    """Main function to load data, process, and save results."""
-    print("--- Starting EVE Reaction Profitability Calculator ---")
+def _best_across_hubs(table, pick):
+    """Returns (price, hub) per type, picking the min or max non-NaN price across hub columns."""
+    price = table.min(axis=1) if pick == 'min' else table.max(axis=1)
+    filled = table.fillna(np.inf if pick == 'min' else -np.inf)
+    hub = filled.idxmin(axis=1) if pick == 'min' else filled.idxmax(axis=1)
+    return price.fillna(0.0), hub.where(price.notna())
 
-    # 1. Load SDE files using pandas
+
+def select_hub_prices(hub_prices, source=PRICE_SOURCE):
+    """
+    Picks the cheapest hub to source each item from and the best hub to sell it in, using the
+    given price source ('best', 'vwap' or 'percentile', see PRICE_SOURCE).
+    Input prices take the lowest sell/buy across hubs, output prices the highest buy/sell.
+    Prices without orders anywhere are 0.
+    """
+    if source not in PRICE_SOURCES:
+        raise ValueError(f"Unknown price source '{source}'; expected one of {', '.join(PRICE_SOURCES)}.")
+    buy = hub_prices.xs('buy' + PRICE_SOURCES[source], axis=1, level='side')
+    sell = hub_prices.xs('sell' + PRICE_SOURCES[source], axis=1, level='side')
+    selected = pd.DataFrame(index=hub_prices.index)
+    for column, table, pick in [('input_sell', sell, 'min'), ('input_buy', buy, 'min'),
+                                ('output_buy', buy, 'max'), ('output_sell', sell, 'max')]:
+        selected[column], selected[f'{column}_hub'] = _best_across_hubs(table, pick)
+    return selected
+
+
+def load_sde_tables():
+    """
+    Loads invTypes, industryActivity, industryActivityMaterials and industryActivityProducts.
+    Without the CSV exports the tables come from the compiled store (see scheduler/ingest_sde.py).
+    Returns None if neither is there.
+    """
+    if not os.path.exists(os.path.join(SDE_FOLDER, 'invTypes.csv')):
+        store = current_store(SDE_FOLDER)
+        if store is not None:
+            print("Loading SDE tables from the compiled store...")
+            return store.tables()
     try:
         print("Loading SDE files...")
         inv_types = pd.read_csv(os.path.join(SDE_FOLDER, 'invTypes.csv'))
@@ -117,9 +454,12 @@ def main():
     except FileNotFoundError as e:
         print(f"Error: {e}")
         print("Please ensure the SDE files are in the correct directory.")
-        return
+        return None
+    return inv_types, industry_activity, activity_materials, activity_products
 
-    # 2. Filter for reactions
+
+def filter_composite_reactions(inv_types, industry_activity):
+    """Returns the reaction formulas (typeID, typeName, ...) excluding Booster and Unrefined formulas."""
     # Activity ID for Reactions is 11
     all_reactions = industry_activity[industry_activity['activityID'] == 11]
     
@@ -131,121 +471,98 @@ def main():
     filtered_reactions_1 = reaction_details[~reaction_details['typeName'].str.contains("Booster", case=False, na=False)]
     
     # Filter 2: Remove reactions starting with "Unrefined"
-    composite_reactions = filtered_reactions_1[~filtered_reactions_1['typeName'].str.startswith("Unrefined")]
-    
+    return filtered_reactions_1[~filtered_reactions_1['typeName'].str.startswith("Unrefined")]
+
+
+def add_integrated_costs(results_df, engine, build_model, prices, typeid_to_name):
+    """
+    Adds the build-or-buy columns to a full table of ProfitEngine results (one row per engine row)
+    and writes the unit costs to BUILD_COSTS_CSV. Returns the build costs.
+    """
+    build_costs = build_model.compute(prices, price_column='input_buy')
+    results_df['input_cost_integrated'] = engine.integrated_input_cost(build_costs)
+    results_df['net_profit_integrated'] = (results_df['output_revenue_sell'] * (1 - BROKER_FEE - SALES_TAX)
+                                           - results_df['input_cost_integrated'])
+    write_csv_atomic(build_costs.assign(name=build_costs.index.map(typeid_to_name)), BUILD_COSTS_CSV)
+    return build_costs
+
+
+def write_csv_atomic(df, path, **kwargs):
+    """Writes a CSV next to its destination and renames it into place, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    df.to_csv(tmp_path, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def label_columns(results_df, columns=DISPLAY_COLUMNS):
+    """Selects engine result columns and renames them to their display headers, keeping numbers numeric."""
+    return results_df[list(columns)].rename(columns=columns)
+
+
+def format_for_display(results_df, columns=DISPLAY_COLUMNS):
+    """Labels engine result columns and formats numbers as text for printing."""
+    display_df = label_columns(results_df, columns)
+    for col in display_df.columns:
+        if 'Cost' in col or 'Revenue' in col or col.startswith('Net Profit'):
+            display_df[col] = display_df[col].apply(lambda x: f"{x:,.2f}")
+        elif 'Profit %' in col:
+            display_df[col] = display_df[col].apply(lambda x: f"{x:.2f}%")
+    return display_df
+
+
+def main():
+    """Main function to load data, process, and save results."""
+    print("--- Starting EVE Reaction Profitability Calculator ---")
+
+    # 1. Load SDE files using pandas
+    sde = load_sde_tables()
+    if sde is None:
+        return
+    inv_types, industry_activity, activity_materials, activity_products = sde
+
+    # 2. Filter for composite reactions
+    composite_reactions = filter_composite_reactions(inv_types, industry_activity)
     print(f"Found {len(composite_reactions)} composite reactions to process after filtering.")
 
     # 3. Create a TypeID -> TypeName mapping for easy lookups
     typeid_to_name = inv_types.set_index('typeID')['typeName'].to_dict()
 
-    # 4. Get live market data
-    market_prices = get_market_prices()
-
-    # 5. Process each reaction
-    print("Calculating profitability for each composite reaction...")
-    results = []
-    total_reactions = len(composite_reactions)
-    for i, (_, reaction) in enumerate(composite_reactions.iterrows()):
-        bp_type_id = reaction['typeID']
-        
-        # Skip if the blueprint name is not in our dictionary (unlikely, but safe)
-        if bp_type_id not in typeid_to_name:
-            continue
-        
-        reaction_name = typeid_to_name[bp_type_id]
-        
-        # --- Get Input Materials ---
-        inputs = activity_materials[activity_materials['typeID'] == bp_type_id]
-        input_cost_jita_sell = 0 # Cost if you buy instantly
-        input_cost_jita_buy = 0  # Cost if you place buy orders
-        input_details = []
-
-        for _, mat in inputs.iterrows():
-            mat_id = str(mat['materialTypeID'])
-            qty = mat['quantity']
-            mat_name = typeid_to_name.get(mat['materialTypeID'], 'Unknown Material')
-            
-            price_info = market_prices.get(mat_id, {'buy': 0, 'sell': 0})
-            
-            input_cost_jita_sell += price_info.get('sell', 0) * qty
-            input_cost_jita_buy += price_info.get('buy', 0) * qty
-            input_details.append(f"{mat_name} x{qty}")
-
-        # --- Get Output Products ---
-        products = activity_products[activity_products['typeID'] == bp_type_id]
-        output_revenue_jita_buy = 0  # Revenue if you sell instantly
-        output_revenue_jita_sell = 0 # Revenue if you place sell orders
-        product_details = []
-
-        for _, prod in products.iterrows():
-            prod_id = str(prod['productTypeID'])
-            qty = prod['quantity']
-            prod_name = typeid_to_name.get(prod['productTypeID'], 'Unknown Product')
-            
-            price_info = market_prices.get(prod_id, {'buy': 0, 'sell': 0})
-            
-            output_revenue_jita_buy += price_info.get('buy', 0) * qty
-            output_revenue_jita_sell += price_info.get('sell', 0) * qty
-            product_details.append(f"{prod_name} x{qty}")
-
-        # --- Calculate Profits ---
-        # Scenario 1: Buy inputs instantly (Jita Sell), sell outputs instantly (Jita Buy)
-        gross_profit_1 = output_revenue_jita_buy - input_cost_jita_sell
-        net_profit_1 = output_revenue_jita_buy * (1 - BROKER_FEE - SALES_TAX) - input_cost_jita_sell
-
-        # Scenario 2: Place buy orders for inputs, place sell orders for outputs
-        gross_profit_2 = output_revenue_jita_sell - input_cost_jita_buy
-        net_profit_2 = output_revenue_jita_sell * (1 - BROKER_FEE - SALES_TAX) - input_cost_jita_buy
-        
-        # NEW: Calculate profit percentages (ROI)
-        profit_percent_1 = (net_profit_1 / input_cost_jita_sell * 100) if input_cost_jita_sell > 0 else 0
-        profit_percent_2 = (net_profit_2 / input_cost_jita_buy * 100) if input_cost_jita_buy > 0 else 0
-
-        # FINAL: Calculate weekly profit projection
-        net_profit_per_week = net_profit_2 * 120
-
-        # Avoid adding reactions with no market data
-        if input_cost_jita_sell > 0 and output_revenue_jita_buy > 0:
-            results.append({
-                'Reaction Name': reaction_name,
-                'Net Profit per Week': net_profit_per_week,
-                'Net Profit (Instant Buy/Sell)': net_profit_1,
-                'Profit % (Instant)': profit_percent_1,
-                'Net Profit (Order-based)': net_profit_2,
-                'Profit % (Order-based)': profit_percent_2,
-                'Input Cost (Jita Sell)': input_cost_jita_sell,
-                'Output Revenue (Jita Buy)': output_revenue_jita_buy,
-                'Input Cost (Jita Buy)': input_cost_jita_buy,
-                'Output Revenue (Jita Sell)': output_revenue_jita_sell,
-                'Inputs': ", ".join(input_details),
-                'Products': ", ".join(product_details),
-            })
-        
-        if (i + 1) % 50 == 0:
-            print(f"  ... processed {i+1}/{total_reactions} reactions")
+    # 4. Join the recipe tables once into flat arrays for the vectorized engine
+    engine = ProfitEngine(composite_reactions[['typeID', 'typeName']], industry_activity,
+                          activity_materials, activity_products, activity_id=11,
+                          time_multiplier=REACTION_TIME_MULTIPLIER)
+
+    # 5. Get live market data, pick the best hub per item and evaluate every reaction at once
+    prices = select_hub_prices(get_market_prices())
+    print("Calculating profitability for all composite reactions...")
+    profits = engine.compute(prices, BROKER_FEE, SALES_TAX)
+    results_df = pd.concat([profits, engine.describe(prices, typeid_to_name)], axis=1)
+
+    # Vertically integrated margin: inputs bought via buy orders or built, whichever is cheaper
+    print("Costing every item as build-or-buy over the full recipe graph...")
+    add_integrated_costs(results_df, engine, BuildCostModel(activity_materials, activity_products), prices,
+                         typeid_to_name)
 
+    # Avoid adding reactions with no market data
+    results_df = results_df[(results_df['input_cost_sell'] > 0) & (results_df['output_revenue_buy'] > 0)]
 
     # 6. Sort and Save to CSV
-    if not results:
+    if results_df.empty:
         print("No profitable reactions found or market data was incomplete.")
         return
 
     print("Sorting results and saving to CSV...")
-    results_df = pd.DataFrame(results)
-    
-    # Sort by the most optimistic profit scenario (order-based profit percentage)
-    results_df_sorted = results_df.sort_values(by='Net Profit per Week', ascending=False)
-    
-    # Format columns for better readability
-    for col in results_df_sorted.columns:
-        if 'Cost' in col or 'Revenue' in col or col.startswith('Net Profit'):
-            results_df_sorted[col] = results_df_sorted[col].apply(lambda x: f"{x:,.2f}")
-        elif 'Profit %' in col:
-            results_df_sorted[col] = results_df_sorted[col].apply(lambda x: f"{x:.2f}%")
-
-    results_df_sorted.to_csv(OUTPUT_CSV, index=False)
-    
-    print(f"--- Process complete. Results saved to {OUTPUT_CSV} ---")
+    # Sort by projected weekly profit of the order-based scenario
+    results_df_sorted = results_df.sort_values(by='net_profit_per_week', ascending=False)
+    # Numbers stay numeric in the files; formatting only happens for the console summary
+    write_csv_atomic(label_columns(results_df_sorted), OUTPUT_CSV, index=False)
+    run_dir = append_run(results_df_sorted, 'reactions')
+
+    print(f"\nTop {DISPLAY_TOP_N} reactions by weekly profit:")
+    top = format_for_display(results_df_sorted.head(DISPLAY_TOP_N),
+                             {k: DISPLAY_COLUMNS[k] for k in ('name', 'net_profit_per_week', 'profit_pct_orders')})
+    print(top.to_string(index=False))
+    print(f"--- Process complete. Results saved to {OUTPUT_CSV} and {run_dir} ---")
 
 
 if __name__ == "__main__":
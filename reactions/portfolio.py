@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+from calculator import (BROKER_FEE, SALES_TAX, REACTION_TIME_MULTIPLIER, load_sde_tables, filter_composite_reactions,
+                        get_market_prices, select_hub_prices, label_columns, write_csv_atomic)
+from profit_engine import ProfitEngine
+
+# --- CONFIGURATION ---
+PORTFOLIO_OUTPUT_CSV = 'reaction_portfolio.csv'
+
+# Reaction slots per character
+SLOT_POOLS = {'Main': 9}
+# ISK available to buy one week of inputs for every running slot (None for unlimited)
+CAPITAL_BUDGET = 10_000_000_000
+# Weekly supply of shared inputs, by type name (e.g. moon materials you mine yourself)
+INPUT_AVAILABILITY = {}
+# Cap on slots per reaction, e.g. to respect market depth (None for no cap)
+MAX_SLOTS_PER_REACTION = None
+
+# Capital is discretized into this many buckets for the DP; costs round up, so the budget is never exceeded
+CAPITAL_BUCKETS = 400
+LAGRANGE_ITERATIONS = 50
+# --- END OF CONFIGURATION ---
+
+
+def _knapsack(values, slot_cost, capital_cost, slots, buckets, max_count):
+    """
+    Bounded knapsack over (slots, capital buckets): picks a slot count per item maximizing total value.
+    slot_cost is 1 per slot; capital_cost is in buckets per slot. Returns the chosen counts per item.
+    """
+    n = len(values)
+    best = np.zeros((slots + 1, buckets + 1))
+    choice = np.zeros((n, slots + 1, buckets + 1), dtype=np.int16)
+    for i in range(n):
+        previous = best.copy()
+        for k in range(1, max_count[i] + 1):
+            s, c = k * slot_cost, k * capital_cost[i]
+            if s > slots or c > buckets:
+                break
+            candidate = np.full_like(previous, -np.inf)
+            candidate[s:, c:] = previous[:slots + 1 - s, :buckets + 1 - c] + k * values[i]
+            better = candidate > best
+            best = np.where(better, candidate, best)
+            choice[i][better] = k
+
+    counts = np.zeros(n, dtype=np.int64)
+    s, c = np.unravel_index(np.argmax(best), best.shape)
+    for i in range(n - 1, -1, -1):
+        k = choice[i, s, c]
+        counts[i] = k
+        s, c = s - k * slot_cost, c - k * capital_cost[i]
+    return counts
+
+
+def optimize_portfolio(profit_per_slot, capital_per_slot, usage_per_slot, slots, budget=None,
+                       availability=None, max_per_item=None):
+    """
+    Picks how many slots to give each reaction to maximize weekly profit.
+
+    profit_per_slot, capital_per_slot: (R,) weekly profit and input capital of one slot running a reaction.
+    usage_per_slot: (R, M) weekly consumption of each constrained input by one slot.
+    availability: (M,) weekly supply of those inputs.
+    Slot and capital limits are solved exactly by knapsack DP. Shared-input limits are handled with
+    Lagrangian multipliers on the inputs; every DP solution is repaired into a feasible one and the
+    best is polished by a one-slot swap search. Returns slot counts (R,).
+    """
+    n = len(profit_per_slot)
+    max_count = np.where(profit_per_slot > 0, slots if max_per_item is None else min(slots, max_per_item), 0)
+
+    if budget is None:
+        buckets, capital_cost = 0, np.zeros(n, dtype=np.int64)
+    else:
+        buckets = CAPITAL_BUCKETS
+        capital_cost = np.ceil(capital_per_slot / (budget / buckets)).astype(np.int64)
+
+    if availability is None or not len(availability):
+        usage_per_slot, availability = np.zeros((n, 0)), np.zeros(0)
+    # Constraint matrix over (inputs..., capital) so every check is one matrix product
+    limits = np.append(availability, np.inf if budget is None else budget) + 1e-6
+    usage = np.column_stack([usage_per_slot, capital_per_slot])
+
+    def feasible(counts):
+        return counts.sum() <= slots and np.all(counts @ usage <= limits)
+
+    def repair_and_fill(counts):
+        counts = counts.copy()
+        # Drop the least profitable slots that use an over-subscribed input until everything fits
+        while not feasible(counts):
+            over = counts @ usage > limits
+            using = (counts > 0) & (usage[:, over].sum(axis=1) > 0)
+            if not using.any():
+                using = counts > 0
+            counts[np.flatnonzero(using)[np.argmin(profit_per_slot[using])]] -= 1
+        # Fill the remaining slots with the most profitable reactions that still fit
+        for i in np.argsort(-profit_per_slot):
+            while counts[i] < max_count[i] and counts.sum() < slots:
+                counts[i] += 1
+                if not feasible(counts):
+                    counts[i] -= 1
+                    break
+        return counts
+
+    def improve(counts):
+        # Move single slots from one reaction to another while that raises profit and stays feasible
+        while True:
+            used = counts @ usage
+            best_gain, best_move = 1e-9, None
+            for i in np.flatnonzero(counts > 0):
+                fits = np.all(used - usage[i] + usage <= limits, axis=1) & (counts < max_count)
+                gain = np.where(fits, profit_per_slot - profit_per_slot[i], -np.inf)
+                gain[i] = -np.inf
+                j = int(np.argmax(gain))
+                if gain[j] > best_gain:
+                    best_gain, best_move = gain[j], (i, j)
+            if best_move is None:
+                return counts
+            counts[best_move[0]] -= 1
+            counts[best_move[1]] += 1
+
+    multipliers = np.zeros(len(availability))
+    scale = np.where(availability > 0, availability, 1.0)
+    best_counts = np.zeros(n, dtype=np.int64)
+    for iteration in range(LAGRANGE_ITERATIONS if len(availability) else 1):
+        adjusted = profit_per_slot - usage_per_slot @ multipliers
+        counts = _knapsack(adjusted, 1, capital_cost, slots, buckets, np.where(adjusted > 0, max_count, 0))
+        candidate = repair_and_fill(counts)
+        if candidate @ profit_per_slot > best_counts @ profit_per_slot:
+            best_counts = candidate
+        overuse = (counts @ usage_per_slot - availability) / scale
+        # Optimal only once it fits and no input with slack is still priced
+        if np.all(overuse <= 0) and np.all((multipliers == 0) | (overuse > -1e-9)):
+            break
+        # Subgradient step: raise the price of over-used inputs, relax the others
+        step = profit_per_slot.max(initial=1.0) / (iteration + 1)
+        multipliers = np.maximum(0.0, multipliers + step * overuse)
+
+    return improve(best_counts)
+
+
+def assign_to_characters(allocation, slot_pools):
+    """Splits the chosen slots across characters' slot pools, filling each pool in turn."""
+    free = dict(slot_pools)
+    assignments = []
+    for name, slots in zip(allocation['name'], allocation['slots']):
+        parts = []
+        for character in free:
+            take = min(slots, free[character])
+            if take:
+                parts.append(f"{character} x{take}")
+                free[character] -= take
+                slots -= take
+            if not slots:
+                break
+        assignments.append(", ".join(parts))
+    return assignments
+
+
+def build_portfolio(engine, profits, slot_pools, budget=None, availability=None, max_per_item=None):
+    """
+    Chooses the slot allocation for ProfitEngine results.
+    availability maps input typeIDs to weekly supply. Returns one row per chosen reaction.
+    """
+    slots = sum(slot_pools.values())
+    profit_per_slot = profits['net_profit_per_week'].to_numpy()
+    capital_per_slot = (profits['input_cost_buy'] * profits['runs_per_week']).to_numpy()
+
+    availability = availability or {}
+    constrained = np.array(list(availability), dtype=np.int64)
+    usage_per_slot = np.zeros((len(engine), len(constrained)))
+    for j, type_id in enumerate(constrained):
+        edges = engine.input_type_ids == type_id
+        usage_per_slot[:, j] = np.bincount(engine.input_bp_idx[edges], weights=engine.input_qty[edges],
+                                           minlength=len(engine))
+    usage_per_slot = (usage_per_slot * engine.runs_per_week[:, None])[profits.index]
+
+    counts = optimize_portfolio(profit_per_slot, capital_per_slot, usage_per_slot, slots, budget,
+                                np.array([availability[t] for t in constrained], dtype=np.float64), max_per_item)
+    chosen = counts > 0
+    allocation = pd.DataFrame({
+        'name': profits['name'].to_numpy()[chosen],
+        'slots': counts[chosen],
+        'net_profit_per_week': counts[chosen] * profit_per_slot[chosen],
+        'capital_per_week': counts[chosen] * capital_per_slot[chosen],
+    }).sort_values('net_profit_per_week', ascending=False).reset_index(drop=True)
+    allocation['characters'] = assign_to_characters(allocation, slot_pools)
+    return allocation
+
+
+def main():
+    """Optimizes the reaction slot allocation for the configured slots, budget and input supply."""
+    print("--- Starting EVE Reaction Portfolio Optimizer ---")
+    sde = load_sde_tables()
+    if sde is None:
+        return
+    inv_types, industry_activity, activity_materials, activity_products = sde
+    reactions = filter_composite_reactions(inv_types, industry_activity)
+    engine = ProfitEngine(reactions[['typeID', 'typeName']], industry_activity, activity_materials,
+                          activity_products, activity_id=11, time_multiplier=REACTION_TIME_MULTIPLIER)
+    profits = engine.compute(select_hub_prices(get_market_prices()), BROKER_FEE, SALES_TAX)
+    profits = profits[(profits['input_cost_sell'] > 0) & (profits['output_revenue_buy'] > 0)]
+
+    name_to_typeid = inv_types.set_index('typeName')['typeID'].to_dict()
+    availability = {}
+    for name, qty in INPUT_AVAILABILITY.items():
+        if name not in name_to_typeid:
+            print(f"Warning: input '{name}' not found, ignoring its availability limit.")
+            continue
+        availability[name_to_typeid[name]] = qty
+
+    print(f"Allocating {sum(SLOT_POOLS.values())} slots across {len(profits)} reactions...")
+    allocation = build_portfolio(engine, profits, SLOT_POOLS, CAPITAL_BUDGET, availability, MAX_SLOTS_PER_REACTION)
+
+    columns = {'name': 'Reaction Name', 'slots': 'Slots', 'net_profit_per_week': 'Net Profit per Week',
+               'capital_per_week': 'Capital per Week', 'characters': 'Characters'}
+    write_csv_atomic(label_columns(allocation, columns), PORTFOLIO_OUTPUT_CSV, index=False)
+    print(label_columns(allocation, columns).to_string(index=False))
+    print(f"\nTotal: {allocation['slots'].sum()} slots, {allocation['net_profit_per_week'].sum():,.2f} ISK/week profit, "
+          f"{allocation['capital_per_week'].sum():,.2f} ISK/week capital.")
+    print(f"--- Portfolio saved to {PORTFOLIO_OUTPUT_CSV} ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Memory-mapped price snapshot: the hub price table as flat arrays in one binary file.
+
+Any process can attach to the file without parsing anything: the arrays are numpy views on
+the mapping, so the OS shares the pages between every tool that reads the same snapshot.
+A typeID-indexed row index gives O(1) lookups. A new snapshot is published by writing a
+temporary file and renaming it over the old one; processes already attached keep reading
+the snapshot they mapped until they attach again.
+
+Layout (little-endian, every section 64-byte aligned):
+    header    magic, version, header size, row count, index size, written_at, expires,
+              then a JSON block with the hub names, statistic columns and percentile
+    index     int32[index size]        typeID -> row, -1 where there is no row
+    type_ids  int32[rows]
+    observed  float64[rows]            when each row's prices were observed (epoch seconds)
+    values    float64[rows, hubs, columns]
+"""
+import os
+import json
+import mmap
+import time
+import struct
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'EVEPRICE'
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct('<8sIIQQddI')
+ALIGN = 64
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _sections(header_size, index_size, rows, cells):
+    """Byte offsets of the index, type_ids, observed and values sections."""
+    index_at = header_size
+    type_ids_at = _aligned(index_at + 4 * index_size)
+    observed_at = _aligned(type_ids_at + 4 * rows)
+    values_at = _aligned(observed_at + 8 * rows)
+    return index_at, type_ids_at, observed_at, values_at, _aligned(values_at + 8 * rows * cells)
+
+
+def publish(hub_prices, path, percentile, written_at=None):
+    """
+    Writes a (hub, statistic)-column price table, indexed by type_id, as the snapshot at path.
+    The file is built next to path and renamed into place; if that fails, the temporary file is
+    removed. Returns path.
+    """
+    written_at = written_at or time.time()
+    hubs = list(hub_prices.columns.get_level_values('hub').unique())
+    columns = list(hub_prices.columns.get_level_values('side').unique())
+    hub_prices = hub_prices.reindex(columns=pd.MultiIndex.from_product([hubs, columns]))
+    type_ids = hub_prices.index.to_numpy(dtype=np.int64)
+    index_size = int(type_ids.max()) + 1 if len(type_ids) else 0
+
+    meta = json.dumps({'hubs': hubs, 'columns': columns, 'percentile': percentile}).encode('utf-8')
+    header_size = _aligned(HEADER.size + len(meta))
+    index_at, type_ids_at, observed_at, values_at, size = _sections(
+        header_size, index_size, len(type_ids), len(hubs) * len(columns))
+    expires = hub_prices.attrs.get('expires')
+
+    buffer = bytearray(size)
+    HEADER.pack_into(buffer, 0, MAGIC, SNAPSHOT_VERSION, header_size, len(type_ids), index_size,
+                     written_at, np.nan if expires is None else expires, len(meta))
+    buffer[HEADER.size:HEADER.size + len(meta)] = meta
+    index = np.frombuffer(buffer, dtype='<i4', count=index_size, offset=index_at)
+    index[:] = -1
+    index[type_ids] = np.arange(len(type_ids), dtype=np.int32)
+    np.frombuffer(buffer, dtype='<i4', count=len(type_ids), offset=type_ids_at)[:] = type_ids
+    np.frombuffer(buffer, dtype='<f8', count=len(type_ids), offset=observed_at)[:] = written_at
+    np.frombuffer(buffer, dtype='<f8', count=hub_prices.size, offset=values_at)[:] = \
+        hub_prices.to_numpy(dtype=np.float64).ravel()
+
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class PriceSnapshot:
+    """A read-only, zero-copy view of a published snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap.size() < HEADER.size:
+            raise ValueError(f"{path} is not a price snapshot.")
+        magic, version, header_size, rows, index_size, self.written_at, expires, meta_len = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} price snapshot.")
+        meta = json.loads(self._mmap[HEADER.size:HEADER.size + meta_len])
+        self.hubs, self.columns, self.percentile = meta['hubs'], meta['columns'], meta['percentile']
+        self.expires = None if np.isnan(expires) else expires
+
+        index_at, type_ids_at, observed_at, values_at, _ = _sections(
+            header_size, index_size, rows, len(self.hubs) * len(self.columns))
+        self.index = np.frombuffer(self._mmap, dtype='<i4', count=index_size, offset=index_at)
+        self.type_ids = np.frombuffer(self._mmap, dtype='<i4', count=rows, offset=type_ids_at)
+        self.observed = np.frombuffer(self._mmap, dtype='<f8', count=rows, offset=observed_at)
+        self.values = np.frombuffer(self._mmap, dtype='<f8', count=rows * len(self.hubs) * len(self.columns),
+                                    offset=values_at).reshape(rows, len(self.hubs), len(self.columns))
+
+    def __len__(self):
+        return len(self.type_ids)
+
+    def is_current(self):
+        """False once another snapshot has been published over the attached one."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns) == (self._stat.st_ino, self._stat.st_mtime_ns)
+
+    def row(self, type_id):
+        """The row of a typeID, or -1 if the snapshot has no prices for it."""
+        return int(self.index[type_id]) if 0 <= type_id < len(self.index) else -1
+
+    def get(self, type_id, hub, column='sell'):
+        """One statistic for one type at one hub; NaN if unknown."""
+        row = self.row(type_id)
+        if row < 0:
+            return np.nan
+        return float(self.values[row, self.hubs.index(hub), self.columns.index(column)])
+
+    def lookup(self, type_ids):
+        """Every statistic for an array of typeIDs, shape (n, hubs, columns); NaN rows for unknown types."""
+        type_ids = np.asarray(type_ids, dtype=np.int64)
+        known = (type_ids >= 0) & (type_ids < len(self.index))
+        rows = np.full(len(type_ids), -1, dtype=np.int64)
+        rows[known] = self.index[type_ids[known]]
+        result = self.values[np.maximum(rows, 0)]
+        result[rows < 0] = np.nan
+        return result
+
+    def to_frame(self, hubs=None):
+        """
+        The snapshot as the (hub, statistic)-column table order_statistics() returns. With all
+        hubs (the default) the frame's values are the mapped pages themselves.
+        """
+        values = self.values
+        names = self.hubs
+        if hubs is not None and list(hubs) != self.hubs:
+            names = list(hubs)
+            values = values[:, [self.hubs.index(hub) for hub in names], :]
+        frame = pd.DataFrame(values.reshape(len(self), -1),
+                             index=pd.Index(self.type_ids, name='type_id'),
+                             columns=pd.MultiIndex.from_product([names, self.columns], names=['hub', 'side']),
+                             copy=False)
+        frame.attrs['expires'] = self.expires
+        return frame
+
+    def close(self):
+        """Detaches; frames from to_frame() that still view the mapping keep it alive until they go away."""
+        self.index = self.type_ids = self.observed = self.values = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
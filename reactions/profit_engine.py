@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_WEEK = 7 * 24 * 3600
+
+# Columns produced by ProfitEngine.compute, all numpy float64
+RESULT_COLUMNS = [
+    'net_profit_per_week', 'net_profit_instant', 'profit_pct_instant', 'net_profit_orders',
+    'profit_pct_orders', 'input_cost_sell', 'output_revenue_buy', 'input_cost_buy',
+    'output_revenue_sell', 'runs_per_week',
+]
+
+# Column order of dense price arrays built by dense_prices()
+PRICE_COLUMNS = ['input_sell', 'input_buy', 'output_buy', 'output_sell']
+
+
+def dense_prices(prices, size):
+    """Turns a select_hub_prices() table into a (size, 4) float64 array indexed by typeID."""
+    table = np.zeros((size, len(PRICE_COLUMNS)), dtype=np.float64)
+    known = prices.index[prices.index < size]
+    table[known.to_numpy()] = prices.loc[known, PRICE_COLUMNS].fillna(0).to_numpy(dtype=np.float64)
+    return table
+
+
+def profit_columns(input_bp_idx, input_qty, in_prices, output_bp_idx, output_qty, out_prices,
+                   runs_per_week, broker_fee, sales_tax):
+    """
+    Core profit math over flat recipe edges.
+    in_prices holds (sell, buy) per input edge, out_prices (buy, sell) per output edge;
+    edge blueprint indexes must lie in [0, len(runs_per_week)).
+    """
+    n = len(runs_per_week)
+    input_cost_sell = np.bincount(input_bp_idx, weights=in_prices[:, 0] * input_qty, minlength=n)
+    input_cost_buy = np.bincount(input_bp_idx, weights=in_prices[:, 1] * input_qty, minlength=n)
+    output_revenue_buy = np.bincount(output_bp_idx, weights=out_prices[:, 0] * output_qty, minlength=n)
+    output_revenue_sell = np.bincount(output_bp_idx, weights=out_prices[:, 1] * output_qty, minlength=n)
+
+    # Scenario 1: Buy inputs instantly (sell orders), sell outputs instantly (buy orders)
+    net_profit_instant = output_revenue_buy * (1 - broker_fee - sales_tax) - input_cost_sell
+    # Scenario 2: Place buy orders for inputs, place sell orders for outputs
+    net_profit_orders = output_revenue_sell * (1 - broker_fee - sales_tax) - input_cost_buy
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_pct_instant = np.where(input_cost_sell > 0, net_profit_instant / input_cost_sell * 100, 0.0)
+        profit_pct_orders = np.where(input_cost_buy > 0, net_profit_orders / input_cost_buy * 100, 0.0)
+
+    return {
+        'net_profit_per_week': net_profit_orders * runs_per_week,
+        'net_profit_instant': net_profit_instant,
+        'profit_pct_instant': profit_pct_instant,
+        'net_profit_orders': net_profit_orders,
+        'profit_pct_orders': profit_pct_orders,
+        'input_cost_sell': input_cost_sell,
+        'output_revenue_buy': output_revenue_buy,
+        'input_cost_buy': input_cost_buy,
+        'output_revenue_sell': output_revenue_sell,
+        'runs_per_week': runs_per_week,
+    }
+
+
+class ProfitEngine:
+    """
+    Computes input costs, output revenues, profits and ROI for many blueprints/formulas at once.
+
+    The recipe tables are joined once into flat edge arrays (blueprint index, type ID, quantity),
+    so a price refresh only costs a reindex and a couple of bincounts.
+    """
+
+    def __init__(self, blueprints, industry_activity, activity_materials, activity_products,
+                 activity_id=11, time_multiplier=1.0):
+        """
+        blueprints: DataFrame with 'typeID' and 'typeName' of the blueprints/formulas to evaluate.
+        time_multiplier: scales SDE job times (skills, structure and rig time bonuses).
+        """
+        blueprints = blueprints.drop_duplicates('typeID').reset_index(drop=True)
+        self.activity_id = activity_id
+        self.blueprint_ids = blueprints['typeID'].to_numpy(dtype=np.int64)
+        self.names = blueprints['typeName'].to_numpy(dtype=object)
+        position = pd.Series(np.arange(len(blueprints)), index=self.blueprint_ids)
+
+        times = industry_activity[industry_activity['activityID'] == activity_id].drop_duplicates('typeID')
+        self.time = (times.set_index('typeID')['time'].reindex(self.blueprint_ids).fillna(0)
+                     .to_numpy(dtype=np.float64) * time_multiplier)
+        with np.errstate(divide='ignore'):
+            self.runs_per_week = np.where(self.time > 0, SECONDS_PER_WEEK / self.time, 0.0)
+
+        materials = activity_materials[(activity_materials['activityID'] == activity_id) &
+                                       activity_materials['typeID'].isin(position.index)]
+        self.input_bp_idx = position.reindex(materials['typeID']).to_numpy()
+        self.input_type_ids = materials['materialTypeID'].to_numpy(dtype=np.int64)
+        self.input_qty = materials['quantity'].to_numpy(dtype=np.float64)
+
+        products = activity_products[(activity_products['activityID'] == activity_id) &
+                                     activity_products['typeID'].isin(position.index)]
+        self.output_bp_idx = position.reindex(products['typeID']).to_numpy()
+        self.output_type_ids = products['productTypeID'].to_numpy(dtype=np.int64)
+        self.output_qty = products['quantity'].to_numpy(dtype=np.float64)
+
+    def __len__(self):
+        return len(self.blueprint_ids)
+
+    def _edge_prices(self, prices, type_ids, columns):
+        return prices.reindex(type_ids)[columns].fillna(0).to_numpy(dtype=np.float64)
+
+    def compute(self, prices, broker_fee, sales_tax, rows=None):
+        """
+        Evaluates blueprints against a select_hub_prices() table.
+        Returns a DataFrame of RESULT_COLUMNS indexed by engine row: every blueprint by default,
+        or only the given rows (e.g. from WhereUsed.rows_for) for incremental updates.
+        """
+        if rows is None:
+            rows = np.arange(len(self))
+            in_sel, out_sel = slice(None), slice(None)
+        else:
+            rows = np.unique(rows)
+            in_sel = np.isin(self.input_bp_idx, rows)
+            out_sel = np.isin(self.output_bp_idx, rows)
+
+        in_prices = self._edge_prices(prices, self.input_type_ids[in_sel], ['input_sell', 'input_buy'])
+        out_prices = self._edge_prices(prices, self.output_type_ids[out_sel], ['output_buy', 'output_sell'])
+        columns = profit_columns(np.searchsorted(rows, self.input_bp_idx[in_sel]), self.input_qty[in_sel], in_prices,
+                                 np.searchsorted(rows, self.output_bp_idx[out_sel]), self.output_qty[out_sel],
+                                 out_prices, self.runs_per_week[rows], broker_fee, sales_tax)
+        return pd.DataFrame({'blueprint_id': self.blueprint_ids[rows], 'name': self.names[rows], **columns},
+                            index=rows)
+
+    def where_used(self):
+        """Builds the reverse index from typeID to the engine rows that consume or produce it."""
+        return WhereUsed(np.concatenate([self.input_type_ids, self.output_type_ids]),
+                         np.concatenate([self.input_bp_idx, self.output_bp_idx]))
+
+    def integrated_input_cost(self, build_costs):
+        """Input cost per blueprint when every input is bought or built, whichever BuildCostModel found cheaper."""
+        unit_cost = build_costs['unit_cost'].reindex(self.input_type_ids).fillna(0).to_numpy(dtype=np.float64)
+        return np.bincount(self.input_bp_idx, weights=unit_cost * self.input_qty, minlength=len(self))
+
+    def describe(self, prices, typeid_to_name):
+        """
+        Builds the human-readable 'Name xQty @Hub' input/product lists per blueprint.
+        Only needed for display, so it is kept out of compute().
+        """
+        def join_edges(bp_idx, type_ids, qty, hub_column):
+            hubs = prices[hub_column].reindex(type_ids).to_numpy()
+            names = pd.Series(type_ids).map(typeid_to_name).fillna('Unknown').to_numpy()
+            text = [f"{name} x{q:g}" + (f" @{hub}" if isinstance(hub, str) else "")
+                    for name, q, hub in zip(names, qty, hubs)]
+            joined = pd.Series(text).groupby(bp_idx).agg(', '.join)
+            return joined.reindex(np.arange(len(self)), fill_value='').to_numpy()
+
+        return pd.DataFrame({
+            'inputs': join_edges(self.input_bp_idx, self.input_type_ids, self.input_qty, 'input_sell_hub'),
+            'products': join_edges(self.output_bp_idx, self.output_type_ids, self.output_qty, 'output_buy_hub'),
+        })
+
+
+class WhereUsed:
+    """
+    Reverse index from typeID to engine rows, stored as CSR arrays:
+    the rows for type_ids[i] are rows[indptr[i]:indptr[i + 1]].
+    """
+
+    def __init__(self, type_ids, rows):
+        pairs = np.unique(np.stack([type_ids, rows], axis=1), axis=0)
+        self.type_ids, starts = np.unique(pairs[:, 0], return_index=True)
+        self.indptr = np.append(starts, len(pairs))
+        self.rows = pairs[:, 1]
+
+    def rows_for(self, type_ids):
+        """Returns the sorted unique engine rows that use or produce any of the given types."""
+        type_ids = np.asarray(type_ids, dtype=np.int64)
+        if not len(self.type_ids) or not len(type_ids):
+            return np.empty(0, dtype=self.rows.dtype)
+        pos = np.searchsorted(self.type_ids, type_ids)
+        pos = pos[(pos < len(self.type_ids)) & (self.type_ids[np.minimum(pos, len(self.type_ids) - 1)] == type_ids)]
+        if not len(pos):
+            return np.empty(0, dtype=self.rows.dtype)
+        return np.unique(np.concatenate([self.rows[self.indptr[i]:self.indptr[i + 1]] for i in pos]))
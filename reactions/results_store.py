@@ -0,0 +1,89 @@
+import os
+import json
+import uuid
+import shutil
+import importlib.util
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# --- CONFIGURATION ---
+HISTORY_FOLDER = 'profit_history'
+# 'parquet' needs pyarrow; 'csv' writes a typed CSV next to a JSON schema. 'auto' picks parquet when available.
+HISTORY_FORMAT = 'auto'
+# --- END OF CONFIGURATION ---
+
+RUN_FORMAT = '%Y%m%dT%H%M%S.%fZ'
+# Partitions written before runs had microseconds
+LEGACY_RUN_FORMAT = '%Y%m%dT%H%M%SZ'
+
+
+def _history_format():
+    if HISTORY_FORMAT != 'auto':
+        return HISTORY_FORMAT
+    return 'parquet' if importlib.util.find_spec('pyarrow') else 'csv'
+
+
+def append_run(results, table, run_time=None, folder=HISTORY_FOLDER):
+    """
+    Appends one run of numeric results as a new partition folder:
+    <folder>/<table>/run=<UTC timestamp>-<suffix>/part-0.(parquet|csv)
+    Columns keep their dtypes; typed CSV partitions carry a part-0.schema.json.
+    The partition is written to a temporary folder and renamed into place, so readers
+    never see half a run. The random suffix keeps runs written in the same microsecond,
+    or by concurrent writers, apart. Returns the partition path.
+    """
+    run_time = run_time or datetime.now(timezone.utc)
+    run_dir = os.path.join(folder, table, f"run={run_time.strftime(RUN_FORMAT)}-{uuid.uuid4().hex[:8]}")
+    tmp_dir = f"{run_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir)
+
+    try:
+        results = results.reset_index(drop=True)
+        if _history_format() == 'parquet':
+            results.to_parquet(os.path.join(tmp_dir, 'part-0.parquet'), index=False)
+        else:
+            results.to_csv(os.path.join(tmp_dir, 'part-0.csv'), index=False, float_format='%.17g')
+            schema = {'columns': {col: str(dtype) for col, dtype in results.dtypes.items()}}
+            with open(os.path.join(tmp_dir, 'part-0.schema.json'), 'w') as f:
+                json.dump(schema, f, indent=2)
+        os.replace(tmp_dir, run_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return run_dir
+
+
+def _run_time(entry):
+    """UTC time of a run=<timestamp>[-<suffix>] partition folder."""
+    stamp = entry[len('run='):].split('-', 1)[0]
+    run_format = RUN_FORMAT if '.' in stamp else LEGACY_RUN_FORMAT
+    return datetime.strptime(stamp, run_format).replace(tzinfo=timezone.utc)
+
+
+def _read_partition(run_dir):
+    parquet_path = os.path.join(run_dir, 'part-0.parquet')
+    if os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path)
+    with open(os.path.join(run_dir, 'part-0.schema.json'), 'r') as f:
+        dtypes = json.load(f)['columns']
+    # Object columns are text; everything else is parsed straight into its recorded dtype
+    return pd.read_csv(os.path.join(run_dir, 'part-0.csv'),
+                       dtype={col: ('string' if dtype in ('object', 'str') else dtype) for col, dtype in dtypes.items()},
+                       keep_default_na=False, na_values=[''])
+
+
+def read_history(table, since=None, folder=HISTORY_FOLDER):
+    """Loads every run of a table (optionally only runs at or after `since`) with a 'run' timestamp column."""
+    table_dir = os.path.join(folder, table)
+    if not os.path.isdir(table_dir):
+        return pd.DataFrame()
+    frames = []
+    for entry in sorted(os.listdir(table_dir)):
+        if not entry.startswith('run=') or entry.endswith('.tmp'):
+            continue
+        run_time = _run_time(entry)
+        if since is not None and run_time < since:
+            continue
+        frames.append(_read_partition(os.path.join(table_dir, entry)).assign(run=pd.Timestamp(run_time)))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
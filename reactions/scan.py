@@ -0,0 +1,190 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from calculator import (SDE_FOLDER, BROKER_FEE, SALES_TAX, REACTION_TIME_MULTIPLIER, DISPLAY_COLUMNS,
+                        load_sde_tables, get_market_prices, select_hub_prices, label_columns, write_csv_atomic)
+from profit_engine import ProfitEngine, dense_prices, profit_columns
+from results_store import append_run
+
+# --- CONFIGURATION ---
+SCAN_OUTPUT_CSV = 'blueprint_profits.csv'
+SCAN_WORKERS = os.cpu_count() or 1
+SHARDS_PER_WORKER = 4
+
+# Scales manufacturing times from industryActivity (skills, structure and rig time bonuses)
+MANUFACTURING_TIME_MULTIPLIER = 1.0
+# --- END OF CONFIGURATION ---
+
+SCAN_ACTIVITIES = {1: 'Manufacturing', 11: 'Reactions'}
+
+# The scan doesn't run the build-or-buy costing, so the integrated columns are left out
+SCAN_DISPLAY_COLUMNS = {'rank': 'Rank', 'activity': 'Activity', 'name': 'Blueprint Name',
+                        **{k: v for k, v in DISPLAY_COLUMNS.items()
+                           if k not in ('name', 'input_cost_integrated', 'net_profit_integrated')}}
+
+
+class SharedArrays:
+    """Packs named numpy arrays into one shared memory block that worker processes attach to read-only."""
+
+    def __init__(self, arrays):
+        self.spec = {}
+        offset = 0
+        for name, array in arrays.items():
+            self.spec[name] = (array.dtype.str, array.shape, offset)
+            offset += -(-array.nbytes // 8) * 8  # keep every array 8-byte aligned
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+        for name, array in arrays.items():
+            dtype, shape, start = self.spec[name]
+            np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)[...] = array
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(shm_name, spec):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    views = {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+             for name, (dtype, shape, start) in spec.items()}
+    return shm, views
+
+
+def _scan_shard(shm_name, spec, bp_start, bp_stop, broker_fee, sales_tax):
+    """Worker: evaluates blueprints [bp_start, bp_stop) straight from the shared arrays."""
+    shm, arrays = _attach(shm_name, spec)
+    try:
+        in_lo, in_hi = np.searchsorted(arrays['input_bp_idx'], [bp_start, bp_stop])
+        out_lo, out_hi = np.searchsorted(arrays['output_bp_idx'], [bp_start, bp_stop])
+        in_prices = arrays['prices'][arrays['input_type_ids'][in_lo:in_hi]][:, [0, 1]]
+        out_prices = arrays['prices'][arrays['output_type_ids'][out_lo:out_hi]][:, [2, 3]]
+        columns = profit_columns(arrays['input_bp_idx'][in_lo:in_hi] - bp_start, arrays['input_qty'][in_lo:in_hi],
+                                 in_prices, arrays['output_bp_idx'][out_lo:out_hi] - bp_start,
+                                 arrays['output_qty'][out_lo:out_hi], out_prices,
+                                 arrays['runs_per_week'][bp_start:bp_stop].copy(), broker_fee, sales_tax)
+    finally:
+        del arrays
+        shm.close()
+    return bp_start, columns
+
+
+def build_scan_engines(inv_types, industry_activity, activity_materials, activity_products, industry_blueprints):
+    """Returns {activity_id: ProfitEngine} covering every manufacturing blueprint and every reaction formula."""
+    names = inv_types[['typeID', 'typeName']]
+    manufacturing_ids = industry_activity.loc[industry_activity['activityID'] == 1, 'typeID']
+    reaction_ids = industry_activity.loc[industry_activity['activityID'] == 11, 'typeID']
+    blueprints = {
+        1: names[names['typeID'].isin(industry_blueprints['typeID']) & names['typeID'].isin(manufacturing_ids)],
+        11: names[names['typeID'].isin(reaction_ids)],
+    }
+    multipliers = {1: MANUFACTURING_TIME_MULTIPLIER, 11: REACTION_TIME_MULTIPLIER}
+    return {activity_id: ProfitEngine(bps, industry_activity, activity_materials, activity_products,
+                                      activity_id=activity_id, time_multiplier=multipliers[activity_id])
+            for activity_id, bps in blueprints.items()}
+
+
+def _stack_engines(engines, prices):
+    """Concatenates the engines' edge arrays (sorted by blueprint) plus a dense price table for sharing."""
+    offsets = np.cumsum([0] + [len(e) for e in engines])
+    input_bp_idx = np.concatenate([e.input_bp_idx + off for e, off in zip(engines, offsets)])
+    output_bp_idx = np.concatenate([e.output_bp_idx + off for e, off in zip(engines, offsets)])
+    in_order = np.argsort(input_bp_idx, kind='stable')
+    out_order = np.argsort(output_bp_idx, kind='stable')
+    input_type_ids = np.concatenate([e.input_type_ids for e in engines])[in_order]
+    output_type_ids = np.concatenate([e.output_type_ids for e in engines])[out_order]
+    max_type_id = max(input_type_ids.max(initial=0), output_type_ids.max(initial=0), prices.index.to_numpy().max(initial=0))
+    return {
+        'input_bp_idx': input_bp_idx[in_order],
+        'input_type_ids': input_type_ids,
+        'input_qty': np.concatenate([e.input_qty for e in engines])[in_order],
+        'output_bp_idx': output_bp_idx[out_order],
+        'output_type_ids': output_type_ids,
+        'output_qty': np.concatenate([e.output_qty for e in engines])[out_order],
+        'runs_per_week': np.concatenate([e.runs_per_week for e in engines]),
+        'prices': dense_prices(prices, int(max_type_id) + 1),
+    }
+
+
+def scan(engines, prices, workers=SCAN_WORKERS, broker_fee=BROKER_FEE, sales_tax=SALES_TAX):
+    """
+    Ranks every blueprint of the given engines by weekly profit.
+    Blueprints are sharded across a process pool; recipe and price arrays are shared, not copied.
+    """
+    engine_list = list(engines.values())
+    total = sum(len(e) for e in engine_list)
+    shared = SharedArrays(_stack_engines(engine_list, prices))
+    try:
+        bounds = np.linspace(0, total, max(1, workers * SHARDS_PER_WORKER) + 1).astype(int)
+        shards = [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        columns = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_scan_shard, shared.name, shared.spec, lo, hi, broker_fee, sales_tax)
+                       for lo, hi in shards]
+            for future in futures:
+                bp_start, shard_columns = future.result()
+                columns[bp_start] = shard_columns
+    finally:
+        shared.release()
+
+    merged = {name: np.concatenate([columns[start][name] for start in sorted(columns)])
+              for name in next(iter(columns.values()))} if columns else {}
+    result = pd.DataFrame({
+        'activity': np.concatenate([[SCAN_ACTIVITIES[a]] * len(e) for a, e in engines.items()]),
+        'blueprint_id': np.concatenate([e.blueprint_ids for e in engine_list]),
+        'name': np.concatenate([e.names for e in engine_list]),
+        **merged,
+    })
+    result = result.sort_values('net_profit_per_week', ascending=False, kind='stable').reset_index(drop=True)
+    result.insert(0, 'rank', np.arange(1, len(result) + 1))
+    return result
+
+
+def main():
+    """Scans every manufacturing blueprint and reaction formula and saves one ranked table."""
+    print("--- Starting EVE Full-Market Profitability Scan ---")
+    sde = load_sde_tables()
+    if sde is None:
+        return
+    inv_types, industry_activity, activity_materials, activity_products = sde
+    blueprints_path = os.path.join(SDE_FOLDER, 'industryBlueprints.csv')
+    if os.path.exists(blueprints_path):
+        industry_blueprints = pd.read_csv(blueprints_path)
+    else:
+        # A compiled store only holds blueprints, so every type with an activity is one
+        industry_blueprints = industry_activity[['typeID']].drop_duplicates()
+
+    engines = build_scan_engines(inv_types, industry_activity, activity_materials, activity_products,
+                                 industry_blueprints)
+    for activity_id, engine in engines.items():
+        print(f"Found {len(engine)} {SCAN_ACTIVITIES[activity_id]} blueprints/formulas to scan.")
+
+    prices = select_hub_prices(get_market_prices())
+
+    print(f"Scanning on {SCAN_WORKERS} worker process(es)...")
+    start = time.perf_counter()
+    result = scan(engines, prices)
+    print(f"Scan finished in {time.perf_counter() - start:.2f}s.")
+
+    # Avoid listing blueprints with no market data
+    result = result[(result['input_cost_sell'] > 0) & (result['output_revenue_buy'] > 0)]
+
+    typeid_to_name = inv_types.set_index('typeID')['typeName'].to_dict()
+    descriptions = pd.concat([engine.describe(prices, typeid_to_name).assign(blueprint_id=engine.blueprint_ids)
+                              for engine in engines.values()]).drop_duplicates('blueprint_id')
+    result = result.merge(descriptions, on='blueprint_id', how='left')
+    result['rank'] = np.arange(1, len(result) + 1)
+
+    write_csv_atomic(label_columns(result, SCAN_DISPLAY_COLUMNS), SCAN_OUTPUT_CSV, index=False)
+    append_run(result, 'blueprints')
+    print(f"--- Scan complete. {len(result)} ranked blueprints saved to {SCAN_OUTPUT_CSV} ---")
+
+
+if __name__ == "__main__":
+    main()
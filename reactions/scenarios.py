@@ -0,0 +1,116 @@
+import itertools
+import numpy as np
+import pandas as pd
+
+from calculator import (BROKER_FEE, SALES_TAX, REACTION_TIME_MULTIPLIER, load_sde_tables, get_market_prices,
+                        select_hub_prices, filter_composite_reactions, write_csv_atomic)
+from profit_engine import ProfitEngine
+
+# --- CONFIGURATION ---
+SCENARIO_OUTPUT_CSV = 'scenario_robustness.csv'
+
+# Default what-if grid swept by main(); every combination is evaluated
+DEFAULT_GRID = {
+    'broker_fee': [0.01, 0.02, 0.03, 0.035],
+    'sales_tax': [0.0225, 0.03375, 0.045],
+    'input_price_shift': [-0.1, -0.05, 0.0, 0.05, 0.1],    # relative change of all input prices
+    'output_price_shift': [-0.1, -0.05, 0.0, 0.05, 0.1],   # relative change of all output prices
+    'material_bonus': [0.0, 0.022, 0.024],                 # e.g. refinery rigs (fraction of inputs saved)
+    'time_bonus': [0.0, 0.25],                             # fraction of job time saved
+    'basis': ['orders', 'instant'],
+}
+# --- END OF CONFIGURATION ---
+
+# Price columns of ProfitEngine.compute per basis: (input cost, output revenue)
+BASIS_COLUMNS = {
+    'instant': ('input_cost_sell', 'output_revenue_buy'),  # buy from sell orders, sell into buy orders
+    'orders': ('input_cost_buy', 'output_revenue_sell'),   # place buy orders and sell orders
+}
+
+
+def scenario_grid(broker_fee=(BROKER_FEE,), sales_tax=(SALES_TAX,), input_price_shift=(0.0,),
+                  output_price_shift=(0.0,), material_bonus=(0.0,), time_bonus=(0.0,), basis=('orders',)):
+    """Builds the cartesian product of the given parameter values, one row per scenario."""
+    params = {
+        'broker_fee': broker_fee, 'sales_tax': sales_tax, 'input_price_shift': input_price_shift,
+        'output_price_shift': output_price_shift, 'material_bonus': material_bonus,
+        'time_bonus': time_bonus, 'basis': basis,
+    }
+    return pd.DataFrame(list(itertools.product(*params.values())), columns=list(params))
+
+
+def sweep(profits, scenarios):
+    """
+    Evaluates every reaction under every scenario in one broadcast.
+    profits: ProfitEngine.compute() output (R rows); scenarios: scenario_grid() output (S rows).
+    Returns a dict of (S, R) float64 matrices: input_cost, output_revenue, net_profit,
+    net_profit_per_week and roi (percent).
+    """
+    basis = scenarios['basis'].to_numpy()[:, None]
+    input_cost = np.zeros((len(scenarios), len(profits)))
+    output_revenue = np.zeros((len(scenarios), len(profits)))
+    for name, (input_column, output_column) in BASIS_COLUMNS.items():
+        input_cost = np.where(basis == name, profits[input_column].to_numpy()[None, :], input_cost)
+        output_revenue = np.where(basis == name, profits[output_column].to_numpy()[None, :], output_revenue)
+
+    def column(name):
+        return scenarios[name].to_numpy(dtype=np.float64)[:, None]
+
+    input_cost = input_cost * (1 + column('input_price_shift')) * (1 - column('material_bonus'))
+    output_revenue = output_revenue * (1 + column('output_price_shift'))
+    net_profit = output_revenue * (1 - column('broker_fee') - column('sales_tax')) - input_cost
+    runs_per_week = profits['runs_per_week'].to_numpy()[None, :] / (1 - column('time_bonus'))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(input_cost > 0, net_profit / input_cost * 100, 0.0)
+    return {
+        'input_cost': input_cost,
+        'output_revenue': output_revenue,
+        'net_profit': net_profit,
+        'net_profit_per_week': net_profit * runs_per_week,
+        'roi': roi,
+    }
+
+
+def robustness(profits, matrices, metric='net_profit_per_week'):
+    """
+    Summarizes each reaction across all scenarios: worst case, 10th percentile, median, mean,
+    best case and the share of scenarios in which it is profitable. Sorted by worst case.
+    """
+    values = matrices[metric]
+    summary = pd.DataFrame({
+        'name': profits['name'].to_numpy(),
+        'worst': values.min(axis=0),
+        'p10': np.percentile(values, 10, axis=0),
+        'median': np.median(values, axis=0),
+        'mean': values.mean(axis=0),
+        'best': values.max(axis=0),
+        'profitable_share': (values > 0).mean(axis=0),
+    })
+    return summary.sort_values(['worst', 'median'], ascending=False).reset_index(drop=True)
+
+
+def main():
+    """Sweeps DEFAULT_GRID over every composite reaction and saves a robustness ranking."""
+    print("--- Starting EVE Reaction Scenario Sweep ---")
+    sde = load_sde_tables()
+    if sde is None:
+        return
+    inv_types, industry_activity, activity_materials, activity_products = sde
+    reactions = filter_composite_reactions(inv_types, industry_activity)
+    engine = ProfitEngine(reactions[['typeID', 'typeName']], industry_activity, activity_materials,
+                          activity_products, activity_id=11, time_multiplier=REACTION_TIME_MULTIPLIER)
+
+    profits = engine.compute(select_hub_prices(get_market_prices()), BROKER_FEE, SALES_TAX)
+    profits = profits[(profits['input_cost_sell'] > 0) & (profits['output_revenue_buy'] > 0)]
+
+    scenarios = scenario_grid(**DEFAULT_GRID)
+    print(f"Evaluating {len(profits)} reactions under {len(scenarios)} scenarios...")
+    summary = robustness(profits, sweep(profits, scenarios))
+
+    write_csv_atomic(summary, SCENARIO_OUTPUT_CSV, index=False, float_format='%.2f')
+    print(f"--- Sweep complete. Robustness ranking saved to {SCENARIO_OUTPUT_CSV} ---")
+
+
+if __name__ == "__main__":
+    main()
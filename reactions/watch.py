@@ -0,0 +1,111 @@
+import time
+import numpy as np
+import pandas as pd
+
+from calculator import (OUTPUT_CSV, BROKER_FEE, SALES_TAX, REACTION_TIME_MULTIPLIER, load_sde_tables,
+                        filter_composite_reactions, get_market_prices, refresh_market_prices, select_hub_prices,
+                        add_integrated_costs, label_columns, write_csv_atomic)
+from profit_engine import ProfitEngine, PRICE_COLUMNS
+from build_cost import BuildCostModel
+from results_store import append_run
+
+# --- CONFIGURATION ---
+# Fallback polling interval when ESI doesn't send an Expires header (market orders cache for 5 minutes)
+WATCH_INTERVAL_SECONDS = 300
+# Extra wait after Expires so the refreshed order book is actually published
+EXPIRES_GRACE_SECONDS = 10
+# Relative price change below which a type counts as unchanged (0.005 = 0.5%)
+MIN_PRICE_CHANGE = 0.005
+# --- END OF CONFIGURATION ---
+
+
+def changed_types(old_prices, new_prices, tolerance=MIN_PRICE_CHANGE):
+    """Returns the typeIDs whose selected prices moved by more than the relative tolerance."""
+    index = old_prices.index.union(new_prices.index)
+    old = old_prices.reindex(index)[PRICE_COLUMNS].fillna(0).to_numpy(dtype=np.float64)
+    new = new_prices.reindex(index)[PRICE_COLUMNS].fillna(0).to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moved = np.abs(new - old) > tolerance * np.abs(old)
+    return index[moved.any(axis=1)]
+
+
+def write_results(engine, build_model, results, prices, typeid_to_name):
+    """
+    Ranks the current results with calculator.py's columns, atomically replaces OUTPUT_CSV and appends
+    the run to the history. The build-or-buy columns depend on the whole recipe graph, so they are
+    recomputed in full for every price snapshot.
+    """
+    ranked = pd.concat([results, engine.describe(prices, typeid_to_name).set_index(results.index)], axis=1)
+    add_integrated_costs(ranked, engine, build_model, prices, typeid_to_name)
+    ranked = ranked[(ranked['input_cost_sell'] > 0) & (ranked['output_revenue_buy'] > 0)]
+    ranked = ranked.sort_values(by='net_profit_per_week', ascending=False)
+    write_csv_atomic(label_columns(ranked), OUTPUT_CSV, index=False)
+    append_run(ranked, 'reactions')
+
+
+def _seconds_until_refresh(hub_prices):
+    expires = hub_prices.attrs.get('expires')
+    if not expires:
+        return WATCH_INTERVAL_SECONDS
+    return max(expires - time.time() + EXPIRES_GRACE_SECONDS, EXPIRES_GRACE_SECONDS)
+
+
+def watch():
+    """
+    Keeps the reaction table up to date: refreshes prices whenever ESI's cache expires and
+    recomputes only the reactions that consume or produce a type whose price moved.
+    """
+    print("--- Starting EVE Reaction Profitability Watcher ---")
+    sde = load_sde_tables()
+    if sde is None:
+        return
+    inv_types, industry_activity, activity_materials, activity_products = sde
+    reactions = filter_composite_reactions(inv_types, industry_activity)
+    engine = ProfitEngine(reactions[['typeID', 'typeName']], industry_activity, activity_materials,
+                          activity_products, activity_id=11, time_multiplier=REACTION_TIME_MULTIPLIER)
+    where_used = engine.where_used()
+    build_model = BuildCostModel(activity_materials, activity_products)
+    typeid_to_name = inv_types.set_index('typeID')['typeName'].to_dict()
+
+    hub_prices = get_market_prices()
+    prices = select_hub_prices(hub_prices)
+    # Prices each row was last computed with; small drifts accumulate against this baseline
+    baseline = prices
+    results = engine.compute(prices, BROKER_FEE, SALES_TAX)
+    write_results(engine, build_model, results, prices, typeid_to_name)
+    print(f"Watching {len(engine)} reactions. Results are kept in {OUTPUT_CSV}.")
+
+    while True:
+        wait = _seconds_until_refresh(hub_prices)
+        print(f"Next price refresh in {wait:.0f}s.")
+        time.sleep(wait)
+
+        # Prices saved by another tool after ours expired are reused rather than downloaded again
+        previous = hub_prices
+        hub_prices = refresh_market_prices(newer_than=previous.attrs.get('expires') or previous.attrs.get('written_at'))
+        if hub_prices.empty or hub_prices.attrs.get('failed_hubs'):
+            print("No complete price fetch. Keeping the current results.")
+            hub_prices.attrs['expires'] = None
+            continue
+        prices = select_hub_prices(hub_prices)
+
+        moved = changed_types(baseline, prices)
+        if not len(moved):
+            print("No meaningful price moves. Nothing to recompute.")
+            continue
+        baseline = pd.concat([baseline.drop(moved, errors='ignore'), prices.reindex(moved)])
+        rows = where_used.rows_for(moved)
+        if not len(rows):
+            print(f"{len(moved)} type(s) moved, none used by a reaction. Nothing to recompute.")
+            continue
+
+        results.loc[rows] = engine.compute(prices, BROKER_FEE, SALES_TAX, rows=rows)
+        write_results(engine, build_model, results, prices, typeid_to_name)
+        print(f"{len(moved)} type(s) moved: recomputed {len(rows)}/{len(engine)} reactions.")
+
+
+if __name__ == "__main__":
+    try:
+        watch()
+    except KeyboardInterrupt:
+        print("\nWatcher stopped.")
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+from email.utils import parsedate_to_datetime
+
+# --- CONFIGURATION ---
+ASSET_SNAPSHOT_FOLDER = 'asset_snapshots'
+# --- END OF CONFIGURATION ---
+
+
+def parse_expires(headers):
+    """Epoch seconds of an HTTP Expires header, or None."""
+    try:
+        return parsedate_to_datetime(headers['Expires']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class AssetSnapshot:
+    """
+    The last asset fetch for one character or corporation, persisted with each page's ETag and Expires.
+
+    While every page is unexpired the snapshot is served as-is; afterwards pages are
+    revalidated with If-None-Match and a 304 keeps the stored page. Pages fetched in a refresh
+    replace the stored ones only once every page has arrived. The changes between the last
+    two fetches are kept with the snapshot, so callers see them while it is served as-is.
+    """
+
+    def __init__(self, owner_name, folder=ASSET_SNAPSHOT_FOLDER):
+        safe_name = ''.join(c if c.isalnum() else '_' for c in owner_name)
+        self.path = os.path.join(folder, f"{safe_name}.json")
+        self.character_id = None
+        self.corporation_id = None  # Only for corporation snapshots
+        self.pages = {}        # page number -> {'etag', 'expires', 'assets'}
+        self.inventory = {}    # typeID -> quantity at the last fetch
+        self.changes = {}      # typeID -> quantity change between the last two fetches
+        self.fetched_at = None
+        self._pending = {}     # Pages of the refresh in progress, see store_page() and commit()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                self.character_id = data.get('character_id')
+                self.corporation_id = data.get('corporation_id')
+                self.pages = {int(page): entry for page, entry in data.get('pages', {}).items()}
+                self.inventory = {int(t): q for t, q in data.get('inventory', {}).items()}
+                self.changes = {int(t): q for t, q in data.get('changes', {}).items()}
+                self.fetched_at = data.get('fetched_at')
+            except (json.JSONDecodeError, ValueError, AttributeError):
+                print("Asset snapshot is corrupted; it will be rebuilt.")
+
+    def is_fresh(self, now=None):
+        """True when every stored page is still within its Expires time."""
+        now = now or time.time()
+        return bool(self.pages) and all((entry.get('expires') or 0) > now for entry in self.pages.values())
+
+    def etag(self, page):
+        return self.pages.get(page, {}).get('etag')
+
+    def store_page(self, page, headers, assets=None):
+        """
+        Records a 200 (with assets) or a 304 (assets=None keeps the stored page) response.
+        The stored pages are unchanged until commit().
+        """
+        stored = self.pages.get(page, {'assets': []})
+        self._pending[page] = {'assets': stored['assets'] if assets is None else assets,
+                               'etag': headers.get('ETag') or stored.get('etag'),
+                               'expires': parse_expires(headers)}
+
+    def commit(self, page_count):
+        """Replaces the stored pages with the ones recorded since the last commit, up to the current page count."""
+        self.pages = {page: entry for page, entry in self._pending.items() if page <= page_count}
+        self._pending = {}
+
+    def discard(self):
+        """Forgets the pages recorded since the last commit, e.g. after a failed refresh."""
+        self._pending = {}
+
+    def assets(self):
+        for page in sorted(self.pages):
+            yield from self.pages[page]['assets']
+
+    def diff(self, inventory):
+        """Compact change set against the previous inventory: {typeID: quantity delta}, zeros omitted."""
+        changes = {}
+        for type_id in set(self.inventory) | set(inventory):
+            delta = inventory.get(type_id, 0) - self.inventory.get(type_id, 0)
+            if delta:
+                changes[type_id] = delta
+        return changes
+
+    def save(self, inventory):
+        """Persists the pages, the new inventory and its changes against the previous one atomically."""
+        # The very first snapshot has nothing to compare against
+        self.changes = self.diff(inventory) if self.fetched_at else {}
+        self.inventory = dict(inventory)
+        self.fetched_at = time.time()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'character_id': self.character_id, 'corporation_id': self.corporation_id,
+                       'fetched_at': self.fetched_at,
+                       'pages': {str(page): entry for page, entry in self.pages.items()},
+                       'inventory': {str(t): q for t, q in self.inventory.items()},
+                       'changes': {str(t): q for t, q in self.changes.items()}}, f)
+        os.replace(tmp_path, self.path)
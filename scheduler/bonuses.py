@@ -0,0 +1,181 @@
+"""
+Material and time efficiency: blueprint ME/TE, structure role bonuses and rigs.
+
+A BonusEngine is one setting of blueprint levels and structure profiles. It caches each
+blueprint activity's inputs as arrays with their combined material multipliers and the adjusted
+time per run, and applies EVE's per-job rounding, where a job of `runs` runs needs
+max(runs, ceil(round(runs * quantity * multiplier, 2))) of each input. rounded_chain()
+evaluates that rule for whole chains, one vectorized pass per level of the chain.
+"""
+import math
+import numpy as np
+
+# --- CONFIGURATION ---
+# Blueprint levels used where BLUEPRINT_LEVELS has no entry (reaction formulas can't be researched)
+DEFAULT_ME = 0
+DEFAULT_TE = 0
+# Blueprint name -> (ME, TE), e.g. {'Eris Blueprint': (2, 4)}
+BLUEPRINT_LEVELS = {}
+# Where each activity runs: (structure, rig tier or None, security). Structures are the keys of
+# STRUCTURE_BONUSES, rig tiers 'T1'/'T2', security 'highsec', 'lowsec' or 'nullsec' (also wormholes).
+STRUCTURE_PROFILES = {
+    1: ('Station', None, 'highsec'),    # Manufacturing
+    11: ('Station', None, 'highsec'),   # Reactions
+}
+# Skill time multipliers per activity, e.g. 0.8 * 0.85 for Industry V and Advanced Industry V
+SKILL_TIME_MULTIPLIERS = {1: 1.0, 11: 1.0}
+# --- END OF CONFIGURATION ---
+
+# Structure -> {activity: (material reduction %, time reduction %)}
+STRUCTURE_BONUSES = {
+    'Station': {},
+    'Raitaru': {1: (1.0, 15.0)},
+    'Azbel': {1: (1.0, 20.0)},
+    'Sotiyo': {1: (1.0, 30.0)},
+    'Athanor': {},
+    'Tatara': {11: (0.0, 25.0)},
+}
+# Rig tier -> (material reduction %, time reduction %) before the security multiplier
+RIG_BONUSES = {None: (0.0, 0.0), 'T1': (2.0, 20.0), 'T2': (2.4, 24.0)}
+SECURITY_MULTIPLIERS = {'highsec': 1.0, 'lowsec': 1.9, 'nullsec': 2.1}
+RESEARCHABLE_ACTIVITIES = {1}
+
+
+def job_quantities(runs, quantities, multipliers):
+    """EVE's per-job rounding: each input of a job needs max(runs, ceil(round(runs * qty * multiplier, 2)))."""
+    runs = np.asarray(runs, dtype=np.float64)
+    return np.maximum(runs, np.ceil(np.round(runs * quantities * multipliers, 2)))
+
+
+class Recipe:
+    """One blueprint activity under a BonusEngine's setting: inputs, their multipliers and the time per run."""
+    __slots__ = ('material_ids', 'quantities', 'multiplier', 'time')
+
+    def __init__(self, material_ids, quantities, multiplier, time):
+        self.material_ids = material_ids
+        self.quantities = quantities
+        self.multiplier = multiplier
+        self.time = time
+
+
+class BonusEngine:
+    """Adjusted recipes and per-job quantities for one setting of blueprint levels and structures."""
+
+    def __init__(self, sde, levels=None, profiles=None, default_me=DEFAULT_ME, default_te=DEFAULT_TE,
+                 skill_time_multipliers=None):
+        self.sde = sde
+        self.default_me, self.default_te = default_me, default_te
+        self.levels = {}
+        for name, level in (BLUEPRINT_LEVELS if levels is None else levels).items():
+            type_id = sde.get_type_id(name) if isinstance(name, str) else name
+            if type_id is None:
+                print(f"Warning: blueprint '{name}' in BLUEPRINT_LEVELS not found; using the default levels.")
+                continue
+            self.levels[int(type_id)] = level
+        profiles = STRUCTURE_PROFILES if profiles is None else profiles
+        skills = SKILL_TIME_MULTIPLIERS if skill_time_multipliers is None else skill_time_multipliers
+        self.structure_multipliers = {}  # activity -> (material, time) multiplier from structure, rig and skills
+        for activity_id in set(profiles) | set(skills):
+            structure, rig, security = profiles.get(activity_id, ('Station', None, 'highsec'))
+            role_me, role_te = STRUCTURE_BONUSES[structure].get(activity_id, (0.0, 0.0))
+            rig_me, rig_te = RIG_BONUSES[rig]
+            scale = SECURITY_MULTIPLIERS[security]
+            self.structure_multipliers[activity_id] = (
+                (1 - role_me / 100) * (1 - rig_me * scale / 100),
+                (1 - role_te / 100) * (1 - rig_te * scale / 100) * skills.get(activity_id, 1.0))
+        self._recipes = {}
+
+    def multipliers(self, blueprint_type_id, activity_id):
+        """(material, time) multipliers for a blueprint activity: blueprint levels times structure, rig and skills."""
+        material, time = self.structure_multipliers.get(activity_id, (1.0, 1.0))
+        if activity_id in RESEARCHABLE_ACTIVITIES:
+            level = self.levels.get(int(blueprint_type_id))
+            if level is None:
+                # Invented blueprints (with an invention.InventionSde) come out at the invented levels
+                invented = int(blueprint_type_id) in getattr(self.sde, 'inventions', ())
+                level = self.sde.invented_levels if invented else (self.default_me, self.default_te)
+            me, te = level
+            material *= 1 - me / 100
+            time *= 1 - te / 100
+        return material, time
+
+    def recipe(self, blueprint_type_id, activity_id):
+        """The adjusted Recipe of a blueprint activity, built once per engine."""
+        key = (int(blueprint_type_id), int(activity_id))
+        recipe = self._recipes.get(key)
+        if recipe is None:
+            pairs = list(self.sde.iter_materials(*key))
+            material, time = self.multipliers(*key)
+            material_ids = np.array([m for m, _ in pairs], dtype=np.int64)
+            # Runs of the blueprint itself (invented copies) aren't reduced by material bonuses
+            recipe = self._recipes[key] = Recipe(
+                material_ids, np.array([q for _, q in pairs], dtype=np.float64),
+                np.where(material_ids == key[0], 1.0, material), self.sde.get_production_time(*key) * time)
+        return recipe
+
+    def iter_materials(self, blueprint_type_id, activity_id):
+        """Yields (materialTypeID, quantity per run with bonuses) for the fractional-run engines."""
+        recipe = self.recipe(blueprint_type_id, activity_id)
+        return zip(recipe.material_ids.tolist(), (recipe.quantities * recipe.multiplier).tolist())
+
+    def get_production_time(self, blueprint_type_id, activity_id):
+        """Seconds per run with bonuses."""
+        return self.recipe(blueprint_type_id, activity_id).time
+
+    def job_materials(self, blueprint_type_id, activity_id, runs):
+        """{materialTypeID: quantity} one job of `runs` runs consumes, with EVE's per-job rounding."""
+        recipe = self.recipe(blueprint_type_id, activity_id)
+        quantities = job_quantities(runs, recipe.quantities, recipe.multiplier)
+        return dict(zip(recipe.material_ids.tolist(), quantities.astype(np.int64).tolist()))
+
+    def job_time(self, blueprint_type_id, activity_id, runs):
+        """Duration of one job of `runs` runs in whole seconds."""
+        return math.ceil(self.recipe(blueprint_type_id, activity_id).time * runs)
+
+    def rounded_chain(self, jobs, product_id, quantity):
+        """
+        Whole jobs for a chain. jobs maps product typeID -> (blueprint typeID, activityID, products per run)
+        for every item built in the chain; anything else is bought. Each job gets
+        ceil(demand / products per run) runs once all of its consumers are known, and its inputs follow
+        from those runs with per-job rounding. Returns ({product typeID: runs}, {raw typeID: quantity}).
+        """
+        product_ids = list(jobs)
+        node_of = {product: i for i, product in enumerate(product_ids)}
+        if product_id not in node_of:
+            return {}, {int(product_id): quantity}
+        recipes = [self.recipe(jobs[product][0], jobs[product][1]) for product in product_ids]
+        per_run = np.array([jobs[product][2] for product in product_ids], dtype=np.float64)
+
+        # Each input is either another job in the chain (node >= 0) or bought (raw index >= 0)
+        raw_ids = {}
+        child_nodes, child_raws = [], []
+        for recipe in recipes:
+            nodes = np.array([node_of.get(m, -1) for m in recipe.material_ids.tolist()], dtype=np.int64)
+            child_nodes.append(nodes)
+            child_raws.append(np.array([-1 if n >= 0 else raw_ids.setdefault(m, len(raw_ids))
+                                        for m, n in zip(recipe.material_ids.tolist(), nodes.tolist())],
+                                       dtype=np.int64))
+        pending = np.zeros(len(product_ids), dtype=np.int64)  # consumers not yet costed
+        for nodes in child_nodes:
+            np.add.at(pending, nodes[nodes >= 0], 1)
+
+        demand = np.zeros(len(product_ids))
+        demand[node_of[product_id]] = quantity
+        runs = np.zeros(len(product_ids))
+        raw = np.zeros(len(raw_ids))
+        level = np.flatnonzero(pending == 0)
+        while len(level):
+            runs[level] = np.ceil(demand[level] / per_run[level])
+            lengths = [len(recipes[i].material_ids) for i in level]
+            quantities = job_quantities(np.repeat(runs[level], lengths),
+                                        np.concatenate([recipes[i].quantities for i in level]),
+                                        np.concatenate([recipes[i].multiplier for i in level]))
+            nodes = np.concatenate([child_nodes[i] for i in level])
+            raws = np.concatenate([child_raws[i] for i in level])
+            np.add.at(demand, nodes[nodes >= 0], quantities[nodes >= 0])
+            np.add.at(raw, raws[raws >= 0], quantities[raws >= 0])
+            np.subtract.at(pending, nodes[nodes >= 0], 1)
+            level = np.unique(nodes[(nodes >= 0)][pending[nodes[nodes >= 0]] == 0])
+
+        raw_by_id = {type_id: raw[i] for type_id, i in raw_ids.items() if raw[i] > 0}
+        return {product: int(r) for product, r in zip(product_ids, runs.tolist()) if r > 0}, raw_by_id
@@ -0,0 +1,61 @@
+"""
+Quick chain and requirement lookup from the compiled SDE store, without pandas.
+
+Usage (from the scheduler folder):
+    python chain_query.py Eris 10
+    python chain_query.py --compile        # rebuild the store from ../static_data
+"""
+import sys
+import math
+import argparse
+
+from sde_store import SDE_FOLDER, load_sde, compile_store
+from dependency_calculator import DependencyCalculator
+from bonuses import BonusEngine
+from invention import with_invention
+from name_index import describe_miss
+
+ACTIVITY_NAMES = {1: 'Manufacturing', 11: 'Reactions', 8: 'Invention', 5: 'Copying'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the raw materials and jobs needed for a product.")
+    parser.add_argument('product', nargs='?', help="Product name, e.g. Eris")
+    parser.add_argument('quantity', nargs='?', type=int, default=1)
+    parser.add_argument('--sde', default=SDE_FOLDER, help="SDE folder")
+    parser.add_argument('--compile', action='store_true', help="Rebuild the compiled store and exit")
+    args = parser.parse_args()
+
+    if args.compile:
+        print(f"SDE store written to {compile_store(args.sde)}")
+        return
+    if not args.product:
+        parser.error("a product name is required")
+
+    sde = with_invention(load_sde(args.sde))
+    match = sde.name_index.resolve(args.product)
+    if match is None:
+        print(describe_miss(args.product, sde.name_index.suggest(args.product)))
+        sys.exit(1)
+    product = match[1]
+    dep_calc = DependencyCalculator(sde, BonusEngine(sde))
+    raws, components = dep_calc.get_total_requirements(product, args.quantity)
+    if not components:
+        sys.exit(1)
+
+    print(f"\n--- Raw Materials for {args.quantity} x {product} (Multibuy Format) ---")
+    for name, qty in sorted(raws.items()):
+        print(f"{name} {math.ceil(qty)}")
+
+    for activity_id, activity_name in ACTIVITY_NAMES.items():
+        jobs = {name: c for name, c in components.items() if c.activity_id == activity_id}
+        if not jobs:
+            continue
+        print(f"\n--- {activity_name} Jobs ---")
+        for name, details in sorted(jobs.items()):
+            runs = math.ceil(details.needed / details.products_per_run)
+            print(f"{name:<40} | {runs:>8} run(s) | {runs * details.time_per_run / 3600:>10.1f} h")
+
+
+if __name__ == '__main__':
+    main()
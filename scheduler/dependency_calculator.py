@@ -1,8 +1,33 @@
 from collections import defaultdict
+from instrumentation import metrics
+from invention import with_invention, expected_output
+from name_index import describe_miss
+
+
+class Component:
+    """Requirements for one intermediate product. Slotted, so many concurrent plans stay small."""
+    __slots__ = ('type_id', 'needed', 'products_per_run', 'activity_id', 'time_per_run')
+
+    def __init__(self, type_id, products_per_run, activity_id, time_per_run, needed=0):
+        self.type_id = type_id
+        self.needed = needed
+        self.products_per_run = products_per_run
+        self.activity_id = activity_id
+        self.time_per_run = time_per_run
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
 
 class DependencyCalculator:
-    def __init__(self, sde_loader):
-        self.sde = sde_loader
+    def __init__(self, sde_loader, bonuses=None):
+        """
+        bonuses: an optional BonusEngine; without one, recipes use the raw SDE quantities and times.
+        The SDE is wrapped in an InventionSde, so T2 chains include invention and copying.
+        """
+        self.sde = with_invention(sde_loader)
+        self.bonuses = bonuses
+        self.recipes = bonuses or self.sde
         # This is the base list of minerals and blueprint components we always buy.
         self.raw_materials = {
             'Tritanium', 'Pyerite', 'Mexallon', 'Isogen',
@@ -27,12 +52,17 @@ class DependencyCalculator:
 
     def get_total_requirements(self, final_product_name, quantity=1):
         """Calculates the total raw materials and intermediate components needed for a final product."""
+        with metrics.span('traversal'):
+            return self._get_total_requirements(final_product_name, quantity)
+
+    def _get_total_requirements(self, final_product_name, quantity):
         self.total_components = {}
         self.processed_components_memo = set()
         
         final_product_id = self.sde.get_type_id(final_product_name)
         if not final_product_id:
-            print(f"Error: Final product '{final_product_name}' not found.")
+            suggestions = self.sde.name_index.suggest(final_product_name)
+            print(f"Error: Final product {describe_miss(final_product_name, suggestions)}")
             return {}, {}
 
         # The main recursive call to build the dependency tree
@@ -45,7 +75,7 @@ class DependencyCalculator:
             for mat_name, qty_per_run in materials.items():
                 if mat_name in self.raw_materials:
                     # Calculate how many runs of the component are needed
-                    runs_needed = details['needed'] / details.get('products_per_run', 1)
+                    runs_needed = details.needed / details.products_per_run
                     total_raws[mat_name] += runs_needed * qty_per_run
 
         return dict(total_raws), self.total_components
@@ -63,26 +93,27 @@ class DependencyCalculator:
             self.raw_materials.add(product_name)
             return
 
-        blueprint_id = blueprint_info['typeID']
-        activity_id = blueprint_info['activityID']
-        products_per_run = blueprint_info['quantity']
+        blueprint_id = int(blueprint_info['typeID'])
+        activity_id = int(blueprint_info['activityID'])
+        # For inventions, the expected blueprint runs per attempt
+        products_per_run = expected_output(blueprint_info)
 
         if product_name not in self.total_components:
-            self.total_components[product_name] = {
-                'needed': 0, 'products_per_run': products_per_run, 'activity_id': activity_id,
-                'time_per_run': self.sde.get_production_time(blueprint_id, activity_id)
-            }
+            self.total_components[product_name] = Component(
+                int(product_id), products_per_run, activity_id,
+                self.recipes.get_production_time(blueprint_id, activity_id))
         
-        self.total_components[product_name]['needed'] += required_quantity
+        self.total_components[product_name].needed += required_quantity
         
-        if blueprint_id in self.processed_components_memo:
+        # Keyed by activity too: a T1 blueprint is both manufactured from and copied
+        if (blueprint_id, activity_id) in self.processed_components_memo:
+            metrics.count('cache_hits', cache='processed_components')
             return
-        self.processed_components_memo.add(blueprint_id)
+        self.processed_components_memo.add((blueprint_id, activity_id))
 
-        materials = self.sde.get_materials(blueprint_id, activity_id)
-        for _, material in materials.iterrows():
-            total_material_needed = (required_quantity / products_per_run) * material['quantity']
-            self._process_component(material['materialTypeID'], total_material_needed)
+        for material_id, quantity in self.recipes.iter_materials(blueprint_id, activity_id):
+            total_material_needed = (required_quantity / products_per_run) * quantity
+            self._process_component(material_id, total_material_needed)
             
     def get_direct_materials_for_product_name(self, product_name):
         """Returns a dict of direct materials and quantities for one run of a product."""
@@ -92,12 +123,23 @@ class DependencyCalculator:
         blueprint_info = self.sde.get_blueprint_for_product(product_id)
         if blueprint_info is None: return {}
 
-        materials_df = self.sde.get_materials(blueprint_info['typeID'], blueprint_info['activityID'])
-        
         materials_dict = {}
-        for _, material in materials_df.iterrows():
-            mat_name = self.sde.get_type_name(material['materialTypeID'])
-            materials_dict[mat_name] = material['quantity']
+        for material_id, quantity in self.recipes.iter_materials(blueprint_info['typeID'], blueprint_info['activityID']):
+            mat_name = self.sde.get_type_name(material_id)
+            materials_dict[mat_name] = quantity
         
         return materials_dict
 
+    def get_job_materials_for_product_name(self, product_name, runs):
+        """Returns a dict of the materials one job of `runs` runs consumes, with EVE's per-job rounding."""
+        if self.bonuses is None:
+            return {mat_name: qty * runs for mat_name, qty in self.get_direct_materials_for_product_name(product_name).items()}
+
+        product_id = self.sde.get_type_id(product_name)
+        if not product_id: return {}
+        blueprint_info = self.sde.get_blueprint_for_product(product_id)
+        if blueprint_info is None: return {}
+
+        materials = self.bonuses.job_materials(blueprint_info['typeID'], blueprint_info['activityID'], runs)
+        return {self.sde.get_type_name(material_id): qty for material_id, qty in materials.items()}
+
@@ -1,57 +1,143 @@
+# requests and webbrowser are imported where they are used, so offline runs start without them
 import configparser
-import webbrowser
-import requests
 import json
 import os
+import time
 import base64
 import secrets # Import the secrets module for generating the state token
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, parse_qs, urlencode
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import metrics
+from file_lock import file_lock
+from asset_snapshots import AssetSnapshot
+
+# --- CONFIGURATION ---
+TOKENS_FILE = 'tokens.json'  # The main character's tokens; alts are saved as tokens_<name>.json
+# An access token refreshed by another run is reused while it has at least this long left
+TOKEN_REUSE_MARGIN_SECONDS = 60
+# Asset owners (characters and the corporation) are fetched concurrently over one connection pool
+MAX_FETCH_WORKERS = 8
+# --- END OF CONFIGURATION ---
+
+ESI_URL = "https://esi.evetech.net"
+TOKEN_URL = "https://login.eveonline.com/v2/oauth/token"
+CHARACTER_SCOPE = 'esi-assets.read_assets.v1'
+CORPORATION_SCOPE = 'esi-assets.read_corporation_assets.v1'
+# Corporation hangar divisions 1-7 appear as these location flags
+DIVISION_FLAGS = {f'CorpSAG{n}': n for n in range(1, 8)}
+
+
+def _split(value):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+class EsiIdentity:
+    """One character login: its saved tokens and whether it reads its own and/or its corporation's assets."""
+    __slots__ = ('name', 'tokens_file', 'tokens', 'state', 'read_character', 'read_corporation')
+
+    def __init__(self, name, tokens_file, read_character=True, read_corporation=False):
+        self.name = name
+        self.tokens_file = tokens_file
+        self.tokens = {}
+        self.state = None # Will be used to store the state token
+        self.read_character = read_character
+        self.read_corporation = read_corporation
+
+    def scopes(self):
+        return ' '.join([CHARACTER_SCOPE] + ([CORPORATION_SCOPE] if self.read_corporation else []))
+
 
 class EsiManager:
-    """Handles ESI authentication and data fetching."""
-    
+    """
+    Handles ESI authentication and data fetching for one or more characters.
+
+    config.ini names the main character under [CHARACTER] character_name, optional alts under
+    alt_characters (comma-separated), and optionally a [CORPORATION] section whose character_name
+    logs in to read corporation assets, limited to the hangar divisions listed in divisions.
+    """
+
     def __init__(self, config_file='config.ini'):
         self.config = configparser.ConfigParser()
         self.config.read(config_file)
-        
+
         self.client_id = self.config['ESI']['client_id']
         self.client_secret = self.config['ESI']['client_secret']
         self.callback_url = self.config['ESI']['callback_url']
         self.structure_ids = [s.strip() for s in self.config['STRUCTURE']['structure_ids'].split(',')]
         self.character_name = self.config['CHARACTER']['character_name']
 
-        self.tokens = {}
-        self.state = None # Will be used to store the state token
-        print(f"ESI Manager initialized for structures: {self.structure_ids}")
+        self.identities = [EsiIdentity(self.character_name, TOKENS_FILE)]
+        for name in _split(self.config['CHARACTER'].get('alt_characters', '')):
+            safe_name = ''.join(c if c.isalnum() else '_' for c in name)
+            self.identities.append(EsiIdentity(name, f"tokens_{safe_name}.json"))
+        self.divisions = set()
+        if self.config.has_section('CORPORATION'):
+            corporation = self.config['CORPORATION']
+            director = corporation.get('character_name', self.character_name)
+            identity = next((i for i in self.identities if i.name == director), None)
+            if identity is None:
+                # Only logs in for the corporation; its personal assets are not part of the stockpile
+                safe_name = ''.join(c if c.isalnum() else '_' for c in director)
+                identity = EsiIdentity(director, f"tokens_{safe_name}.json", read_character=False)
+                self.identities.append(identity)
+            identity.read_corporation = True
+            self.divisions = {int(d) for d in _split(corporation.get('divisions', ''))}
+
+        self.session = None
+        self.inventory_diff = {} # {type_id: quantity change} since the previous asset snapshots
+        self.inventory_by_location = {} # {(type_id, location_id, division): quantity}; division is None outside corp hangars
+        print(f"ESI Manager initialized for {', '.join(i.name for i in self.identities)} "
+              f"at structures: {self.structure_ids}")
+
+    def _session(self):
+        """The HTTP session shared by every fetch, with a connection per worker."""
+        if self.session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self.session = requests.Session()
+            self.session.mount('https://', HTTPAdapter(pool_connections=MAX_FETCH_WORKERS,
+                                                       pool_maxsize=MAX_FETCH_WORKERS))
+        return self.session
 
-    def _get_auth_url(self):
+    def _record_request(self, response, endpoint):
+        """Counts an ESI/SSO request and the bytes it transferred."""
+        metrics.count('esi_requests', endpoint=endpoint, status=response.status_code)
+        metrics.count('esi_bytes', len(response.content), endpoint=endpoint)
+        return response
+
+    def _get_auth_url(self, identity):
         """Generates the full ESI authentication URL."""
         # Generate a secure, random state token for CSRF protection
-        self.state = secrets.token_urlsafe(16)
-        
+        identity.state = secrets.token_urlsafe(16)
+
         base_url = "https://login.eveonline.com/v2/oauth/authorize/?"
         params = {
             'response_type': 'code',
             'redirect_uri': self.callback_url,
             'client_id': self.client_id,
-            'scope': 'esi-assets.read_assets.v1',
-            'state': self.state  # Include the state token in the request
+            'scope': identity.scopes(),
+            'state': identity.state  # Include the state token in the request
         }
-        return base_url + requests.compat.urlencode(params)
+        return base_url + urlencode(params)
+
+    def _token_headers(self):
+        auth_string = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+        return {'Authorization': f'Basic {auth_string}', 'Content-Type': 'application/x-www-form-urlencoded'}
 
-    def _process_callback(self, callback_url):
+    def _process_callback(self, identity, callback_url):
         """
-        Processes the callback URL from EVE SSO, verifies the state, 
+        Processes the callback URL from EVE SSO, verifies the state,
         and exchanges the authorization code for tokens.
         """
+        import requests
         try:
             parsed_url = urlparse(callback_url)
             query_params = parse_qs(parsed_url.query)
 
             # --- Verify the state parameter ---
             received_state = query_params.get('state', [None])[0]
-            if not received_state or received_state != self.state:
+            if not received_state or received_state != identity.state:
                 print("\nERROR: State parameter mismatch. Authentication aborted for security reasons.")
                 return False
 
@@ -61,18 +147,15 @@ class EsiManager:
                 return False
 
             # Exchange code for tokens
-            token_url = "https://login.eveonline.com/v2/oauth/token"
-            auth_string = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
-            headers = {'Authorization': f'Basic {auth_string}', 'Content-Type': 'application/x-www-form-urlencoded'}
             data = {'grant_type': 'authorization_code', 'code': auth_code}
-            
-            response = requests.post(token_url, headers=headers, data=data)
+            response = self._record_request(
+                self._session().post(TOKEN_URL, headers=self._token_headers(), data=data), 'token')
             response.raise_for_status() # Will raise an exception for HTTP errors
-            
-            self.tokens = response.json()
-            with open('tokens.json', 'w') as f:
-                json.dump(self.tokens, f)
-            print("Tokens received and saved successfully.")
+
+            identity.tokens = response.json()
+            with file_lock(identity.tokens_file):
+                self._save_tokens(identity)
+            print(f"Tokens for {identity.name} received and saved successfully.")
             return True
 
         except requests.exceptions.RequestException as e:
@@ -83,108 +166,239 @@ class EsiManager:
             print(f"\nError parsing the callback URL. Make sure you copied the full URL. Error: {e}")
             return False
 
-    def _refresh_tokens(self):
-        """Refreshes the access token using the refresh token."""
+    def _save_tokens(self, identity):
+        """Writes the tokens, with their absolute expiry, to a temporary file and renames it over the tokens file."""
+        if 'expires_in' in identity.tokens:
+            identity.tokens['expires_at'] = time.time() + identity.tokens['expires_in']
+        tmp_path = f"{identity.tokens_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(identity.tokens, f)
+        os.replace(tmp_path, identity.tokens_file)
+
+    def _refresh_tokens(self, identity, rejected_token=None):
+        """
+        Refreshes the access token using the refresh token. Runs hold a lock on the tokens file while
+        refreshing, so concurrent runs refresh once: the others wait and pick up the new tokens
+        (unless the saved access token is rejected_token, the one ESI just turned down).
+        """
+        with file_lock(identity.tokens_file):
+            if os.path.exists(identity.tokens_file):
+                with open(identity.tokens_file, 'r') as f:
+                    saved = json.load(f)
+                still_valid = saved.get('expires_at', 0) - TOKEN_REUSE_MARGIN_SECONDS > time.time()
+                if still_valid and saved.get('access_token') != rejected_token:
+                    identity.tokens = saved
+                    metrics.count('cache_hits', cache='tokens')
+                    print(f"Using the access token for {identity.name} refreshed by another run.")
+                    return True
+                # Another run may have rotated the refresh token, spending the one we hold
+                identity.tokens = {**identity.tokens, **saved}
+            return self._refresh_tokens_locked(identity)
+
+    def _refresh_tokens_locked(self, identity):
+        import requests
         try:
-            refresh_token = self.tokens.get('refresh_token')
+            refresh_token = identity.tokens.get('refresh_token')
             if not refresh_token:
                 return False
 
-            token_url = "https://login.eveonline.com/v2/oauth/token"
-            auth_string = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
-            headers = {'Authorization': f'Basic {auth_string}', 'Content-Type': 'application/x-www-form-urlencoded'}
             data = {'grant_type': 'refresh_token', 'refresh_token': refresh_token}
-
-            response = requests.post(token_url, headers=headers, data=data)
+            response = self._record_request(
+                self._session().post(TOKEN_URL, headers=self._token_headers(), data=data), 'token')
             response.raise_for_status()
-            
+
             new_tokens = response.json()
-            self.tokens['access_token'] = new_tokens['access_token']
-            self.tokens['expires_in'] = new_tokens['expires_in']
+            identity.tokens['access_token'] = new_tokens['access_token']
+            identity.tokens['expires_in'] = new_tokens['expires_in']
             # EVE SSO might or might not return a new refresh token. If it does, update it.
             if 'refresh_token' in new_tokens:
-                self.tokens['refresh_token'] = new_tokens['refresh_token']
+                identity.tokens['refresh_token'] = new_tokens['refresh_token']
 
-            with open('tokens.json', 'w') as f:
-                json.dump(self.tokens, f)
-            print("Access token refreshed.")
+            self._save_tokens(identity)
+            print(f"Access token for {identity.name} refreshed.")
             return True
         except requests.exceptions.RequestException as e:
-            print(f"Failed to refresh token: {e}")
+            print(f"Failed to refresh token for {identity.name}: {e}")
             return False
-    
+
     def authenticate(self):
-        """Main authentication flow."""
-        if os.path.exists('tokens.json'):
-            with open('tokens.json', 'r') as f:
-                self.tokens = json.load(f)
-            if self._refresh_tokens():
-                return True
-        
-        # If no tokens or refresh failed, start full auth flow
-        print("\n--- EVE Online Authentication Required ---")
-        auth_url = self._get_auth_url()
-        print("Your browser will now open for EVE Online authentication.")
-        webbrowser.open(auth_url)
-        
-        callback_url = input("Please log in, and then paste the full callback URL from your browser here:\n> ")
-        return self._process_callback(callback_url)
+        """Main authentication flow: refreshes saved tokens and logs in through the browser where there are none."""
+        with metrics.span('esi_auth'):
+            return self._authenticate()
+
+    def has_saved_tokens(self):
+        return all(os.path.exists(identity.tokens_file) for identity in self.identities)
+
+    def is_authenticated(self):
+        return all(identity.tokens.get('access_token') for identity in self.identities)
+
+    def authenticate_saved(self):
+        """The non-interactive part of authenticate(): refreshes every character's saved tokens concurrently."""
+        with metrics.span('esi_auth'):
+            with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(self.identities))) as pool:
+                return all(list(pool.map(self._authenticate_saved, self.identities)))
+
+    def _authenticate_saved(self, identity):
+        if not os.path.exists(identity.tokens_file):
+            return False
+        with open(identity.tokens_file, 'r') as f:
+            identity.tokens = json.load(f)
+        return self._refresh_tokens(identity)
+
+    def _authenticate(self):
+        for identity in self.identities:
+            if self._authenticate_saved(identity):
+                continue
+
+            # If no tokens or refresh failed, start full auth flow
+            print(f"\n--- EVE Online Authentication Required: log in as {identity.name} ---")
+            auth_url = self._get_auth_url(identity)
+            print("Your browser will now open for EVE Online authentication.")
+            import webbrowser
+            webbrowser.open(auth_url)
+
+            callback_url = input("Please log in, and then paste the full callback URL from your browser here:\n> ")
+            if not self._process_callback(identity, callback_url):
+                return False
+        return True
 
     def get_inventory(self):
         """
-        Fetches asset lists from all configured structures and aggregates them.
+        Fetches the asset lists of every character (and the corporation, if configured) concurrently
+        and aggregates them over the configured structures. Each owner is served from its saved
+        snapshot while ESI's cache is valid and revalidated by ETag afterwards.
+        self.inventory_by_location holds the merged inventory per location and hangar division,
+        self.inventory_diff the changes since the previous snapshots.
         Returns a dictionary of {type_id: total_quantity}.
         """
-        access_token = self.tokens.get('access_token')
-        if not access_token:
-            print("Authentication required.")
-            return {}
+        with metrics.span('esi_fetch'):
+            return self._get_inventory()
+
+    def _get_inventory(self):
+        owners = [(identity, False) for identity in self.identities if identity.read_character]
+        owners += [(identity, True) for identity in self.identities if identity.read_corporation]
+        self._session()
+        with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(owners))) as pool:
+            results = list(pool.map(lambda owner: self._fetch_owner_assets(*owner), owners))
+
+        by_location, diff = defaultdict(int), defaultdict(int)
+        for owner_by_location, owner_diff in results:
+            for key, quantity in owner_by_location.items():
+                by_location[key] += quantity
+            for type_id, delta in owner_diff.items():
+                diff[type_id] += delta
+        self.inventory_by_location = dict(by_location)
+        self.inventory_diff = {type_id: delta for type_id, delta in diff.items() if delta}
+
+        inventory = defaultdict(int)
+        for (type_id, _, _), quantity in by_location.items():
+            inventory[type_id] += quantity
+        print(f"Inventory fetch complete. Found {len(inventory)} unique item types across {len(owners)} "
+              f"asset owner(s), {len(self.inventory_diff)} changed since the last snapshot.")
+        return dict(inventory)
 
-        # First, we need the character ID to make the authenticated call
-        char_info_url = "https://esi.evetech.net/verify/"
+    def _fetch_owner_assets(self, identity, corporation):
+        """Returns ({(type_id, location_id, division): quantity}, {type_id: change}) for one asset owner."""
+        owner = f"{identity.name} (corporation)" if corporation else identity.name
+        with metrics.span('esi_fetch_owner', owner='corporation' if corporation else 'character'):
+            snapshot = AssetSnapshot(owner)
+            if snapshot.is_fresh():
+                # ESI would return the same pages until they expire, so don't ask
+                print(f"{owner}: using the saved asset snapshot (ESI cache has not expired yet).")
+                metrics.count('cache_hits', cache='asset_snapshot')
+            elif self._fetch_pages(identity, snapshot, owner, corporation):
+                by_location, totals = self._aggregate_assets(snapshot.assets(), corporation)
+                snapshot.save(totals)
+                return by_location, snapshot.changes
+            else:
+                # Pages fetched before the failure are dropped, so the saved snapshot is used whole
+                snapshot.discard()
+                print(f"{owner}: using the saved snapshot.")
+
+            # The saved snapshot is unchanged, and so are its changes since the fetch before it
+            by_location, _ = self._aggregate_assets(snapshot.assets(), corporation)
+            return by_location, snapshot.changes
+
+    def _fetch_pages(self, identity, snapshot, owner, corporation):
+        """Revalidates or downloads every asset page of one owner into the snapshot. False on failure."""
+        session = self._session()
+        access_token = identity.tokens.get('access_token')
+        if not access_token:
+            print(f"Authentication required for {identity.name}.")
+            return False
         headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(char_info_url, headers=headers)
-        if response.status_code != 200:
-            print(f"Could not verify character info. Status: {response.status_code}")
-            return {}
-        character_id = response.json()['CharacterID']
-        
-        aggregated_inventory = defaultdict(int)
-
-        for structure_id in self.structure_ids:
-            print(f"Fetching assets from structure {structure_id}...")
-            page = 1
-            while True:
-                assets_url = f"https://esi.evetech.net/v5/characters/{character_id}/assets/"
-                params = {'page': page}
-                response = requests.get(assets_url, headers=headers, params=params)
-
-                if response.status_code == 403: # Token expired
-                    if not self._refresh_tokens(): 
-                        print("Authentication failed during asset fetch.")
-                        return {}
-                    headers['Authorization'] = f'Bearer {self.tokens.get("access_token")}'
-                    continue # Retry the request
-
-                if response.status_code != 200:
-                    print(f"Error fetching assets from structure {structure_id}, page {page}. Status: {response.status_code}")
-                    break
-                
-                assets_page = response.json()
-                if not assets_page:
-                    break # No more assets on subsequent pages
-
-                for asset in assets_page:
-                    # We are only interested in assets inside the specified structure
-                    if str(asset.get('location_id')) == str(structure_id):
-                        aggregated_inventory[asset['type_id']] += asset['quantity']
-                
-                # Check for more pages
-                if 'x-pages' in response.headers and int(response.headers['x-pages']) > page:
-                    page += 1
-                else:
-                    break
-        
-        print(f"Inventory fetch complete. Found {len(aggregated_inventory)} unique item types.")
-        return dict(aggregated_inventory)
 
+        # The character (and corporation) IDs never change, so keep them with the snapshot
+        if not snapshot.character_id:
+            response = self._record_request(session.get(f"{ESI_URL}/verify/", headers=headers), 'verify')
+            if response.status_code != 200:
+                print(f"Could not verify character info for {identity.name}. Status: {response.status_code}")
+                return False
+            snapshot.character_id = response.json()['CharacterID']
+        if corporation and not snapshot.corporation_id:
+            response = self._record_request(
+                session.get(f"{ESI_URL}/v5/characters/{snapshot.character_id}/"), 'character')
+            if response.status_code != 200:
+                print(f"Could not look up the corporation of {identity.name}. Status: {response.status_code}")
+                return False
+            snapshot.corporation_id = response.json()['corporation_id']
+
+        if corporation:
+            assets_url = f"{ESI_URL}/v5/corporations/{snapshot.corporation_id}/assets/"
+        else:
+            assets_url = f"{ESI_URL}/v5/characters/{snapshot.character_id}/assets/"
+        print(f"Fetching assets of {owner} (revalidating saved pages)...")
+        page, page_count, refreshed = 1, 1, False
+        while page <= page_count:
+            request_headers = dict(headers)
+            if snapshot.etag(page):
+                request_headers['If-None-Match'] = snapshot.etag(page)
+            response = self._record_request(
+                session.get(assets_url, headers=request_headers, params={'page': page}), 'assets')
+
+            if response.status_code == 403 and not refreshed: # Token expired
+                if not self._refresh_tokens(identity, rejected_token=headers['Authorization'].split(' ', 1)[1]):
+                    print(f"Authentication failed during asset fetch for {identity.name}.")
+                    return False
+                headers['Authorization'] = f'Bearer {identity.tokens.get("access_token")}'
+                refreshed = True
+                continue # Retry the request
+
+            if response.status_code == 304:
+                metrics.count('cache_hits', cache='asset_page_not_modified')
+                snapshot.store_page(page, response.headers)
+            elif response.status_code == 200:
+                snapshot.store_page(page, response.headers, response.json())
+            else:
+                # A 403 after a fresh token means the character lacks the corporation roles
+                print(f"Error fetching assets of {owner}, page {page}. Status: {response.status_code}.")
+                return False
+
+            page_count = int(response.headers.get('X-Pages', page_count))
+            page += 1
+        snapshot.commit(page_count)
+        return True
+
+    def _aggregate_assets(self, assets, corporation=False):
+        """
+        Sums asset quantities by (typeID, location, hangar division) over the configured structures,
+        and by typeID alone. Corporation items sit in an office inside the structure: they are
+        placed at the office's location, with the division taken from their CorpSAG flag.
+        """
+        assets = list(assets)
+        offices = {a['item_id']: a['location_id'] for a in assets
+                   if corporation and a.get('location_flag') == 'OfficeFolder'}
+        structure_ids = set(self.structure_ids)
+        by_location, totals = defaultdict(int), defaultdict(int)
+        for asset in assets:
+            location_id, division = asset.get('location_id'), None
+            if corporation:
+                division = DIVISION_FLAGS.get(asset.get('location_flag'))
+                if division is None or (self.divisions and division not in self.divisions):
+                    continue
+                location_id = offices.get(location_id, location_id)
+            # We are only interested in assets inside the specified structures
+            if str(location_id) in structure_ids:
+                by_location[(asset['type_id'], location_id, division)] += asset['quantity']
+                totals[asset['type_id']] += asset['quantity']
+        return dict(by_location), dict(totals)
@@ -0,0 +1,31 @@
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive cross-process lock on path + '.lock', blocking until it is free.
+    Used so that only one of several concurrent runs refreshes a shared file (price cache, tokens).
+    """
+    with open(f"{path}.lock", 'a+') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,38 +1,89 @@
-from sde_loader import SdeLoader
+from sde_store import load_sde
 from esi_manager import EsiManager
 from dependency_calculator import DependencyCalculator
+from bonuses import BonusEngine
+from invention import with_invention, COPYING, INVENTION
+from name_index import prompt_for_name
+from instrumentation import metrics, get_logger
+import os
+import sys
 import math
+import heapq
 from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+log = get_logger()
+
+# --- CONFIGURATION ---
+# Price the shopping list at the cheapest sell order across hubs in the reaction tools' price snapshot
+# (published by reactions/calculator.py; nothing is downloaded here)
+PRICE_SHOPPING_LIST = False
+REACTIONS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'reactions')
+PRICE_SNAPSHOT_FILE = os.path.join(REACTIONS_FOLDER, 'price_cache.bin')
+# --- END OF CONFIGURATION ---
+
+SECONDS_IN_A_DAY = 86400
+# Copying and invention share the science slots
+SCIENCE_ACTIVITIES = (COPYING, INVENTION)
 
 class IndustrialScheduler:
-    def __init__(self):
-        print("Initializing EVE Online Industrial Scheduler...")
-        self.sde = SdeLoader()
-        self.esi = EsiManager()
-        self.dep_calc = DependencyCalculator(self.sde)
+    def __init__(self, sde=None, use_esi=True, bonuses=None):
+        """
+        Reuses an already loaded SdeLoader/SdeStore (and BonusEngine) if given; use_esi=False plans
+        from a supplied inventory only. T2 products also plan their copying and invention jobs.
+        """
+        if sde is None:
+            print("Initializing EVE Online Industrial Scheduler...")
+            sde = load_sde()
+        self.sde = with_invention(sde)
+        self.esi = EsiManager() if use_esi else None
+        self.dep_calc = DependencyCalculator(self.sde, bonuses or BonusEngine(self.sde))
 
         self.inventory_by_name = {}
+        self.prices = None  # Attached PriceSnapshot, for the shopping list
         self.mfg_slots = 0
         self.react_slots = 0
+        self.science_slots = 0
         
     def run(self):
-        if not self.esi.authenticate():
+        # Only the browser login needs the console; with saved tokens, authentication overlaps the rest of the run
+        if not self.esi.has_saved_tokens() and not self.esi.authenticate():
             print("Authentication failed. Exiting.")
             return
         
-        self._get_user_input()
-        self._fetch_inventory()
-        
-        # This pre-calculation is necessary to populate the dependency calculator's internal state
-        # with all possible components in the tree for the target product.
-        print("\nPre-calculating full dependency tree...")
-        self.dep_calc.get_total_requirements(self.target_product, self.target_quantity)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            # The network work (token refresh and asset fetch) starts before the prompts
+            inventory_ready = pool.submit(self._authenticate_and_fetch_inventory)
+
+            self._get_user_input()
+
+            # The dependency tree (CPU) is expanded while the network work finishes. The pre-calculation
+            # populates the dependency calculator's internal state with every component of the target.
+            print("\nPre-calculating the full dependency tree while the inventory loads...")
+            tree_ready = pool.submit(self.dep_calc.get_total_requirements, self.target_product, self.target_quantity)
+            with metrics.span('pipeline_wait'):
+                fetched = inventory_ready.result()
+                tree_ready.result()
 
-        self._plan_production_run()
-        self._display_action_plan()
+            if not fetched:
+                # The saved tokens could not be refreshed: fall back to the interactive login
+                if not self.esi.authenticate():
+                    print("Authentication failed. Exiting.")
+                    return
+                self._fetch_inventory()
+
+            with metrics.span('planning'):
+                self._plan_production_run()
+        if PRICE_SHOPPING_LIST:
+            self.prices = self._load_prices()
+        with metrics.span('output'):
+            self._display_action_plan()
+
+        log.debug("\n--- Stage timings ---\n" + metrics.summary())
+        metrics.export()
 
     def _get_user_input(self):
-        self.target_product = input("\nEnter the final product you want to build (e.g., Eris): ")
+        _, self.target_product = prompt_for_name(self.sde.name_index, "\nEnter the final product you want to build (e.g., Eris): ")
         try:
             self.target_quantity = int(input(f"How many {self.target_product} do you want to build? [Default: 1]: ") or 1)
         except ValueError:
@@ -41,13 +92,49 @@ class IndustrialScheduler:
         try:
             self.mfg_slots = int(input(f"Enter available manufacturing slots [Default: 9]: ") or 9)
             self.react_slots = int(input(f"Enter available reaction slots [Default: 9]: ") or 9)
+            self.science_slots = int(input(f"Enter available science slots [Default: 9]: ") or 9)
         except ValueError:
-            self.mfg_slots, self.react_slots = 9, 9
+            self.mfg_slots, self.react_slots, self.science_slots = 9, 9, 9
+
+    def _authenticate_and_fetch_inventory(self):
+        """Refreshes the saved tokens if this run hasn't logged in yet, then fetches the inventory."""
+        if not self.esi.is_authenticated() and not self.esi.authenticate_saved():
+            return False
+        self._fetch_inventory()
+        return True
+
+    def _load_prices(self):
+        """Attaches to the reaction tools' price snapshot; None if there is none yet."""
+        if not os.path.exists(PRICE_SNAPSHOT_FILE):
+            print("No price snapshot yet (run reactions/calculator.py); the shopping list is not priced.")
+            return None
+        sys.path.append(os.path.abspath(REACTIONS_FOLDER))
+        from price_snapshot import PriceSnapshot
+        try:
+            return PriceSnapshot(PRICE_SNAPSHOT_FILE)
+        except (OSError, ValueError) as e:
+            print(f"Could not attach to the price snapshot ({e}); the shopping list is not priced.")
+            return None
+
+    def _shopping_list_cost(self):
+        """ISK for the shopping list at the cheapest sell order across the snapshot's hubs."""
+        items = list(self.shopping_list)
+        sell = self.prices.lookup([self.sde.get_type_id(item) or -1 for item in items])
+        sell = sell[:, :, self.prices.columns.index('sell')]
+        total = 0.0
+        for item, row in zip(items, sell.tolist()):
+            total += min((p for p in row if p == p), default=0.0) * math.ceil(self.shopping_list[item])  # skips NaN
+        return total
 
     def _fetch_inventory(self):
         print("Fetching current inventory...")
         inventory_by_id = self.esi.get_inventory()
         self.inventory_by_name = {self.sde.get_type_name(tid): qty for tid, qty in inventory_by_id.items()}
+        if self.esi.inventory_diff:
+            changes = sorted(self.esi.inventory_diff.items(), key=lambda item: -abs(item[1]))
+            print("Changes since the last asset snapshot: " + ", ".join(
+                f"{self.sde.get_type_name(tid)} {delta:+,}" for tid, delta in changes[:10])
+                  + (f" (+{len(changes) - 10} more)" if len(changes) > 10 else ""))
 
     def _is_raw_material(self, component_name):
         """Checks if a component is a raw material (minerals, PI, reactions, etc.)."""
@@ -60,6 +147,11 @@ class IndustrialScheduler:
             
         return False
 
+    @staticmethod
+    def _runs_per_job(time_per_run):
+        """Runs in one job: about a day's worth, at least one."""
+        return max(1, round(SECONDS_IN_A_DAY / time_per_run)) if time_per_run > 0 else 1
+
     def _plan_production_run(self):
         """Plans the production run using a Breadth-First Search (BFS) algorithm with simulated inventory."""
         print("Planning buildable jobs using BFS and simulated inventory...")
@@ -68,10 +160,9 @@ class IndustrialScheduler:
         self.shopping_list = defaultdict(float)
         
         simulated_inventory = self.inventory_by_name.copy()
-        SECONDS_IN_A_DAY = 86400
 
         # --- Inline addition for debugging (scaled by target quantity) ---
-        print(f"\n--- BFS: Checking requirements for {self.target_product} (x{self.target_quantity}) ---")
+        log.debug(f"\n--- BFS: Checking requirements for {self.target_product} (x{self.target_quantity}) ---")
         final_product_materials = self.dep_calc.get_direct_materials_for_product_name(self.target_product)
         # Multiply each value by the target quantity
         final_product_materials = {name: qty * self.target_quantity for name, qty in final_product_materials.items()}
@@ -79,7 +170,7 @@ class IndustrialScheduler:
             comp_type = "Raw Material" if self._is_raw_material(name) else "Producible"
             # CRITICAL FIX: The debug print now reads from the simulated_inventory
             have = simulated_inventory.get(name, 0)
-            print(f"  - Req: {name:<40} | Type: {comp_type:<12} | Needed: {qty:<10.0f} | Have: {have:<10.0f}")
+            log.debug(f"  - Req: {name:<40} | Type: {comp_type:<12} | Needed: {qty:<10.0f} | Have: {have:<10.0f}")
         # --- End of inline addition ---
 
         queue = deque([self.target_product])
@@ -90,27 +181,26 @@ class IndustrialScheduler:
 
             # If it's raw, just note and continue
             if self._is_raw_material(current_comp_name):
-                print(f"+ {current_comp_name} -> raw material (skip)")
+                log.debug(f"+ {current_comp_name} -> raw material (skip)")
                 continue
 
             comp_details = self.dep_calc.total_components.get(current_comp_name)
-            if not comp_details: continue
+            if comp_details is None: continue
             
-            time_per_run = comp_details.get('time_per_run', 0)
-            runs_for_batch = max(1, round(SECONDS_IN_A_DAY / time_per_run)) if time_per_run > 0 else 1
+            runs_for_batch = self._runs_per_job(comp_details.time_per_run)
 
-            direct_materials = self.dep_calc.get_direct_materials_for_product_name(current_comp_name)
-            producible_inputs = {mat: qty for mat, qty in direct_materials.items() if not self._is_raw_material(mat)}
-            raw_inputs = {mat: qty for mat, qty in direct_materials.items() if self._is_raw_material(mat)}
+            # If we're evaluating the root product, scale the producible inputs by the total target quantity
+            producible_runs = runs_for_batch
+            if current_comp_name == self.target_product:
+                producible_runs *= self.target_quantity
+            producible_inputs = {mat: qty for mat, qty in self.dep_calc.get_job_materials_for_product_name(
+                current_comp_name, producible_runs).items() if not self._is_raw_material(mat)}
+            raw_inputs = {mat: qty for mat, qty in self.dep_calc.get_job_materials_for_product_name(
+                current_comp_name, runs_for_batch).items() if self._is_raw_material(mat)}
 
             can_build = True
             missing_details = []  # list of tuples [(name, missing_qty), ...]
-            for sub_comp, qty_per in producible_inputs.items():
-                needed_for_batch = qty_per * runs_for_batch
-                # If we're evaluating the root product, scale by the total target quantity
-                if current_comp_name == self.target_product:
-                    needed_for_batch *= self.target_quantity
-
+            for sub_comp, needed_for_batch in producible_inputs.items():
                 have_now = simulated_inventory.get(sub_comp, 0)
                 # CRITICAL LOGIC: Check and reserve materials immediately
                 if have_now >= needed_for_batch:
@@ -129,15 +219,15 @@ class IndustrialScheduler:
             # Verbose BFS step output
             if missing_details:
                 missing_str = ", ".join(f"{name} x{math.ceil(miss)}" for name, miss in missing_details)
-                print(f"+ {current_comp_name} -> missing: {missing_str}")
+                log.debug(f"+ {current_comp_name} -> missing: {missing_str}")
             else:
-                print(f"+ {current_comp_name} -> buildable now")
+                log.debug(f"+ {current_comp_name} -> buildable now")
             
             if can_build:
                 job_info = {
                     'name': current_comp_name,
                     'runs': runs_for_batch,
-                    'activity_id': comp_details['activity_id']
+                    'activity_id': comp_details.activity_id
                 }
                 self.recommended_jobs.append(job_info)
 
@@ -145,16 +235,92 @@ class IndustrialScheduler:
                 # This plan is for what to start NOW, not what to do after jobs finish.
 
                 # Add to shopping list if real inventory is short on raws
-                for raw_mat, qty_per in raw_inputs.items():
-                    needed_for_batch = qty_per * runs_for_batch
+                for raw_mat, needed_for_batch in raw_inputs.items():
                     if self.inventory_by_name.get(raw_mat, 0) < needed_for_batch:
                         self.shopping_list[raw_mat] += needed_for_batch - self.inventory_by_name.get(raw_mat, 0)
                         # To prevent re-adding, assume we "bought" it for the simulation's asset check
                         self.inventory_by_name[raw_mat] = needed_for_batch 
 
+    def plan(self, target_product, target_quantity, inventory_by_name, mfg_slots=9, react_slots=9, science_slots=9):
+        """Plans a run for the given inventory without prompting or ESI access."""
+        self.target_product, self.target_quantity = target_product, target_quantity
+        self.inventory_by_name = dict(inventory_by_name)
+        self.mfg_slots, self.react_slots, self.science_slots = mfg_slots, react_slots, science_slots
+        self.dep_calc.get_total_requirements(self.target_product, self.target_quantity)
+        with metrics.span('planning'):
+            self._plan_production_run()
+
+    def simulate_schedule(self):
+        """
+        Runs the whole chain of the last plan through the slots, ignoring inventory. Each component's
+        runs are split into day-sized jobs as in planning; a component's jobs start once every
+        producible input has finished, each on the slot of its activity that frees up first.
+        Returns {'makespan': seconds, 'busy': {activity_id: slot-seconds}, 'raw_materials': {name: qty}}.
+        """
+        components = self.dep_calc.total_components
+        inputs = {name: [mat for mat in self.dep_calc.get_direct_materials_for_product_name(name)
+                         if mat in components and mat != name]
+                  for name in components}
+        science = [0.0] * max(1, self.science_slots)
+        slots = {1: [0.0] * max(1, self.mfg_slots), 11: [0.0] * max(1, self.react_slots),
+                 COPYING: science, INVENTION: science}
+        busy = defaultdict(float)
+        raw_materials = defaultdict(float)
+        finished = {}
+
+        def schedule(name):
+            # Inputs first (depth-first), so a component is placed once everything it consumes is
+            if name in finished:
+                return finished[name]
+            finished[name] = 0.0  # Guards against cycles
+            ready = max((schedule(mat) for mat in inputs[name]), default=0.0)
+            details = components[name]
+            runs = math.ceil(details.needed / details.products_per_run - 1e-9)
+            per_job = self._runs_per_job(details.time_per_run)
+            jobs = [per_job] * (runs // per_job) + ([runs % per_job] if runs % per_job else [])
+            free = slots.setdefault(details.activity_id, [0.0])
+            end = ready
+            for job_runs in jobs:
+                start = max(ready, heapq.heappop(free))
+                duration = job_runs * details.time_per_run
+                heapq.heappush(free, start + duration)
+                busy[details.activity_id] += duration
+                end = max(end, start + duration)
+            # Raw inputs per job size, so per-job rounding matches the action plan
+            for job_runs in set(jobs):
+                count = jobs.count(job_runs)
+                for mat, qty in self.dep_calc.get_job_materials_for_product_name(name, job_runs).items():
+                    if self._is_raw_material(mat):
+                        raw_materials[mat] += qty * count
+            finished[name] = end
+            return end
+
+        makespan = max((schedule(name) for name in components), default=0.0)
+        return {'makespan': makespan, 'busy': dict(busy), 'raw_materials': dict(raw_materials)}
+
+    def action_plan(self):
+        """The planned jobs that fit the free slots, with their materials, and the shopping list."""
+        def job_details(job):
+            job_mats = self.dep_calc.get_job_materials_for_product_name(job['name'], job['runs'])
+            return {**job, 'materials': {mat: {'needed': math.ceil(needed),
+                                               'have': self.inventory_by_name.get(mat, 0)}
+                                         for mat, needed in job_mats.items()}}
+
+        mfg_to_start = [j for j in self.recommended_jobs if j['activity_id'] == 1][:self.mfg_slots]
+        react_to_start = [j for j in self.recommended_jobs if j['activity_id'] == 11][:self.react_slots]
+        science_to_start = [j for j in self.recommended_jobs if j['activity_id'] in SCIENCE_ACTIVITIES][:self.science_slots]
+        return {
+            'manufacturing': [job_details(job) for job in mfg_to_start],
+            'reactions': [job_details(job) for job in react_to_start],
+            'invention': [job_details(job) for job in science_to_start if job['activity_id'] == INVENTION],
+            'copying': [job_details(job) for job in science_to_start if job['activity_id'] == COPYING],
+            'shopping_list': {item: math.ceil(qty) for item, qty in sorted(self.shopping_list.items())},
+        }
+
     def _display_action_plan(self):
         mfg_to_start = [j for j in self.recommended_jobs if j['activity_id'] == 1][:self.mfg_slots]
         react_to_start = [j for j in self.recommended_jobs if j['activity_id'] == 11][:self.react_slots]
+        science_to_start = [j for j in self.recommended_jobs if j['activity_id'] in SCIENCE_ACTIVITIES][:self.science_slots]
 
         print("\n" + "="*20 + " ACTION PLAN " + "="*20)
 
@@ -163,9 +329,8 @@ class IndustrialScheduler:
         for job in mfg_to_start:
             print(f"\n  - Start {job['runs']} run(s) of: {job['name']}")
             # Sanity Check (uses original inventory for verification)
-            direct_mats = self.dep_calc.get_direct_materials_for_product_name(job['name'])
-            for mat, needed_per in direct_mats.items():
-                needed_total = needed_per * job['runs']
+            job_mats = self.dep_calc.get_job_materials_for_product_name(job['name'], job['runs'])
+            for mat, needed_total in job_mats.items():
                 have = self.inventory_by_name.get(mat, 0)
                 print(f"    - Req: {mat} ({math.ceil(needed_total)}), Have: {have}")
 
@@ -174,9 +339,19 @@ class IndustrialScheduler:
         for job in react_to_start:
             print(f"\n  - Start {job['runs']} run(s) of: {job['name']}")
             # Sanity Check
-            direct_mats = self.dep_calc.get_direct_materials_for_product_name(job['name'])
-            for mat, needed_per in direct_mats.items():
-                needed_total = needed_per * job['runs']
+            job_mats = self.dep_calc.get_job_materials_for_product_name(job['name'], job['runs'])
+            for mat, needed_total in job_mats.items():
+                have = self.inventory_by_name.get(mat, 0)
+                print(f"    - Req: {mat} ({math.ceil(needed_total)}), Have: {have}")
+
+        print(f"\n--- Recommended Invention and Copying Jobs ({len(science_to_start)}/{self.science_slots} slots) ---")
+        if not science_to_start: print("  - None")
+        for job in science_to_start:
+            action = 'Invent' if job['activity_id'] == INVENTION else 'Copy'
+            print(f"\n  - {action} {job['runs']} run(s) of: {job['name']}")
+            # Sanity Check
+            job_mats = self.dep_calc.get_job_materials_for_product_name(job['name'], job['runs'])
+            for mat, needed_total in job_mats.items():
                 have = self.inventory_by_name.get(mat, 0)
                 print(f"    - Req: {mat} ({math.ceil(needed_total)}), Have: {have}")
         
@@ -184,6 +359,8 @@ class IndustrialScheduler:
             print("\n--- Shopping List (for recommended jobs) ---")
             for item, qty in sorted(self.shopping_list.items()):
                 print(f"{item} {math.ceil(qty)}")
+            if self.prices is not None:
+                print(f"\nEstimated cost: {self._shopping_list_cost():,.2f} ISK (cheapest hub sell orders)")
         else:
             print("\n--- Shopping List ---")
             print("  - No items need to be purchased for the recommended jobs.")
@@ -0,0 +1,167 @@
+"""
+Builds the compiled SDE store straight from the official SDE distribution.
+
+Reads types and blueprints record by record from either the YAML dump (fsd/types.yaml,
+fsd/blueprints.yaml) or the JSONL dump (types.jsonl, blueprints.jsonl), from a folder or
+the downloaded .zip, so memory stays bounded by the output arrays. The store records a
+content hash of its inputs; rebuilding from the same dump is skipped.
+
+Usage (from the scheduler folder):
+    python ingest_sde.py ~/Downloads/sde.zip
+    python ingest_sde.py ~/sde/ --output ../static_data/sde_store.npz --force
+"""
+import os
+import re
+import json
+import hashlib
+import zipfile
+import argparse
+from array import array
+
+from sde_store import SDE_FOLDER, STORE_FILE, STORE_VERSION, SdeStore, build_arrays, write_store
+from instrumentation import metrics
+
+# --- CONFIGURATION ---
+SDE_LANGUAGE = 'en'
+# --- END OF CONFIGURATION ---
+
+SOURCE_NAMES = {
+    'types': ('types.jsonl', 'types.yaml'),
+    'blueprints': ('blueprints.jsonl', 'blueprints.yaml'),
+}
+ACTIVITY_IDS = {
+    'manufacturing': 1, 'research_time': 3, 'research_material': 4, 'copying': 5,
+    'invention': 8, 'reaction': 11,
+}
+TOP_LEVEL_KEY = re.compile(rb'^(-?\d+):')
+
+
+class SdeSource:
+    """The dump's files, found by name in a folder tree or a zip archive."""
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+        members = self.zip.namelist() if self.zip else [
+            os.path.relpath(os.path.join(root, name), path) for root, _, names in os.walk(path) for name in names]
+        self.files = {}
+        for kind, candidates in SOURCE_NAMES.items():
+            for candidate in candidates:
+                match = next((m for m in members if os.path.basename(m) == candidate), None)
+                if match:
+                    self.files[kind] = match
+                    break
+            else:
+                raise FileNotFoundError(f"No {' or '.join(candidates)} found in {path}")
+
+    def open(self, kind):
+        member = self.files[kind]
+        return self.zip.open(member) if self.zip else open(os.path.join(self.path, member), 'rb')
+
+    def sha256(self, kind):
+        digest = hashlib.sha256()
+        with self.open(kind) as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def records(self, kind):
+        """Yields (key, record) for each top-level entry."""
+        with self.open(kind) as f:
+            if self.files[kind].endswith('.jsonl'):
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        yield int(record['_key']), record
+            else:
+                yield from _yaml_records(f)
+
+
+def _yaml_records(lines):
+    """Splits a top-level YAML mapping into one small document per key and parses each on its own."""
+    try:
+        import yaml
+    except ImportError:
+        raise SystemExit("The YAML dump needs PyYAML (pip install pyyaml); the JSONL dump does not.")
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+    chunk = []
+    for line in lines:
+        if TOP_LEVEL_KEY.match(line) and chunk:
+            yield from yaml.load(b''.join(chunk), Loader=loader).items()
+            chunk = []
+        chunk.append(line)
+    if chunk:
+        yield from yaml.load(b''.join(chunk), Loader=loader).items()
+
+
+def _name(record, language=SDE_LANGUAGE):
+    name = record.get('name')
+    if isinstance(name, dict):
+        return name.get(language) or name.get('en') or ''
+    return name or ''
+
+
+def ingest(source_path, store_path=None, force=False, language=SDE_LANGUAGE):
+    """
+    Streams the dump at source_path into the compiled store (default: the SDE folder's store).
+    Returns the store path; leaves an existing store alone if it was built from identical input.
+    """
+    store_path = store_path or os.path.join(SDE_FOLDER, STORE_FILE)
+    source = SdeSource(source_path)
+
+    # Hash the raw files first (cheap next to parsing) so an unchanged dump is skipped outright
+    files = {kind: {'file': member, 'sha256': source.sha256(kind)} for kind, member in sorted(source.files.items())}
+    content_hash = hashlib.sha256(''.join(f['sha256'] for f in files.values()).encode()).hexdigest()
+    if not force and os.path.exists(store_path):
+        existing = SdeStore(store_path)
+        if existing.version == STORE_VERSION and existing.source.get('sde', {}).get('content_hash') == content_hash:
+            print(f"Store is already built from this SDE ({content_hash[:12]}); nothing to do.")
+            return store_path
+
+    with metrics.span('sde_ingest'):
+        type_ids, names = array('i'), []
+        for type_id, record in source.records('types'):
+            type_ids.append(type_id)
+            names.append(_name(record, language))
+
+        activities = (array('i'), array('i'), array('i'))
+        materials = (array('i'), array('i'), array('i'), array('i'))
+        products = (array('i'), array('i'), array('i'), array('i'))
+        probabilities = array('d')  # Invention success chance per product row, NaN elsewhere
+        for blueprint_id, record in source.records('blueprints'):
+            for activity_name, activity in (record.get('activities') or {}).items():
+                activity_id = ACTIVITY_IDS.get(activity_name)
+                if activity_id is None:
+                    continue
+                for column, value in zip(activities, (blueprint_id, activity_id, activity.get('time', 0))):
+                    column.append(value)
+                for material in activity.get('materials') or []:
+                    for column, value in zip(materials, (blueprint_id, activity_id, material['typeID'],
+                                                         material['quantity'])):
+                        column.append(value)
+                for product in activity.get('products') or []:
+                    for column, value in zip(products, (blueprint_id, activity_id, product['typeID'],
+                                                        product['quantity'])):
+                        column.append(value)
+                    probabilities.append(product.get('probability', float('nan')))
+
+    arrays = build_arrays(type_ids, names, activities, materials, products, probabilities)
+    write_store(arrays, store_path, {'sde': {'content_hash': content_hash, 'files': files, 'language': language}})
+    print(f"Ingested {len(type_ids)} types and {len(activities[0])} blueprint activities "
+          f"({content_hash[:12]}) into {store_path}.")
+    return store_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the official SDE dump into the SDE store.")
+    parser.add_argument('source', help="SDE .zip or extracted folder (YAML or JSONL)")
+    parser.add_argument('--output', help=f"Store path [Default: {os.path.join(SDE_FOLDER, STORE_FILE)}]")
+    parser.add_argument('--language', default=SDE_LANGUAGE, help="Language for type names")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the input is unchanged")
+    args = parser.parse_args()
+    ingest(args.source, args.output, args.force, args.language)
+
+
+if __name__ == '__main__':
+    main()
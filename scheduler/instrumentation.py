@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+# DEBUG shows per-node traversal output; INFO (the default) keeps production runs quiet
+LOG_LEVEL = os.environ.get('EVEBG_LOG_LEVEL', 'INFO').upper()
+# Where to export metrics at the end of a run (.json or .prom for Prometheus text); unset to skip
+METRICS_FILE = os.environ.get('EVEBG_METRICS_FILE')
+METRICS_PREFIX = 'evebg'
+# --- END OF CONFIGURATION ---
+
+
+def get_logger(name='evebg'):
+    """Returns the shared logger, printing bare messages to stdout like the rest of the tools."""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    Process-wide timing spans and counters with JSON and Prometheus text export. Counters are kept
+    per thread and summed on export, so counting on hot paths (SDE lookups) takes no lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_counters = []  # Every thread's {(name, labels): value}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}      # (name, labels) -> [count, total seconds, max seconds]
+            for counters in self._thread_counters:
+                counters.clear()
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Times the enclosed block under the given span name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            key = _key(name, labels)
+            with self.lock:
+                stats = self.spans.setdefault(key, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+
+    def count(self, name, value=1, **labels):
+        """Adds value to a counter (e.g. sde_lookups, esi_requests, esi_bytes, cache_hits)."""
+        counters = getattr(self._local, 'counters', None)
+        if counters is None:
+            counters = self._local.counters = {}
+            with self.lock:
+                self._thread_counters.append(counters)
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    @property
+    def counters(self):
+        """(name, labels) -> value, summed over threads."""
+        totals = {}
+        for counters in list(self._thread_counters):
+            for key, value in counters.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def to_dict(self):
+        counters = self.counters
+        with self.lock:
+            return {
+                'spans': [{'name': name, 'labels': dict(labels), 'count': c, 'total_seconds': total,
+                           'max_seconds': longest}
+                          for (name, labels), (c, total, longest) in sorted(self.spans.items())],
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(counters.items())],
+            }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        def labels_text(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+        data = self.to_dict()
+        lines = [f'# TYPE {METRICS_PREFIX}_span_seconds_total counter',
+                 f'# TYPE {METRICS_PREFIX}_span_count_total counter',
+                 f'# TYPE {METRICS_PREFIX}_span_seconds_max gauge']
+        for span in data['spans']:
+            text = labels_text({'span': span['name'], **span['labels']})
+            lines.append(f"{METRICS_PREFIX}_span_seconds_total{text} {span['total_seconds']:.6f}")
+            lines.append(f"{METRICS_PREFIX}_span_count_total{text} {span['count']}")
+            lines.append(f"{METRICS_PREFIX}_span_seconds_max{text} {span['max_seconds']:.6f}")
+        for name in sorted({c['name'] for c in data['counters']}):
+            lines.append(f'# TYPE {METRICS_PREFIX}_{name}_total counter')
+            for counter in (c for c in data['counters'] if c['name'] == name):
+                lines.append(f"{METRICS_PREFIX}_{name}_total{labels_text(counter['labels'])} {counter['value']}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """One line per span, slowest first, for the end-of-run log."""
+        data = self.to_dict()
+        spans = sorted(data['spans'], key=lambda s: s['total_seconds'], reverse=True)
+        return '\n'.join(f"  {s['name']:<24} {s['total_seconds'] * 1000:>10.1f} ms  (x{s['count']})" for s in spans)
+
+    def export(self, path=METRICS_FILE):
+        """Writes the metrics to path as Prometheus text (.prom/.txt) or JSON (anything else)."""
+        if not path:
+            return
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
@@ -0,0 +1,123 @@
+"""
+Invention and copying: the science jobs that supply T2 blueprint copies.
+
+InventionSde wraps an SDE (SdeStore, SdeLoader or main.IndustryCalculator) so the chain engines see
+them as ordinary recipe nodes:
+    - a T2 blueprint is produced by inventing from its T1 blueprint. Each attempt yields the expected
+      number of blueprint runs, success chance x runs per success, and consumes the datacores,
+      the decryptor if one is configured, and one copy of the T1 blueprint;
+    - that copy is produced by copying the T1 blueprint;
+    - each manufacturing run from an invented blueprint consumes one blueprint run.
+Expected attempts and datacores then follow from the same runs arithmetic as every other job, and
+the success chance of every invention is computed in one vectorized pass when the wrapper is built.
+"""
+import numpy as np
+
+# --- CONFIGURATION ---
+# Skill levels: the two science skills of the datacores and the racial encryption skill
+SCIENCE_SKILL_LEVELS = (4, 4)
+ENCRYPTION_SKILL_LEVEL = 4
+# Decryptor used for every invention (a key of DECRYPTORS), or None
+DECRYPTOR = None
+# Base chance where the SDE has no probability (industryActivityProbabilities.csv) for an invention
+DEFAULT_BASE_CHANCE = 0.30
+# T2 blueprint names owned as originals, which need no invention
+OWNED_BLUEPRINTS = set()
+# --- END OF CONFIGURATION ---
+
+COPYING = 5
+INVENTION = 8
+# ME and TE of an invented blueprint before the decryptor's modifiers
+INVENTED_ME, INVENTED_TE = 2, 4
+# Decryptor -> (chance multiplier, extra runs, ME modifier, TE modifier)
+DECRYPTORS = {
+    None: (1.0, 0, 0, 0),
+    'Accelerant Decryptor': (1.2, 1, 2, 10),
+    'Attainment Decryptor': (1.8, 4, -1, 4),
+    'Augmentation Decryptor': (0.6, 9, -2, 2),
+    'Optimized Attainment Decryptor': (1.9, 2, 1, -2),
+    'Optimized Augmentation Decryptor': (0.9, 7, 2, 0),
+    'Parity Decryptor': (1.5, 3, 1, -2),
+    'Process Decryptor': (1.1, 0, 3, 6),
+    'Symmetry Decryptor': (1.0, 2, 1, 8),
+}
+
+
+def invention_chances(base_chances, science_levels=SCIENCE_SKILL_LEVELS, encryption_level=ENCRYPTION_SKILL_LEVEL,
+                      decryptor=DECRYPTOR):
+    """Success chance for each base chance (NaN for unknown), capped at 1."""
+    base = np.asarray(base_chances, dtype=np.float64)
+    base = np.where(np.isnan(base), DEFAULT_BASE_CHANCE, base)
+    skills = 1 + sum(science_levels) / 30 + encryption_level / 40
+    return np.minimum(1.0, base * skills * DECRYPTORS[decryptor][0])
+
+
+def expected_output(blueprint_info):
+    """Products per run; for an invention, the expected blueprint runs per attempt."""
+    quantity = int(blueprint_info['quantity'])
+    probability = blueprint_info.get('probability')
+    return quantity if probability is None else quantity * probability
+
+
+def with_invention(sde):
+    """sde wrapped in an InventionSde, unless it already is one."""
+    return sde if isinstance(sde, InventionSde) else InventionSde(sde)
+
+
+class InventionSde:
+    """An SDE whose recipe graph includes invention and copying; everything else is passed through."""
+
+    def __init__(self, sde, decryptor=DECRYPTOR, owned_blueprints=None):
+        if decryptor not in DECRYPTORS:
+            raise ValueError(f"Unknown decryptor '{decryptor}'; expected one of {', '.join(map(str, DECRYPTORS))}.")
+        self.sde = sde
+        owned = {sde.get_type_id(name) for name in (OWNED_BLUEPRINTS if owned_blueprints is None else owned_blueprints)}
+        rows = [row for row in sde.iter_inventions() if row[1] not in owned]
+        chances = invention_chances([row[3] for row in rows], decryptor=decryptor).tolist()
+        _, extra_runs, me, te = DECRYPTORS[decryptor]
+
+        self.inventions = {}  # T2 blueprint typeID -> invention, as get_blueprint_for_product returns it
+        for (t1_blueprint, t2_blueprint, runs, _), chance in zip(rows, chances):
+            self.inventions.setdefault(t2_blueprint, {
+                'typeID': t1_blueprint, 'activityID': INVENTION, 'productTypeID': t2_blueprint,
+                'quantity': runs + extra_runs, 'probability': chance})
+        self.copy_sources = {invention['typeID'] for invention in self.inventions.values()}
+        self.decryptor_id = None
+        if decryptor is not None:
+            self.decryptor_id = sde.get_type_id(decryptor)
+            if self.decryptor_id is None:
+                raise ValueError(f"Decryptor '{decryptor}' not found in the SDE.")
+        self.invented_levels = (INVENTED_ME + me, INVENTED_TE + te)
+
+    def __getattr__(self, name):
+        if name == 'sde':  # Not set yet; don't recurse
+            raise AttributeError(name)
+        return getattr(self.sde, name)
+
+    def get_blueprint_for_product(self, product_type_id):
+        """The SDE's blueprint, else the invention of a T2 blueprint or the copying of a T1 blueprint."""
+        blueprint = self.sde.get_blueprint_for_product(product_type_id)
+        if blueprint is not None:
+            return blueprint
+        invention = self.inventions.get(int(product_type_id))
+        if invention is not None:
+            return dict(invention)
+        if int(product_type_id) in self.copy_sources:
+            return {'typeID': int(product_type_id), 'activityID': COPYING, 'productTypeID': int(product_type_id),
+                    'quantity': 1}
+        return None
+
+    def iter_materials(self, blueprint_type_id, activity_id):
+        """The SDE's materials, plus the blueprint runs (and decryptor) consumed by manufacturing and invention."""
+        materials = list(self.sde.iter_materials(blueprint_type_id, activity_id))
+        blueprint_type_id, activity_id = int(blueprint_type_id), int(activity_id)
+        if activity_id == INVENTION and blueprint_type_id in self.copy_sources:
+            materials.append((blueprint_type_id, 1))
+            if self.decryptor_id is not None:
+                materials.append((self.decryptor_id, 1))
+        elif activity_id == 1 and blueprint_type_id in self.inventions:
+            materials.append((blueprint_type_id, 1))
+        return iter(materials)
+
+    def is_invented(self, blueprint_type_id):
+        return int(blueprint_type_id) in self.inventions
@@ -0,0 +1,156 @@
+"""
+Type-name index: exact, case-insensitive, prefix and fuzzy lookups of typeNames.
+
+Names are folded (case and runs of whitespace) into one hash map for exact lookups and one sorted
+list for prefix ranges found by bisection. Fuzzy matches come from a trigram inverted index, built
+on the first miss: candidates are ranked by trigram overlap in one vectorized count, and the
+best few are re-ranked by edit similarity.
+"""
+import heapq
+import difflib
+from bisect import bisect_left
+
+import numpy as np
+
+# --- CONFIGURATION ---
+SUGGESTION_LIMIT = 5
+# Fuzzy matches scoring below this (0-1, edit similarity) are not suggested
+MIN_SIMILARITY = 0.5
+# --- END OF CONFIGURATION ---
+
+
+def fold(name):
+    """The lookup key of a name: lower case, whitespace collapsed."""
+    return ' '.join(str(name).split()).casefold()
+
+
+def _trigram_codes(keys):
+    """
+    (codes, rows): every distinct trigram of each padded key as one int64 (three 21-bit code points)
+    and the key it belongs to, sorted by code.
+    """
+    padded = [f"  {key} " for key in keys]
+    width = max(map(len, padded))
+    points = np.array(padded, dtype=f'<U{width}').view(np.uint32).reshape(len(padded), width).astype(np.int64)
+    codes = (points[:, :-2] << 42) | (points[:, 1:-1] << 21) | points[:, 2:]
+    valid = np.arange(width - 2) < np.array([len(p) - 2 for p in padded])[:, None]
+    rows = np.broadcast_to(np.arange(len(padded))[:, None], codes.shape)[valid]
+    codes = codes[valid]
+    order = np.argsort(codes, kind='stable')  # rows are already ascending
+    codes, rows = codes[order], rows[order]
+    distinct = np.ones(len(codes), dtype=bool)
+    distinct[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+    return codes[distinct], rows[distinct]
+
+
+def describe_miss(query, suggestions):
+    """'<query>' not found, with the suggestions if there are any."""
+    message = f"'{query}' not found."
+    if suggestions:
+        message += " Did you mean: " + ", ".join(suggestions) + "?"
+    return message
+
+
+def prompt_for_name(index, prompt):
+    """Asks until the answer resolves to a name, suggesting names on a miss. Returns (typeID, typeName)."""
+    while True:
+        answer = input(prompt).strip()
+        match = index.resolve(answer)
+        if match is not None:
+            return match
+        print(describe_miss(answer, index.suggest(answer)))
+
+
+class NameIndex:
+    """Lookups over (typeID, typeName) pairs. For duplicate names the first pair wins."""
+
+    def __init__(self, type_ids, names):
+        self.type_ids = list(type_ids)
+        self.names = list(names)
+        self.exact = {}
+        self.folded = {}
+        for i, name in enumerate(self.names):
+            self.exact.setdefault(name, i)
+            self.folded.setdefault(fold(name), i)
+        self.keys = sorted(self.folded)  # Folded names, for prefix ranges
+        self._grams = None  # Trigram index, built on the first fuzzy lookup
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _row(self, name):
+        i = self.exact.get(name)
+        return self.folded.get(fold(name)) if i is None else i
+
+    def lookup(self, name):
+        """typeID of an exact name, else of the same name in any case; None if there is neither."""
+        i = self._row(name)
+        return None if i is None else self.type_ids[i]
+
+    def prefix(self, query, limit=SUGGESTION_LIMIT):
+        """Names starting with query (any case), shortest first."""
+        key = fold(query)
+        if not key:
+            return []
+        start = bisect_left(self.keys, key)
+        end = bisect_left(self.keys, key + '\U0010ffff', start)
+        matches = heapq.nsmallest(limit, self.keys[start:end], key=len)
+        return [self.names[self.folded[match]] for match in matches]
+
+    def build_trigrams(self):
+        """Builds the fuzzy index now rather than on the first miss."""
+        codes, rows = _trigram_codes(self.keys)
+        # CSR postings: trigram code -> the rows of the keys containing it
+        self._grams, starts = np.unique(codes, return_index=True)
+        self._gram_indptr = np.append(starts, len(codes))
+        self._gram_rows = rows
+        self._gram_counts = np.bincount(rows, minlength=len(self.keys))
+
+    def fuzzy(self, query, limit=SUGGESTION_LIMIT):
+        """Names most similar to query, best first: trigram overlap, then edit similarity."""
+        key = fold(query)
+        if not key:
+            return []
+        if self._grams is None:
+            self.build_trigrams()
+        codes, _ = _trigram_codes([key])
+        positions = np.minimum(np.searchsorted(self._grams, codes), len(self._grams) - 1)
+        positions = positions[self._grams[positions] == codes]  # Trigrams no name has are dropped
+        if not len(positions):
+            return []
+        hits = np.concatenate([self._gram_rows[start:end] for start, end in
+                               zip(self._gram_indptr[positions].tolist(), self._gram_indptr[positions + 1].tolist())])
+        shared = np.bincount(hits, minlength=len(self.keys))
+        dice = 2 * shared / (len(codes) + self._gram_counts)
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > limit * 8:
+            candidates = candidates[np.argpartition(-dice[candidates], limit * 8)[:limit * 8]]
+        scored = []
+        for row in candidates.tolist():
+            similarity = difflib.SequenceMatcher(None, key, self.keys[row]).ratio()
+            if similarity >= MIN_SIMILARITY:
+                scored.append((-similarity, -dice[row], self.keys[row]))
+        return [self.names[self.folded[match]] for _, _, match in sorted(scored)[:limit]]
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT):
+        """Prefix matches, then fuzzy matches, without repeats."""
+        suggestions = self.prefix(query, limit)
+        for name in self.fuzzy(query, limit):
+            if len(suggestions) >= limit:
+                break
+            if name not in suggestions:
+                suggestions.append(name)
+        return suggestions
+
+    def resolve(self, query):
+        """
+        (typeID, typeName) for an exact or case-insensitive name, or for a prefix only one name
+        starts with; None otherwise (see suggest()).
+        """
+        i = self._row(query)
+        if i is None:
+            matches = self.prefix(query, limit=2)
+            if len(matches) != 1:
+                return None
+            i = self._row(matches[0])
+        return self.type_ids[i], self.names[i]
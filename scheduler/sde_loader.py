@@ -1,14 +1,45 @@
+import os
+import numpy as np
 import pandas as pd
+from sde_store import PROBABILITIES_FILE, current_store
+from where_used import WhereUsedIndex
+from name_index import NameIndex
+from instrumentation import metrics
+
+# Narrow dtypes and only the columns the engines read; typeNames are categorical
+INV_TYPES_COLUMNS = {'typeID': 'int32', 'typeName': 'category'}
+ACTIVITY_DTYPES = {'typeID': 'int32', 'activityID': 'int8', 'time': 'int32'}
+MATERIAL_DTYPES = {'typeID': 'int32', 'activityID': 'int8', 'materialTypeID': 'int32', 'quantity': 'int32'}
+PRODUCT_DTYPES = {'typeID': 'int32', 'activityID': 'int8', 'productTypeID': 'int32', 'quantity': 'int32'}
 
 class SdeLoader:
     def __init__(self, data_path='../static_data'):
         """Load data from the EVE Online SDE files."""
+        self.data_path = data_path
+        self._inventions = None
+        self._name_index = None
+        # No CSV exports: use the store ingested from the official SDE (ingest_sde.py)
+        store = None if os.path.exists(f'{data_path}/invTypes.csv') else current_store(data_path)
+        if store is not None:
+            with metrics.span('sde_load'):
+                tables = store.tables()
+                self._inventions = list(store.iter_inventions())
+                self.inv_types, self.industry_activity, self.activity_materials, self.activity_products = tables
+                self.inv_types.set_index('typeID', inplace=True)
+            self._where_used = None
+            print("SDE data loaded successfully from the compiled store.")
+            return
         try:
-            self.industry_activity = pd.read_csv(f'{data_path}/industryActivity.csv')
-            self.activity_materials = pd.read_csv(f'{data_path}/industryActivityMaterials.csv')
-            self.activity_products = pd.read_csv(f'{data_path}/industryActivityProducts.csv')
-            self.inv_types = pd.read_csv(f'{data_path}/invTypes.csv')
-            self.inv_types.set_index('typeID', inplace=True)
+            with metrics.span('sde_load'):
+                self.industry_activity = pd.read_csv(f'{data_path}/industryActivity.csv', dtype=ACTIVITY_DTYPES)
+                self.activity_materials = pd.read_csv(f'{data_path}/industryActivityMaterials.csv',
+                                                      dtype=MATERIAL_DTYPES)
+                self.activity_products = pd.read_csv(f'{data_path}/industryActivityProducts.csv',
+                                                     dtype=PRODUCT_DTYPES)
+                self.inv_types = pd.read_csv(f'{data_path}/invTypes.csv', usecols=list(INV_TYPES_COLUMNS),
+                                             dtype=INV_TYPES_COLUMNS)
+                self.inv_types.set_index('typeID', inplace=True)
+            self._where_used = None
             print("SDE data loaded successfully.")
         except FileNotFoundError as e:
             print(f"Error loading SDE files: {e}. Make sure the 'static_data' directory is present.")
@@ -16,18 +47,27 @@ class SdeLoader:
 
     def get_type_name(self, type_id):
         """Get typeName from typeID."""
+        metrics.count('sde_lookups', method='get_type_name')
         try:
             return self.inv_types.loc[type_id, 'typeName']
         except KeyError:
             return f"Unknown TypeID: {type_id}"
 
+    @property
+    def name_index(self):
+        """Exact, case-insensitive, prefix and fuzzy name lookups, built on first use."""
+        if self._name_index is None:
+            self._name_index = NameIndex(self.inv_types.index.tolist(), self.inv_types['typeName'].tolist())
+        return self._name_index
+
     def get_type_id(self, type_name):
-        """Get typeID from typeName."""
-        result = self.inv_types[self.inv_types['typeName'] == type_name]
-        return result.index[0] if not result.empty else None
+        """Get typeID from typeName, in any case."""
+        metrics.count('sde_lookups', method='get_type_id')
+        return self.name_index.lookup(type_name)
 
     def get_blueprint_for_product(self, product_type_id):
         """Find the blueprint/formula that produces a given product."""
+        metrics.count('sde_lookups', method='get_blueprint_for_product')
         for activity_id in [1, 11]: # Prioritize manufacturing
             blueprint = self.activity_products[
                 (self.activity_products['productTypeID'] == product_type_id) & 
@@ -39,16 +79,56 @@ class SdeLoader:
 
     def get_materials(self, blueprint_type_id, activity_id):
         """Get materials required for a specific blueprint and activity."""
+        metrics.count('sde_lookups', method='get_materials')
         return self.activity_materials[
             (self.activity_materials['typeID'] == blueprint_type_id) & 
             (self.activity_materials['activityID'] == activity_id)
         ]
 
+    def iter_materials(self, blueprint_type_id, activity_id):
+        """Yields (materialTypeID, quantity) for one run of a blueprint activity."""
+        materials = self.get_materials(blueprint_type_id, activity_id)
+        return zip(materials['materialTypeID'].tolist(), materials['quantity'].tolist())
+
     def get_production_time(self, blueprint_type_id, activity_id):
         """Get the production time for a specific blueprint and activity."""
+        metrics.count('sde_lookups', method='get_production_time')
         time_info = self.industry_activity[
             (self.industry_activity['typeID'] == blueprint_type_id) & 
             (self.industry_activity['activityID'] == activity_id)
         ]
-        return time_info.iloc[0]['time'] if not time_info.empty else 0
+        return int(time_info.iloc[0]['time']) if not time_info.empty else 0
+
+    def iter_inventions(self):
+        """Yields (T1 blueprint typeID, T2 blueprint typeID, runs per success, base chance or NaN)."""
+        if self._inventions is None:
+            inventions = self.activity_products[self.activity_products['activityID'] == 8]
+            probabilities_path = os.path.join(self.data_path, PROBABILITIES_FILE)
+            if os.path.exists(probabilities_path):
+                probabilities = pd.read_csv(probabilities_path)
+                inventions = inventions.merge(probabilities, how='left', on=['typeID', 'activityID', 'productTypeID'])
+            else:
+                inventions = inventions.assign(probability=np.nan)
+            self._inventions = list(zip(inventions['typeID'].tolist(), inventions['productTypeID'].tolist(),
+                                        inventions['quantity'].tolist(), inventions['probability'].tolist()))
+        return iter(self._inventions)
+
+    @property
+    def where_used(self):
+        """Reverse-dependency index, built on first use."""
+        if self._where_used is None:
+            with metrics.span('where_used_build'):
+                self._where_used = WhereUsedIndex(self.activity_materials, self.activity_products)
+        return self._where_used
+
+    def get_direct_consumers(self, type_id):
+        """Get the typeIDs of products whose recipe uses this type directly."""
+        return self.where_used.direct_consumers(type_id)
+
+    def get_dependent_products(self, type_id):
+        """Get the typeIDs of every product that depends on this type, directly or transitively."""
+        return self.where_used.transitive_consumers(type_id)
 
+    def depends_on(self, product_type_id, material_type_id):
+        """Check whether a product's production chain uses a material anywhere."""
+        return self.where_used.depends_on(product_type_id, material_type_id)
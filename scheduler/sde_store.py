@@ -0,0 +1,282 @@
+"""
+Compiled SDE store: the recipe tables as flat numpy arrays in one .npz file.
+
+Loading the store imports only numpy, so quick chain and requirement lookups start
+without pandas. SdeStore answers the same lookups as SdeLoader; load_sde() picks
+the store when it is up to date with the CSV exports and falls back to SdeLoader otherwise.
+"""
+import os
+import csv
+import json
+import numpy as np
+
+from instrumentation import metrics
+from name_index import NameIndex
+
+# --- CONFIGURATION ---
+SDE_FOLDER = '../static_data'
+STORE_FILE = 'sde_store.npz'  # Written next to the CSV exports
+# --- END OF CONFIGURATION ---
+
+STORE_VERSION = 2
+SOURCE_FILES = ['invTypes.csv', 'industryActivity.csv', 'industryActivityMaterials.csv',
+                'industryActivityProducts.csv']
+# Invention success chances; without them invention.DEFAULT_BASE_CHANCE is used
+PROBABILITIES_FILE = 'industryActivityProbabilities.csv'
+ACTIVITY_ORDER = [1, 11]  # Manufacturing is preferred over reactions when both make a product
+INVENTION = 8
+
+
+def _activity_key(type_ids, activity_ids):
+    """Packs (blueprint typeID, activityID) into one sortable int64 key."""
+    return np.asarray(type_ids, dtype=np.int64) * 64 + np.asarray(activity_ids, dtype=np.int64)
+
+
+def _source_signature(data_path):
+    """Sizes and modification times of the CSV exports, to tell when a compiled store is stale."""
+    signature = {}
+    for name in SOURCE_FILES + [PROBABILITIES_FILE]:
+        path = os.path.join(data_path, name)
+        if name == PROBABILITIES_FILE and not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        signature[name] = [stat.st_size, int(stat.st_mtime)]
+    return signature
+
+
+def _read_columns(path, columns, converters):
+    """Reads the named CSV columns into lists with the csv module."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(col) for col in columns]
+        values = [[] for _ in columns]
+        for row in reader:
+            for out, pos, convert in zip(values, positions, converters):
+                out.append(convert(row[pos]))
+    return values
+
+
+def build_arrays(type_ids, names, activities, materials, products, probabilities=None):
+    """
+    Builds the store arrays from plain sequences:
+    types (typeID, name), activities (blueprintID, activityID, time),
+    materials (blueprintID, activityID, materialTypeID, quantity) and
+    products (blueprintID, activityID, productTypeID, quantity), each as a tuple of columns.
+    probabilities, if given, holds each product row's success chance (NaN where there is none).
+    """
+    type_ids = np.asarray(type_ids, dtype=np.int32)
+    order = np.argsort(type_ids, kind='stable')
+    encoded = [names[i].encode('utf-8') for i in order]
+    name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(n) for n in encoded], out=name_offsets[1:])
+
+    act_key = _activity_key(activities[0], activities[1])
+    act_order = np.argsort(act_key, kind='stable')
+
+    mat_key = _activity_key(materials[0], materials[1])
+    mat_order = np.argsort(mat_key, kind='stable')
+    mat_keys, mat_counts = np.unique(mat_key[mat_order], return_counts=True)
+
+    # Products keep only manufacturing and reactions, ordered by product then activity preference
+    prod_activity = np.asarray(products[1], dtype=np.int64)
+    keep = np.isin(prod_activity, ACTIVITY_ORDER)
+    rank = np.searchsorted(ACTIVITY_ORDER, prod_activity[keep])
+    prod_ids = np.asarray(products[2], dtype=np.int64)[keep]
+    prod_order = np.lexsort((rank, prod_ids))
+
+    # Inventions are kept apart: T1 blueprint -> T2 blueprint, runs per success and base chance
+    invention = np.asarray(products[1], dtype=np.int64) == INVENTION
+    probabilities = np.full(len(invention), np.nan) if probabilities is None else \
+        np.asarray(probabilities, dtype=np.float64)
+
+    return {
+        'version': np.array(STORE_VERSION),
+        'type_ids': type_ids[order],
+        'name_blob': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'name_offsets': name_offsets,
+        'activity_keys': act_key[act_order],
+        'activity_time': np.asarray(activities[2], dtype=np.int32)[act_order],
+        'material_keys': mat_keys,
+        'material_indptr': np.concatenate([[0], np.cumsum(mat_counts)]).astype(np.int64),
+        'material_type_ids': np.asarray(materials[2], dtype=np.int32)[mat_order],
+        'material_qty': np.asarray(materials[3], dtype=np.int32)[mat_order],
+        'product_type_ids': prod_ids[prod_order].astype(np.int32),
+        'product_blueprint_ids': np.asarray(products[0], dtype=np.int32)[keep][prod_order],
+        'product_activity_ids': prod_activity[keep][prod_order].astype(np.int8),
+        'product_qty': np.asarray(products[3], dtype=np.int32)[keep][prod_order],
+        'invention_blueprint_ids': np.asarray(products[0], dtype=np.int32)[invention],
+        'invention_product_ids': np.asarray(products[2], dtype=np.int32)[invention],
+        'invention_qty': np.asarray(products[3], dtype=np.int32)[invention],
+        'invention_probability': probabilities[invention],
+    }
+
+
+def write_store(arrays, store_path, source=None):
+    """Writes the arrays (plus a JSON source description) atomically to store_path."""
+    arrays = dict(arrays, source=np.array(json.dumps(source or {})))
+    tmp_path = f"{store_path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, store_path)
+    return store_path
+
+
+def compile_store(data_path=SDE_FOLDER, store_path=None):
+    """Compiles the CSV exports in data_path into the store file. Returns its path."""
+    store_path = store_path or os.path.join(data_path, STORE_FILE)
+    with metrics.span('store_compile'):
+        types = _read_columns(os.path.join(data_path, 'invTypes.csv'), ['typeID', 'typeName'], [int, str])
+        activities = _read_columns(os.path.join(data_path, 'industryActivity.csv'),
+                                   ['typeID', 'activityID', 'time'], [int, int, int])
+        materials = _read_columns(os.path.join(data_path, 'industryActivityMaterials.csv'),
+                                  ['typeID', 'activityID', 'materialTypeID', 'quantity'], [int, int, int, int])
+        products = _read_columns(os.path.join(data_path, 'industryActivityProducts.csv'),
+                                 ['typeID', 'activityID', 'productTypeID', 'quantity'], [int, int, int, int])
+        probabilities = None
+        probabilities_path = os.path.join(data_path, PROBABILITIES_FILE)
+        if os.path.exists(probabilities_path):
+            columns = _read_columns(probabilities_path, ['typeID', 'activityID', 'productTypeID', 'probability'],
+                                    [int, int, int, float])
+            chances = dict(zip(zip(*columns[:3]), columns[3]))
+            probabilities = [chances.get(key, np.nan) for key in zip(products[0], products[1], products[2])]
+        arrays = build_arrays(types[0], types[1], activities, materials, products, probabilities)
+        return write_store(arrays, store_path, {'csv': _source_signature(data_path)})
+
+
+class SdeStore:
+    """Read-only lookups over a compiled store, with the same methods the dependency engines use on SdeLoader."""
+
+    def __init__(self, store_path):
+        with metrics.span('sde_load', source='store'):
+            with np.load(store_path) as data:
+                self.arrays = {name: data[name] for name in data.files}
+        for name, array in self.arrays.items():
+            setattr(self, name, array)
+        self.version = int(self.arrays['version'])
+        self.source = json.loads(str(self.arrays['source']))
+        self._name_bytes = self.name_blob.tobytes()
+        self._names = None
+        self._name_index = None
+
+    @property
+    def names(self):
+        """Every typeName, decoded once so all plans share the same string objects."""
+        if self._names is None:
+            self._names = [self._name_bytes[a:b].decode('utf-8')
+                           for a, b in zip(self.name_offsets[:-1].tolist(), self.name_offsets[1:].tolist())]
+        return self._names
+
+    def tables(self):
+        """The store as the DataFrames SdeLoader reads from the CSV exports (imports pandas)."""
+        import pandas as pd
+        inv_types = pd.DataFrame({'typeID': self.type_ids, 'typeName': pd.Categorical(self.names)})
+        industry_activity = pd.DataFrame({'typeID': (self.activity_keys // 64).astype(np.int32),
+                                          'activityID': (self.activity_keys % 64).astype(np.int8),
+                                          'time': self.activity_time})
+        keys = np.repeat(self.material_keys, np.diff(self.material_indptr))
+        activity_materials = pd.DataFrame({'typeID': (keys // 64).astype(np.int32),
+                                           'activityID': (keys % 64).astype(np.int8),
+                                           'materialTypeID': self.material_type_ids, 'quantity': self.material_qty})
+        activity_products = pd.DataFrame({'typeID': self.product_blueprint_ids,
+                                          'activityID': self.product_activity_ids,
+                                          'productTypeID': self.product_type_ids, 'quantity': self.product_qty})
+        return inv_types, industry_activity, activity_materials, activity_products
+
+    def _type_row(self, type_id):
+        pos = int(np.searchsorted(self.type_ids, type_id))
+        if pos < len(self.type_ids) and self.type_ids[pos] == type_id:
+            return pos
+        return None
+
+    def get_type_name(self, type_id):
+        """Get typeName from typeID."""
+        metrics.count('sde_lookups', method='get_type_name')
+        row = self._type_row(type_id)
+        if row is None:
+            return f"Unknown TypeID: {type_id}"
+        return self.names[row]
+
+    @property
+    def name_index(self):
+        """Exact, case-insensitive, prefix and fuzzy name lookups, built on first use."""
+        if self._name_index is None:
+            # For duplicate names the lowest typeID wins
+            self._name_index = NameIndex(self.type_ids.tolist(), self.names)
+        return self._name_index
+
+    def get_type_id(self, type_name):
+        """Get typeID from typeName, in any case."""
+        metrics.count('sde_lookups', method='get_type_id')
+        return self.name_index.lookup(type_name)
+
+    def get_blueprint_for_product(self, product_type_id):
+        """Find the blueprint/formula that produces a given product, preferring manufacturing."""
+        metrics.count('sde_lookups', method='get_blueprint_for_product')
+        pos = int(np.searchsorted(self.product_type_ids, product_type_id))
+        if pos == len(self.product_type_ids) or self.product_type_ids[pos] != product_type_id:
+            return None
+        return {'typeID': int(self.product_blueprint_ids[pos]), 'activityID': int(self.product_activity_ids[pos]),
+                'productTypeID': int(product_type_id), 'quantity': int(self.product_qty[pos])}
+
+    def iter_materials(self, blueprint_type_id, activity_id):
+        """Yields (materialTypeID, quantity) for one run of a blueprint activity."""
+        metrics.count('sde_lookups', method='get_materials')
+        key = int(_activity_key(blueprint_type_id, activity_id))
+        pos = int(np.searchsorted(self.material_keys, key))
+        if pos == len(self.material_keys) or self.material_keys[pos] != key:
+            return iter(())
+        start, end = self.material_indptr[pos], self.material_indptr[pos + 1]
+        return zip(self.material_type_ids[start:end].tolist(), self.material_qty[start:end].tolist())
+
+    def get_production_time(self, blueprint_type_id, activity_id):
+        """Get the production time for a specific blueprint and activity."""
+        metrics.count('sde_lookups', method='get_production_time')
+        key = int(_activity_key(blueprint_type_id, activity_id))
+        pos = int(np.searchsorted(self.activity_keys, key))
+        if pos == len(self.activity_keys) or self.activity_keys[pos] != key:
+            return 0
+        return int(self.activity_time[pos])
+
+    def iter_inventions(self):
+        """Yields (T1 blueprint typeID, T2 blueprint typeID, runs per success, base chance or NaN)."""
+        return zip(self.invention_blueprint_ids.tolist(), self.invention_product_ids.tolist(),
+                   self.invention_qty.tolist(), self.invention_probability.tolist())
+
+
+def current_store(data_path=SDE_FOLDER):
+    """
+    The store in data_path, used as-is when the CSV exports are missing (e.g. one ingested by
+    ingest_sde.py). None if there is no store or it was written by an older version.
+    """
+    store_path = os.path.join(data_path, STORE_FILE)
+    if not os.path.exists(store_path):
+        return None
+    store = SdeStore(store_path)
+    if store.version != STORE_VERSION:
+        print(f"{store_path} is a version {store.version} store; rebuild it with ingest_sde.py "
+              f"(version {STORE_VERSION}).")
+        return None
+    return store
+
+
+def load_sde(data_path=SDE_FOLDER, compile_if_stale=True):
+    """
+    Returns an SdeStore when the compiled store matches the CSV exports (compiling it if
+    allowed), otherwise a pandas-backed SdeLoader.
+    """
+    store_path = os.path.join(data_path, STORE_FILE)
+    try:
+        signature = _source_signature(data_path)
+    except FileNotFoundError:
+        signature = None
+    if os.path.exists(store_path):
+        store = SdeStore(store_path)
+        # Stores ingested from the official SDE (ingest_sde.py) take precedence over the CSV exports
+        if store.version == STORE_VERSION and ('sde' in store.source or store.source.get('csv') == signature):
+            return store
+    if signature is not None and compile_if_stale:
+        print("Compiling SDE store...")
+        return SdeStore(compile_store(data_path, store_path))
+
+    from sde_loader import SdeLoader
+    return SdeLoader(data_path)
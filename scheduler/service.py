@@ -0,0 +1,374 @@
+"""
+Resident planning service: loads the SDE, indexes and price snapshot once and answers
+chain, requirement, where-used, profit, plan and name search queries over a local HTTP or
+Unix-socket API. Products may be given by typeID, by name in any case or by an unambiguous prefix.
+
+Usage (from the scheduler folder):
+    python service.py                       # http://127.0.0.1:8765
+    python service.py --socket /tmp/evebg.sock
+
+Endpoints:
+    GET  /health            -> {"status": "ok", ...}
+    GET  /metrics           -> Prometheus text from instrumentation.metrics
+    POST /query             -> {"op": "requirements", "product": "Eris", "quantity": 10}
+                               {"op": "search", "query": "fermonic cond", "limit": 5}
+    POST /batch             -> {"queries": [{"op": ...}, ...]}  (identical queries run once)
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from sde_loader import SdeLoader
+from dependency_calculator import DependencyCalculator
+from bonuses import BonusEngine
+from invention import with_invention
+from name_index import SUGGESTION_LIMIT, describe_miss
+from industrial_scheduler import IndustrialScheduler
+from instrumentation import metrics, get_logger
+
+# --- CONFIGURATION ---
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+SDE_FOLDER = '../static_data'
+# Connections handled at once; further clients wait in the listen backlog
+MAX_CONNECTIONS = 16
+# Threads running queries (shared by every connection and batch)
+QUERY_WORKERS = min(8, os.cpu_count() or 1)
+MAX_BATCH_SIZE = 256
+# The reactions folder provides the profit engine and the shared price cache
+REACTIONS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'reactions')
+PRICE_CACHE_FILE = os.path.join(REACTIONS_FOLDER, 'price_cache.json')
+# --- END OF CONFIGURATION ---
+
+log = get_logger()
+
+
+class QueryError(ValueError):
+    """A malformed query or an unknown product; reported to the client as a 400."""
+
+
+def _to_json(value):
+    """json.dumps default for numpy/pandas scalars and arrays."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class PlanningService:
+    """Holds the loaded SDE and price snapshot and answers queries; safe to call from many threads."""
+
+    def __init__(self, sde_path=SDE_FOLDER, with_prices=True):
+        with metrics.span('service_start'):
+            # Wrapped once, so every query sees invention and copying without rebuilding the index
+            self.sde = with_invention(SdeLoader(sde_path))
+            # Build the lazily created indexes now so the first query doesn't pay for them
+            self.sde.where_used
+            self.sde.name_index.build_trigrams()
+            self.names = self.sde.inv_types['typeName']
+            # Adjusted recipes are cached in the engine, so every query shares one
+            self.bonuses = BonusEngine(self.sde)
+            self.engine = None
+            self.hub_prices = None
+            self.prices = {}  # price source -> select_hub_prices() table, built on first use
+            self.prices_loaded_at = None
+            self.prices_lock = threading.Lock()
+            if with_prices:
+                self._load_profit_engine()
+
+        self.ops = {
+            'requirements': self.requirements,
+            'chain': self.chain,
+            'where_used': self.where_used,
+            'profit': self.profit,
+            'plan': self.plan,
+            'search': self.search,
+        }
+
+    def _load_profit_engine(self):
+        """Builds the reaction ProfitEngine over the already loaded SDE tables and loads the price snapshot."""
+        sys.path.insert(0, os.path.abspath(REACTIONS_FOLDER))
+        import calculator
+        from profit_engine import ProfitEngine
+
+        self.calculator = calculator
+        inv_types = self.sde.inv_types.reset_index()
+        reactions = calculator.filter_composite_reactions(inv_types, self.sde.industry_activity)
+        self.engine = ProfitEngine(reactions[['typeID', 'typeName']], self.sde.industry_activity,
+                                   self.sde.activity_materials, self.sde.activity_products, activity_id=11,
+                                   time_multiplier=calculator.REACTION_TIME_MULTIPLIER)
+        self._refresh_prices()
+
+    def _refresh_prices(self):
+        with metrics.span('price_load'):
+            self.hub_prices = self.calculator.get_market_prices(cache_file=PRICE_CACHE_FILE)
+            source = self.calculator.PRICE_SOURCE
+            self.prices = {source: self.calculator.select_hub_prices(self.hub_prices, source)}
+        self.prices_loaded_at = time.time()
+
+    def current_prices(self, source=None):
+        """
+        The price snapshot for a price source (default: the calculator's PRICE_SOURCE), reloaded from
+        the shared cache (or ESI) once it is older than the cache lifetime.
+        """
+        source = source or self.calculator.PRICE_SOURCE
+        if source not in self.calculator.PRICE_SOURCES:
+            raise QueryError(f"'price_source' must be one of {', '.join(self.calculator.PRICE_SOURCES)}.")
+        with self.prices_lock:
+            if time.time() - self.prices_loaded_at > self.calculator.CACHE_EXPIRATION_HOURS * 3600:
+                self._refresh_prices()
+            if source not in self.prices:
+                self.prices[source] = self.calculator.select_hub_prices(self.hub_prices, source)
+            return self.prices[source]
+
+    def _product(self, query):
+        """Resolves the query's 'product' (name or typeID) to (type_id, name)."""
+        product = query.get('product')
+        if product is None:
+            raise QueryError("Missing 'product'.")
+        if isinstance(product, int) or (isinstance(product, str) and product.isdigit()):
+            type_id = int(product)
+            if type_id not in self.names.index:
+                raise QueryError(f"Unknown typeID {type_id}.")
+            return type_id, self.names.loc[type_id]
+        match = self.sde.name_index.resolve(str(product))
+        if match is None:
+            raise QueryError(f"Product {describe_miss(product, self.sde.name_index.suggest(str(product)))}")
+        return int(match[0]), match[1]
+
+    @staticmethod
+    def _quantity(query, key='quantity', default=1):
+        try:
+            value = int(query.get(key, default))
+        except (TypeError, ValueError):
+            raise QueryError(f"'{key}' must be an integer.")
+        if value < 1:
+            raise QueryError(f"'{key}' must be at least 1.")
+        return value
+
+    def requirements(self, query):
+        """Raw materials and intermediate components for a product."""
+        _, name = self._product(query)
+        quantity = self._quantity(query)
+        raws, components = DependencyCalculator(self.sde, self.bonuses).get_total_requirements(name, quantity)
+        return {'product': name, 'quantity': quantity, 'raw_materials': raws,
+                'components': {component: details.to_dict() for component, details in components.items()}}
+
+    def chain(self, query):
+        """Every job in the production chain with its runs and total time."""
+        _, name = self._product(query)
+        quantity = self._quantity(query)
+        raws, components = DependencyCalculator(self.sde, self.bonuses).get_total_requirements(name, quantity)
+        jobs = []
+        for component, details in components.items():
+            runs = math.ceil(details.needed / details.products_per_run)
+            jobs.append({'name': component, 'activity_id': details.activity_id, 'runs': runs,
+                         'time_per_run': details.time_per_run, 'total_time': runs * details.time_per_run})
+        jobs.sort(key=lambda job: (job['activity_id'], job['name']))
+        return {'product': name, 'quantity': quantity, 'jobs': jobs,
+                'raw_materials': {mat: math.ceil(qty) for mat, qty in sorted(raws.items())}}
+
+    def where_used(self, query):
+        """Products that use a type directly and through intermediates."""
+        type_id, name = self._product(query)
+        return {'product': name,
+                'direct': [self.names.get(t, t) for t in self.sde.get_direct_consumers(type_id)],
+                'transitive': [self.names.get(t, t) for t in self.sde.get_dependent_products(type_id)]}
+
+    def profit(self, query):
+        """Reaction profitability on the current price snapshot, best weekly profit first."""
+        if self.engine is None:
+            raise QueryError("The service was started without prices.")
+        top = self._quantity(query, 'top', 10)
+        prices = self.current_prices(query.get('price_source'))
+        results = self.engine.compute(prices, self.calculator.BROKER_FEE, self.calculator.SALES_TAX)
+        results = results[(results['input_cost_sell'] > 0) & (results['output_revenue_buy'] > 0)]
+        if query.get('names'):
+            results = results[results['name'].isin(query['names'])]
+        results = results.sort_values('net_profit_per_week', ascending=False).head(top)
+        # Missing prices become null rather than NaN, which isn't valid JSON
+        results = results.astype(object).where(results.notna(), None)
+        return {'prices_loaded_at': self.prices_loaded_at, 'reactions': results.to_dict(orient='records')}
+
+    def plan(self, query):
+        """Action plan for a product given an inventory {name or typeID: quantity} and free slots."""
+        _, name = self._product(query)
+        assets = query.get('assets') or {}
+        if not isinstance(assets, dict):
+            raise QueryError("'assets' must be an object {name or typeID: quantity}.")
+        inventory = {}
+        for item, qty in assets.items():
+            if isinstance(qty, bool) or not isinstance(qty, int) or qty < 0:
+                raise QueryError(f"Quantity of asset '{item}' must be a non-negative integer.")
+            item_name = self.names.get(int(item), item) if str(item).isdigit() else item
+            inventory[item_name] = inventory.get(item_name, 0) + qty
+        scheduler = IndustrialScheduler(self.sde, use_esi=False, bonuses=self.bonuses)
+        scheduler.plan(name, self._quantity(query), inventory,
+                       self._quantity(query, 'mfg_slots', 9), self._quantity(query, 'react_slots', 9),
+                       self._quantity(query, 'science_slots', 9))
+        return {'product': name, **scheduler.action_plan()}
+
+    def search(self, query):
+        """Type names for a partial or misspelled name: prefix matches first, then fuzzy ones."""
+        text = query.get('query')
+        if not isinstance(text, str) or not text.strip():
+            raise QueryError("Missing 'query'.")
+        index = self.sde.name_index
+        names = index.suggest(text, self._quantity(query, 'limit', SUGGESTION_LIMIT))
+        return {'query': text, 'matches': [{'name': name, 'type_id': index.lookup(name)} for name in names]}
+
+    def run_query(self, query):
+        """Answers one query, returning {'result': ...} or {'error': ...}."""
+        if not isinstance(query, dict) or query.get('op') not in self.ops:
+            return {'error': f"Unknown op; expected one of {sorted(self.ops)}."}
+        try:
+            with metrics.span('query', op=query['op']):
+                return {'result': self.ops[query['op']](query)}
+        except QueryError as e:
+            metrics.count('query_errors', op=query['op'])
+            return {'error': str(e)}
+        except Exception as e:
+            # A bug or an unexpected query shape fails this query only, not the connection or the batch
+            log.exception(f"Query {query['op']} failed")
+            metrics.count('query_errors', op=query['op'])
+            return {'error': f"Internal error: {type(e).__name__}: {e}"}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body, content_type='application/json'):
+        data = body.encode() if isinstance(body, str) else json.dumps(body, default=_to_json).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            service = self.server.service
+            self._send(200, {'status': 'ok', 'prices_loaded_at': service.prices_loaded_at,
+                             'ops': sorted(service.ops)})
+        elif self.path == '/metrics':
+            self._send(200, metrics.to_prometheus(), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': f"Unknown path {self.path}."})
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except (ValueError, json.JSONDecodeError):
+            self._send(400, {'error': "Request body must be JSON."})
+            return
+
+        pool = self.server.query_pool
+        if self.path == '/query':
+            response = pool.submit(self.server.service.run_query, body).result()
+            self._send(400 if 'error' in response else 200, response)
+        elif self.path == '/batch':
+            queries = body.get('queries') if isinstance(body, dict) else None
+            if not isinstance(queries, list) or len(queries) > MAX_BATCH_SIZE:
+                self._send(400, {'error': f"'queries' must be a list of at most {MAX_BATCH_SIZE} queries."})
+                return
+            # Identical queries in one batch are computed once
+            keys = [json.dumps(q, sort_keys=True, default=str) for q in queries]
+            futures = {}
+            for key, query in zip(keys, queries):
+                if key not in futures:
+                    futures[key] = pool.submit(self.server.service.run_query, query)
+            metrics.count('batch_queries', len(queries))
+            self._send(200, {'results': [futures[key].result() for key in keys]})
+        else:
+            self._send(404, {'error': f"Unknown path {self.path}."})
+
+    def log_message(self, format, *args):
+        log.debug(f"{self.command} {self.path} - " + format % args)
+
+
+class _BoundedServerMixIn:
+    """Handles each connection on a bounded thread pool instead of a new thread per connection."""
+
+    def setup_pools(self, service, workers):
+        self.service = service
+        self.connection_pool = ThreadPoolExecutor(MAX_CONNECTIONS, thread_name_prefix='conn')
+        self.query_pool = ThreadPoolExecutor(workers, thread_name_prefix='query')
+
+    def process_request(self, request, client_address):
+        self.connection_pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.connection_pool.shutdown(wait=False)
+        self.query_pool.shutdown(wait=False)
+
+
+class PlanningHTTPServer(_BoundedServerMixIn, HTTPServer):
+    pass
+
+
+class PlanningUnixServer(_BoundedServerMixIn, socketserver.UnixStreamServer):
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) address
+        return request, ('unix', 0)
+
+
+def make_server(service, host=SERVICE_HOST, port=SERVICE_PORT, socket_path=None, workers=QUERY_WORKERS):
+    """Creates (but does not start) the HTTP server over TCP, or over a Unix socket if socket_path is given."""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = PlanningUnixServer(socket_path, ServiceHandler)
+    else:
+        server = PlanningHTTPServer((host, port), ServiceHandler)
+    server.setup_pools(service, workers)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve planning queries with the SDE kept in memory.")
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--socket', help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument('--sde', default=SDE_FOLDER, help="SDE folder")
+    parser.add_argument('--workers', type=int, default=QUERY_WORKERS, help="Query worker threads")
+    parser.add_argument('--no-prices', action='store_true', help="Skip the price snapshot (no profit queries)")
+    args = parser.parse_args()
+
+    print("--- Starting EVE Industry Planning Service ---")
+    start = time.perf_counter()
+    service = PlanningService(args.sde, with_prices=not args.no_prices)
+    server = make_server(service, args.host, args.port, args.socket, args.workers)
+    where = args.socket if args.socket else f"http://{args.host}:{args.port}"
+    print(f"Ready in {time.perf_counter() - start:.1f}s. Listening on {where} "
+          f"with {args.workers} query worker(s).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+        metrics.export()
+
+
+if __name__ == '__main__':
+    main()
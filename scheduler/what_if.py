@@ -0,0 +1,211 @@
+"""
+What-if comparison of plan variants: slot counts, items bought instead of built, target
+quantities and blueprint ME/TE levels.
+
+Every combination of the given options is planned in a process pool. Workers share the
+loaded SDE (inherited from the parent where processes fork, loaded once per worker
+elsewhere) and attach to the memory-mapped price snapshot, so no data is copied per variant.
+
+Usage (from the scheduler folder):
+    python what_if.py Eris 10 --slots 9/9 11/11/5 --me 0 10     # manufacturing/reaction[/science] slots
+    python what_if.py Eris 10 --buy "" "Fermionic Condensates" "Fermionic Condensates,Photonic Metamaterials"
+    python what_if.py Eris --variants variants.json     # [{"name": ..., "mfg_slots": 11, "me": 10, ...}]
+"""
+import os
+import sys
+import json
+import argparse
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from sde_store import SDE_FOLDER, load_sde
+from bonuses import BonusEngine, DEFAULT_ME, DEFAULT_TE
+from invention import with_invention, COPYING, INVENTION
+from name_index import describe_miss
+from industrial_scheduler import IndustrialScheduler
+from instrumentation import metrics
+
+# --- CONFIGURATION ---
+WHAT_IF_WORKERS = min(8, os.cpu_count() or 1)
+# Raw materials are costed at the cheapest sell order across hubs in the reaction tools' price snapshot
+REACTIONS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'reactions')
+PRICE_SNAPSHOT_FILE = os.path.join(REACTIONS_FOLDER, 'price_cache.bin')
+# --- END OF CONFIGURATION ---
+
+VARIANT_KEYS = {'name', 'mfg_slots', 'react_slots', 'science_slots', 'quantity', 'me', 'te', 'buy'}
+
+# Per-process state, set by _init_worker (or inherited from the parent)
+_sde = None
+_prices = None
+
+
+def _init_worker(sde_path, snapshot_path):
+    global _sde, _prices
+    if _sde is None:
+        with contextlib.redirect_stdout(sys.stderr):
+            _sde = with_invention(load_sde(sde_path))
+    if _prices is None and snapshot_path and os.path.exists(snapshot_path):
+        sys.path.insert(0, os.path.abspath(REACTIONS_FOLDER))
+        from price_snapshot import PriceSnapshot
+        try:
+            _prices = PriceSnapshot(snapshot_path)
+        except (OSError, ValueError) as e:
+            print(f"Could not attach to the price snapshot ({e}); ISK will not be shown.", file=sys.stderr)
+
+
+def _raw_cost(raw_materials):
+    """ISK for {name: quantity} at the cheapest sell price across hubs; None without prices."""
+    if _prices is None:
+        return None
+    names = list(raw_materials)
+    type_ids = [_sde.get_type_id(name) or -1 for name in names]
+    sell = _prices.lookup(type_ids)[:, :, _prices.columns.index('sell')]
+    total = 0.0
+    for name, row in zip(names, sell):
+        price = min((p for p in row.tolist() if p == p), default=0.0)  # skips NaN
+        total += price * raw_materials[name]
+    return total
+
+
+def evaluate_variant(product, variant, inventory):
+    """Plans one variant and measures it. Runs in a worker process."""
+    with metrics.span('what_if_variant'):
+        bonuses = BonusEngine(_sde, default_me=variant['me'], default_te=variant['te'])
+        scheduler = IndustrialScheduler(_sde, use_esi=False, bonuses=bonuses)
+        scheduler.dep_calc.raw_materials.update(variant['buy'])
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            scheduler.plan(product, variant['quantity'], inventory, variant['mfg_slots'], variant['react_slots'],
+                           variant['science_slots'])
+            schedule = scheduler.simulate_schedule()
+        to_buy = {name: max(0.0, qty - inventory.get(name, 0)) for name, qty in schedule['raw_materials'].items()}
+        makespan = schedule['makespan']
+        busy = schedule['busy']
+        utilization = {name: sum(busy.get(activity_id, 0.0) for activity_id in activities) / (slots * makespan)
+                       if makespan and slots else 0.0
+                       for name, activities, slots in (('mfg', (1,), variant['mfg_slots']),
+                                                       ('react', (11,), variant['react_slots']),
+                                                       ('science', (COPYING, INVENTION), variant['science_slots']))}
+        action_plan = scheduler.action_plan()
+    return {'variant': variant['name'], 'makespan': makespan, 'isk': _raw_cost(to_buy),
+            'mfg_utilization': utilization['mfg'], 'react_utilization': utilization['react'],
+            'science_utilization': utilization['science'],
+            'jobs_now': sum(len(jobs) for key, jobs in action_plan.items() if key != 'shopping_list')}
+
+
+def _variant(spec, defaults):
+    """Fills a variant dict from defaults and names it by what differs from them."""
+    unknown = set(spec) - VARIANT_KEYS
+    if unknown:
+        raise SystemExit(f"Unknown variant key(s): {', '.join(sorted(unknown))}")
+    variant = {**defaults, **spec}
+    variant['buy'] = sorted({name.strip() for name in variant['buy'] if name.strip()})
+    if 'name' not in spec:
+        parts = [f"slots {variant['mfg_slots']}/{variant['react_slots']}/{variant['science_slots']}",
+                 f"x{variant['quantity']}",
+                 f"ME {variant['me']}"]
+        if variant['te'] != defaults['te']:
+            parts.append(f"TE {variant['te']}")
+        if variant['buy']:
+            parts.append("buy " + ", ".join(variant['buy']))
+        variant['name'] = ' | '.join(parts)
+    return variant
+
+
+def build_variants(args):
+    """Every combination of the command-line options, or the variants listed in --variants."""
+    defaults = {'mfg_slots': 9, 'react_slots': 9, 'science_slots': 9, 'quantity': args.quantity, 'me': DEFAULT_ME,
+                'te': DEFAULT_TE, 'buy': []}
+    if args.variants:
+        with open(args.variants, 'r') as f:
+            return [_variant(spec, defaults) for spec in json.load(f)]
+
+    slots = []
+    for value in args.slots or ['9/9']:
+        try:
+            counts = [int(part) for part in value.split('/')]
+        except ValueError:
+            counts = []
+        if len(counts) not in (2, 3):
+            raise SystemExit(f"--slots takes manufacturing/reaction[/science] counts like 9/9 or 9/9/5, not '{value}'")
+        slots.append((counts + [defaults['science_slots']])[:3])
+    buy_sets = [value.split(',') for value in (args.buy or [''])]
+    variants = []
+    for (mfg, react, science), quantity, me, te, buy in itertools.product(
+            slots, args.quantities or [args.quantity], args.me or [DEFAULT_ME], args.te or [DEFAULT_TE], buy_sets):
+        variants.append(_variant({'mfg_slots': mfg, 'react_slots': react, 'science_slots': science,
+                                  'quantity': quantity, 'me': me, 'te': te, 'buy': buy}, defaults))
+    return variants
+
+
+def compare_variants(product, variants, inventory=None, sde_path=SDE_FOLDER, snapshot_path=PRICE_SNAPSHOT_FILE,
+                     workers=WHAT_IF_WORKERS):
+    """
+    Evaluates the variants in a process pool; returns one result dict per variant, in order.
+    Product and item names may be in any case or unambiguous prefixes.
+    """
+    _init_worker(sde_path, snapshot_path)  # Loaded before the pool starts so forked workers inherit it
+    index = _sde.name_index
+
+    def canonical(name):
+        match = index.resolve(name)
+        if match is None:
+            raise SystemExit(describe_miss(name, index.suggest(name)))
+        return match[1]
+
+    product = canonical(product)
+    for variant in variants:
+        variant['buy'] = [canonical(name) for name in variant['buy']]
+
+    inventory = inventory or {}
+    with metrics.span('what_if'):
+        if workers <= 1 or len(variants) == 1:
+            return [evaluate_variant(product, variant, inventory) for variant in variants]
+        with ProcessPoolExecutor(max_workers=min(workers, len(variants)), initializer=_init_worker,
+                                 initargs=(sde_path, snapshot_path)) as pool:
+            return list(pool.map(evaluate_variant, itertools.repeat(product), variants, itertools.repeat(inventory)))
+
+
+def print_comparison(results):
+    width = max([len('Variant')] + [len(r['variant']) for r in results])
+    header = (f"{'Variant':<{width}} | {'Makespan':>10} | {'ISK Spent':>18} | {'Mfg Util':>8} | {'React Util':>10} | "
+              f"{'Sci Util':>8} | {'Jobs Now':>8}")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        isk = 'n/a' if r['isk'] is None else f"{r['isk']:,.0f}"
+        print(f"{r['variant']:<{width}} | {r['makespan'] / 86400:>8.1f} d | {isk:>18} | "
+              f"{r['mfg_utilization']:>8.0%} | {r['react_utilization']:>10.0%} | {r['science_utilization']:>8.0%} | "
+              f"{r['jobs_now']:>8}")
+    if any(r['isk'] is None for r in results):
+        print("\nISK needs the price snapshot; run reactions/calculator.py to publish it.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare makespan, ISK and slot utilization across plan variants.")
+    parser.add_argument('product', help="Product name, e.g. Eris")
+    parser.add_argument('quantity', nargs='?', type=int, default=1)
+    parser.add_argument('--slots', nargs='+', metavar='MFG/REACT[/SCIENCE]', help="Slot counts, e.g. 9/9 11/11/5")
+    parser.add_argument('--quantities', nargs='+', type=int, metavar='N', help="Target quantities to compare")
+    parser.add_argument('--me', nargs='+', type=int, help="Default blueprint ME levels to compare")
+    parser.add_argument('--te', nargs='+', type=int, help="Default blueprint TE levels to compare")
+    parser.add_argument('--buy', nargs='+', metavar='ITEMS',
+                        help="Sets of comma-separated items to buy instead of build; \"\" for none")
+    parser.add_argument('--variants', help="JSON file with a list of variants instead of the options above")
+    parser.add_argument('--assets', help="JSON file with the inventory {name: quantity}")
+    parser.add_argument('--workers', type=int, default=WHAT_IF_WORKERS)
+    parser.add_argument('--sde', default=SDE_FOLDER, help="SDE folder")
+    args = parser.parse_args()
+
+    inventory = {}
+    if args.assets:
+        with open(args.assets, 'r') as f:
+            inventory = json.load(f)
+    variants = build_variants(args)
+    print(f"Evaluating {len(variants)} variant(s) of {args.product}...\n")
+    results = compare_variants(args.product, variants, inventory, args.sde, workers=args.workers)
+    print_comparison(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import numpy as np
+from collections import deque
+
+
+class WhereUsedIndex:
+    """
+    Reverse-dependency index over the SDE recipe tables.
+
+    Direct consumers are kept as CSR arrays (material row -> product columns) and the
+    transitive closure as one packed bitset row per material, so "which products depend
+    on X, directly or through intermediates" is a single row unpack.
+    """
+
+    def __init__(self, activity_materials, activity_products, activities=(1, 11)):
+        materials = activity_materials[activity_materials['activityID'].isin(activities)]
+        products = activity_products[activity_products['activityID'].isin(activities)]
+        # material -> product edges through the blueprint that consumes the material
+        edges = materials.merge(products, on=['typeID', 'activityID'])[['materialTypeID', 'productTypeID']]
+        edges = edges.drop_duplicates().sort_values(['materialTypeID', 'productTypeID'])
+
+        self.materials = np.unique(edges['materialTypeID'].to_numpy()).astype(np.int64)
+        self.products = np.unique(edges['productTypeID'].to_numpy()).astype(np.int64)
+        rows = np.searchsorted(self.materials, edges['materialTypeID'].to_numpy())
+        cols = np.searchsorted(self.products, edges['productTypeID'].to_numpy())
+
+        counts = np.bincount(rows, minlength=len(self.materials))
+        self.direct_indptr = np.concatenate([[0], np.cumsum(counts)])
+        self.direct_cols = cols
+        self.closure = self._build_closure()
+
+    def _row(self, type_id):
+        pos = np.searchsorted(self.materials, type_id)
+        if pos < len(self.materials) and self.materials[pos] == type_id:
+            return pos
+        return None
+
+    def _col(self, type_id):
+        pos = np.searchsorted(self.products, type_id)
+        if pos < len(self.products) and self.products[pos] == type_id:
+            return pos
+        return None
+
+    def _build_closure(self):
+        """Computes each material's transitive consumers, consumers before suppliers (reverse topological order)."""
+        n_rows, n_cols = len(self.materials), len(self.products)
+        # Product column -> material row, for products that are themselves consumed further up
+        col_to_row = np.full(n_cols, -1, dtype=np.int64)
+        shared = np.isin(self.products, self.materials)
+        col_to_row[shared] = np.searchsorted(self.materials, self.products[shared])
+
+        consumer_rows = [col_to_row[self.direct_cols[self.direct_indptr[r]:self.direct_indptr[r + 1]]]
+                         for r in range(n_rows)]
+        consumer_rows = [c[c >= 0] for c in consumer_rows]
+        suppliers = [[] for _ in range(n_rows)]
+        for r, consumers in enumerate(consumer_rows):
+            for c in consumers:
+                suppliers[c].append(r)
+
+        closure = np.zeros((n_rows, (n_cols + 7) // 8), dtype=np.uint8)
+
+        def update(r):
+            bits = np.zeros(n_cols, dtype=bool)
+            bits[self.direct_cols[self.direct_indptr[r]:self.direct_indptr[r + 1]]] = True
+            row = np.packbits(bits)
+            for c in consumer_rows[r]:
+                row |= closure[c]
+            changed = not np.array_equal(row, closure[r])
+            closure[r] = row
+            return changed
+
+        pending = np.array([len(c) for c in consumer_rows])
+        queue = deque(np.flatnonzero(pending == 0))
+        done = np.zeros(n_rows, dtype=bool)
+        while queue:
+            r = queue.popleft()
+            update(r)
+            done[r] = True
+            for s in suppliers[r]:
+                pending[s] -= 1
+                if pending[s] == 0:
+                    queue.append(s)
+
+        # Rows on recipe cycles: iterate to a fixpoint
+        cyclic = np.flatnonzero(~done)
+        changed = len(cyclic) > 0
+        while changed:
+            changed = False
+            for r in cyclic:
+                changed |= update(r)
+        return closure
+
+    def direct_consumers(self, type_id):
+        """typeIDs of products whose recipe uses type_id directly."""
+        r = self._row(type_id)
+        if r is None:
+            return np.empty(0, dtype=np.int64)
+        return self.products[self.direct_cols[self.direct_indptr[r]:self.direct_indptr[r + 1]]]
+
+    def transitive_consumers(self, type_id):
+        """typeIDs of every product that depends on type_id, directly or through intermediates."""
+        r = self._row(type_id)
+        if r is None:
+            return np.empty(0, dtype=np.int64)
+        bits = np.unpackbits(self.closure[r], count=len(self.products)).astype(bool)
+        return self.products[bits]
+
+    def depends_on(self, product_id, material_id):
+        """True if building product_id needs material_id anywhere in its chain."""
+        r, c = self._row(material_id), self._col(product_id)
+        if r is None or c is None:
+            return False
+        return bool(self.closure[r, c >> 3] & (0x80 >> (c & 7)))
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The tools are scripts run from their own folders; import them the same way
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'scheduler'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'reactions'))
+
+
+@pytest.fixture
+def tiny_tables():
+    """
+    A hand-built SDE: reaction formula 100 turns 10 x type 1 + 5 x type 2 into 2 x type 3 in an hour,
+    formula 200 turns 4 x type 3 into 1 x type 4, and blueprint 300 manufactures type 5 from
+    1 x type 4 + 20 x type 1 in two hours.
+    Returns (inv_types, industry_activity, activity_materials, activity_products).
+    """
+    inv_types = pd.DataFrame({'typeID': [1, 2, 3, 4, 5, 100, 200, 300],
+                              'typeName': ['Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon',
+                                           'Gamma Formula', 'Delta Formula', 'Epsilon Blueprint']})
+    industry_activity = pd.DataFrame({'typeID': [100, 200, 300], 'activityID': [11, 11, 1],
+                                      'time': [3600, 1800, 7200]})
+    activity_materials = pd.DataFrame({'typeID': [100, 100, 200, 300, 300], 'activityID': [11, 11, 11, 1, 1],
+                                       'materialTypeID': [1, 2, 3, 4, 1], 'quantity': [10, 5, 4, 1, 20]})
+    activity_products = pd.DataFrame({'typeID': [100, 200, 300], 'activityID': [11, 11, 1],
+                                      'productTypeID': [3, 4, 5], 'quantity': [2, 1, 1]})
+    return inv_types, industry_activity, activity_materials, activity_products
+
+
+@pytest.fixture
+def make_sde(tmp_path):
+    """Writes (inv_types, industry_activity, activity_materials, activity_products) as SDE CSVs and loads them."""
+    from sde_loader import SdeLoader
+
+    def make(tables):
+        names = ['invTypes', 'industryActivity', 'industryActivityMaterials', 'industryActivityProducts']
+        for name, table in zip(names, tables):
+            table.to_csv(tmp_path / f'{name}.csv', index=False)
+        return SdeLoader(str(tmp_path))
+    return make
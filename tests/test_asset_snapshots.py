@@ -0,0 +1,92 @@
+from email.utils import formatdate
+
+from asset_snapshots import AssetSnapshot, parse_expires
+
+NOW = 1_700_000_000
+
+
+def headers(etag, expires):
+    return {'ETag': etag, 'Expires': formatdate(expires, usegmt=True)}
+
+
+def asset(type_id, quantity):
+    return {'type_id': type_id, 'quantity': quantity}
+
+
+def test_parse_expires():
+    assert parse_expires(headers('"a"', NOW)) == NOW
+    assert parse_expires({}) is None and parse_expires({'Expires': 'soon'}) is None
+
+
+def test_freshness(tmp_path):
+    snapshot = AssetSnapshot('Some Pilot', folder=str(tmp_path))
+    assert not snapshot.is_fresh(NOW)
+    snapshot.store_page(1, headers('"a"', NOW + 300), [asset(34, 10)])
+    snapshot.store_page(2, headers('"b"', NOW + 60), [asset(35, 5)])
+    # Nothing is stored until the refresh is committed
+    assert not snapshot.is_fresh(NOW)
+    snapshot.commit(2)
+    assert snapshot.is_fresh(NOW)
+    assert not snapshot.is_fresh(NOW + 120)  # One page has expired
+    snapshot.pages[2]['expires'] = None
+    assert not snapshot.is_fresh(NOW)
+
+
+def test_not_modified_keeps_the_stored_page_and_etag(tmp_path):
+    snapshot = AssetSnapshot('Some Pilot', folder=str(tmp_path))
+    snapshot.store_page(1, headers('"a"', NOW), [asset(34, 10)])
+    snapshot.commit(1)
+    assert snapshot.etag(1) == '"a"' and snapshot.etag(2) is None
+
+    snapshot.store_page(1, {'Expires': formatdate(NOW + 300, usegmt=True)})  # 304 without an ETag
+    snapshot.commit(1)
+    assert snapshot.pages[1] == {'assets': [asset(34, 10)], 'etag': '"a"', 'expires': NOW + 300}
+
+
+def test_commit_drops_pages_beyond_the_count_and_discard_keeps_the_old_ones(tmp_path):
+    snapshot = AssetSnapshot('Some Pilot', folder=str(tmp_path))
+    for page in (1, 2, 3):
+        snapshot.store_page(page, headers(f'"{page}"', NOW), [asset(30 + page, page)])
+    snapshot.commit(3)
+
+    # The next fetch has only two pages
+    snapshot.store_page(1, headers('"1b"', NOW), [asset(31, 7)])
+    snapshot.store_page(2, headers('"2"', NOW))
+    snapshot.store_page(3, headers('"3"', NOW))  # A stale page 3 from before the count changed
+    snapshot.commit(2)
+    assert sorted(snapshot.pages) == [1, 2]
+    assert list(snapshot.assets()) == [asset(31, 7), asset(32, 2)]
+
+    # A failed refresh leaves the committed pages alone
+    snapshot.store_page(1, headers('"1c"', NOW), [])
+    snapshot.discard()
+    assert snapshot.etag(1) == '"1b"'
+    assert list(snapshot.assets()) == [asset(31, 7), asset(32, 2)]
+
+
+def test_diff_and_save(tmp_path):
+    snapshot = AssetSnapshot('Some Pilot', folder=str(tmp_path))
+    snapshot.character_id = 42
+    snapshot.store_page(1, headers('"a"', NOW), [asset(34, 10)])
+    snapshot.commit(1)
+    snapshot.save({34: 10, 35: 5})
+    # The first snapshot has nothing to compare against
+    assert snapshot.changes == {}
+
+    assert snapshot.diff({34: 12, 36: 1}) == {34: 2, 35: -5, 36: 1}
+    snapshot.save({34: 12, 36: 1})
+    assert snapshot.changes == {34: 2, 35: -5, 36: 1}
+
+    loaded = AssetSnapshot('Some Pilot', folder=str(tmp_path))
+    assert loaded.character_id == 42
+    assert loaded.inventory == {34: 12, 36: 1}
+    assert loaded.changes == {34: 2, 35: -5, 36: 1}
+    assert loaded.pages == {1: {'assets': [asset(34, 10)], 'etag': '"a"', 'expires': NOW}}
+    assert loaded.fetched_at == snapshot.fetched_at
+    assert not (tmp_path / 'Some_Pilot.json.tmp').exists()
+
+
+def test_corrupted_snapshot_is_rebuilt(tmp_path):
+    (tmp_path / 'Some_Pilot.json').write_text('{not json')
+    snapshot = AssetSnapshot('Some Pilot', folder=str(tmp_path))
+    assert snapshot.pages == {} and snapshot.fetched_at is None
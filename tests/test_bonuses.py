@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from bonuses import BonusEngine, job_quantities
+
+
+def test_job_quantities_rounding():
+    # ceil(round(x, 2)): float noise above a whole number doesn't add a unit
+    assert job_quantities(1, np.array([100.0]), np.array([0.07])).tolist() == [7]
+    assert job_quantities(1, np.array([1000.0]), np.array([0.990004])).tolist() == [990]
+    assert job_quantities(1, np.array([1000.0]), np.array([0.990006])).tolist() == [991]
+    # Never less than one unit per run
+    assert job_quantities(10, np.array([1.0, 20.0]), np.array([0.9, 0.9])).tolist() == [10, 180]
+    assert job_quantities(np.array([2, 5]), np.array([3.0, 3.0]), np.array([0.5, 0.5])).tolist() == [3, 8]
+
+
+def test_multipliers_combine_levels_structure_rigs_and_skills(make_sde, tiny_tables):
+    sde = make_sde(tiny_tables)
+    engine = BonusEngine(sde, levels={'Epsilon Blueprint': (10, 20)},
+                         profiles={1: ('Raitaru', 'T2', 'nullsec'), 11: ('Tatara', 'T1', 'lowsec')},
+                         skill_time_multipliers={1: 0.8, 11: 0.75})
+    material, time = engine.multipliers(300, 1)
+    assert material == pytest.approx(0.99 * (1 - 0.024 * 2.1) * 0.9)
+    assert time == pytest.approx(0.85 * (1 - 0.24 * 2.1) * 0.8 * 0.8)
+    # Reaction formulas aren't researched: only the structure, rig and skills apply
+    material, time = engine.multipliers(100, 11)
+    assert material == pytest.approx(1 - 0.02 * 1.9)
+    assert time == pytest.approx(0.75 * (1 - 0.2 * 1.9) * 0.75)
+    assert engine.get_production_time(100, 11) == pytest.approx(3600 * time)
+
+
+def test_unknown_blueprint_levels_are_skipped(make_sde, tiny_tables):
+    engine = BonusEngine(make_sde(tiny_tables), levels={'No Such Blueprint': (10, 20)}, default_me=5, default_te=10)
+    assert engine.multipliers(300, 1) == pytest.approx((0.95, 0.9))
+
+
+def test_job_materials_and_time(make_sde, tiny_tables):
+    engine = BonusEngine(make_sde(tiny_tables), levels={300: (10, 20)}, profiles={}, skill_time_multipliers={})
+    assert engine.job_materials(300, 1, 10) == {4: 10, 1: 180}
+    assert engine.job_materials(300, 1, 1) == {4: 1, 1: 18}
+    assert engine.job_time(300, 1, 3) == 3 * 7200 * 0.8
+    assert dict(engine.iter_materials(300, 1)) == pytest.approx({4: 0.9, 1: 18.0})
+
+
+def test_rounded_chain_rounds_each_job(make_sde, tiny_tables):
+    engine = BonusEngine(make_sde(tiny_tables), profiles={11: ('Athanor', 'T2', 'nullsec')},
+                         skill_time_multipliers={})
+    jobs = {3: (100, 11, 2), 4: (200, 11, 1), 5: (300, 1, 1)}
+    runs, raw = engine.rounded_chain(jobs, 5, 3)
+    # 3 Epsilon: 3 Delta and 60 Alpha; 3 Delta: ceil(11.3952) = 12 Gamma; 6 Gamma runs:
+    # ceil(56.976) = 57 Alpha and ceil(28.488) = 29 Beta
+    assert runs == {3: 6, 4: 3, 5: 3}
+    assert raw == {1: 117, 2: 29}
+
+    # Products outside the chain are simply bought
+    assert engine.rounded_chain(jobs, 1, 50) == ({}, {1: 50})
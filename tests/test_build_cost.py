@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from build_cost import BuildCostModel
+
+
+def _prices(input_sell):
+    return pd.DataFrame({'input_sell': list(input_sell.values())}, index=pd.Index(list(input_sell), name='type_id'))
+
+
+@pytest.fixture
+def model(tiny_tables):
+    _, _, activity_materials, activity_products = tiny_tables
+    return BuildCostModel(activity_materials, activity_products)
+
+
+def test_building_through_the_chain_when_cheaper(model):
+    costs = model.compute(_prices({1: 10.0, 2: 20.0, 3: 150.0, 4: 700.0, 5: 1000.0}))
+    # 2 x Gamma from 10 x Alpha + 5 x Beta
+    assert costs.loc[3, 'build_cost'] == pytest.approx((10 * 10 + 5 * 20) / 2)
+    assert costs.loc[3, 'decision'] == 'build'
+    assert costs.loc[4, 'unit_cost'] == pytest.approx(4 * 100)
+    assert costs.loc[5, 'unit_cost'] == pytest.approx(400 + 20 * 10)
+    assert costs.loc[[1, 3, 4, 5], 'level'].tolist() == [0, 1, 2, 3]
+    assert costs.loc[1, 'decision'] == 'buy'
+    assert costs.loc[5, 'blueprint_id'] == 300
+
+
+def test_buying_when_the_market_is_cheaper(model):
+    costs = model.compute(_prices({1: 10.0, 2: 20.0, 3: 90.0, 4: 700.0, 5: 1000.0}))
+    assert costs.loc[3, 'decision'] == 'buy'
+    assert costs.loc[3, 'unit_cost'] == 90.0
+    # Consumers are costed with the cheaper bought input
+    assert costs.loc[4, 'build_cost'] == pytest.approx(4 * 90)
+
+
+def test_unpriced_inputs_make_building_unpriceable(model):
+    costs = model.compute(_prices({1: 10.0, 3: 150.0}))
+    assert np.isnan(costs.loc[3, 'build_cost'])
+    assert costs.loc[3, 'unit_cost'] == 150.0
+    assert costs.loc[2, 'decision'] == 'unpriced'
+    # Consumers build from the bought Gamma even though Delta and Epsilon have no market price
+    assert costs.loc[4, 'unit_cost'] == pytest.approx(4 * 150)
+    assert costs.loc[5, 'decision'] == 'build'
+
+
+def test_unpriced_without_market_or_recipe(model):
+    costs = model.compute(_prices({1: 10.0}))
+    assert costs.loc[[2, 3, 4, 5], 'decision'].tolist() == ['unpriced'] * 4
+
+
+def test_recipe_cycles_fall_back_to_the_market():
+    activity_materials = pd.DataFrame({'typeID': [10, 20], 'activityID': [1, 1],
+                                       'materialTypeID': [7, 6], 'quantity': [1, 1]})
+    activity_products = pd.DataFrame({'typeID': [10, 20], 'activityID': [1, 1],
+                                      'productTypeID': [6, 7], 'quantity': [1, 1]})
+    costs = BuildCostModel(activity_materials, activity_products).compute(_prices({6: 5.0, 7: 8.0}))
+    assert costs.loc[[6, 7], 'unit_cost'].tolist() == [5.0, 8.0]
+    assert costs.loc[[6, 7], 'level'].tolist() == [0, 0]
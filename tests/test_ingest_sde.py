@@ -0,0 +1,107 @@
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from ingest_sde import ingest
+from sde_store import SdeStore
+
+TYPES = {
+    34: {'name': {'en': 'Tritanium', 'de': 'Tritanium'}},
+    16634: {'name': {'en': 'Hydrocarbons', 'de': 'Kohlenwasserstoffe'}},
+    16670: {'name': {'en': 'Crystalline Carbonide'}},
+    17960: {'name': {'en': 'Crystalline Carbonide Reaction Formula'}},
+    691: {'name': {'en': 'Rifter Blueprint'}},
+    587: {'name': {'en': 'Rifter'}},
+}
+BLUEPRINTS = {
+    17960: {'activities': {
+        'reaction': {'time': 10800, 'materials': [{'typeID': 16634, 'quantity': 100}],
+                     'products': [{'typeID': 16670, 'quantity': 10000}]}}},
+    691: {'activities': {
+        'manufacturing': {'time': 6000, 'materials': [{'typeID': 34, 'quantity': 32000}],
+                          'products': [{'typeID': 587, 'quantity': 1}]},
+        'copying': {'time': 4800},
+        'invention': {'time': 63900, 'materials': [{'typeID': 16670, 'quantity': 2}],
+                      'products': [{'typeID': 11379, 'quantity': 10, 'probability': 0.34}]},
+        'research_material': {'time': 2100}}},
+}
+
+
+def write_jsonl(folder):
+    folder.mkdir()
+    for name, records in (('types', TYPES), ('blueprints', BLUEPRINTS)):
+        with open(folder / f'{name}.jsonl', 'w') as f:
+            for key, record in records.items():
+                f.write(json.dumps(dict(record, _key=key)) + '\n')
+    return folder
+
+
+def write_yaml_zip(path):
+    yaml = pytest.importorskip('yaml')
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('sde/fsd/types.yaml', yaml.safe_dump(TYPES))
+        archive.writestr('sde/fsd/blueprints.yaml', yaml.safe_dump(BLUEPRINTS))
+    return path
+
+
+def check_store(store):
+    assert store.type_ids.tolist() == sorted(TYPES)
+    assert store.get_type_name(16634) == 'Hydrocarbons'
+    assert store.get_blueprint_for_product(16670) == {'typeID': 17960, 'activityID': 11, 'productTypeID': 16670,
+                                                      'quantity': 10000}
+    assert store.get_blueprint_for_product(587)['typeID'] == 691
+    assert list(store.iter_materials(691, 1)) == [(34, 32000)]
+    assert list(store.iter_materials(691, 8)) == [(16670, 2)]
+    assert store.get_production_time(691, 5) == 4800
+    assert store.get_production_time(691, 4) == 2100
+    (invention,) = store.iter_inventions()
+    assert invention == (691, 11379, 10, pytest.approx(0.34))
+
+
+def test_jsonl_dump(tmp_path):
+    store_path = ingest(str(write_jsonl(tmp_path / 'sde')), str(tmp_path / 'store.npz'))
+    check_store(SdeStore(store_path))
+
+
+def test_yaml_zip_dump_matches_jsonl(tmp_path):
+    jsonl = SdeStore(ingest(str(write_jsonl(tmp_path / 'sde')), str(tmp_path / 'jsonl.npz')))
+    yaml = SdeStore(ingest(str(write_yaml_zip(tmp_path / 'sde.zip')), str(tmp_path / 'yaml.npz')))
+    check_store(yaml)
+    for name, array in jsonl.arrays.items():
+        if name != 'source':
+            np.testing.assert_array_equal(yaml.arrays[name], array)
+
+
+def test_language(tmp_path):
+    store = SdeStore(ingest(str(write_jsonl(tmp_path / 'sde')), str(tmp_path / 'store.npz'), language='de'))
+    assert store.get_type_name(16634) == 'Kohlenwasserstoffe'
+    assert store.get_type_name(16670) == 'Crystalline Carbonide'  # Falls back to English
+
+
+def test_content_hash_is_stable_and_unchanged_dumps_are_skipped(tmp_path):
+    source = write_jsonl(tmp_path / 'sde')
+    store_path = tmp_path / 'store.npz'
+    ingest(str(source), str(store_path))
+    content_hash = SdeStore(str(store_path)).source['sde']['content_hash']
+    mtime = store_path.stat().st_mtime_ns
+
+    ingest(str(source), str(store_path))
+    assert store_path.stat().st_mtime_ns == mtime
+
+    ingest(str(source), str(store_path), force=True)
+    assert SdeStore(str(store_path)).source['sde']['content_hash'] == content_hash
+
+    with open(source / 'types.jsonl', 'a') as f:
+        f.write(json.dumps({'_key': 35, 'name': {'en': 'Pyerite'}}) + '\n')
+    ingest(str(source), str(store_path))
+    store = SdeStore(str(store_path))
+    assert store.source['sde']['content_hash'] != content_hash
+    assert store.get_type_name(35) == 'Pyerite'
+
+
+def test_missing_files(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    with pytest.raises(FileNotFoundError):
+        ingest(str(tmp_path / 'empty'), str(tmp_path / 'store.npz'))
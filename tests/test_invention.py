@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from invention import COPYING, INVENTION, InventionSde, expected_output, invention_chances, with_invention
+
+
+@pytest.fixture
+def t2_tables(tiny_tables):
+    """
+    tiny_tables plus T2 blueprint 301 (Zeta from 1 x Epsilon + 10 x Alpha), invented from blueprint 300
+    with 2 x Datacore (type 7) for 10 runs, and the Attainment Decryptor as type 8.
+    """
+    inv_types, industry_activity, activity_materials, activity_products = tiny_tables
+    inv_types = pd.concat([inv_types, pd.DataFrame({
+        'typeID': [6, 7, 8, 301],
+        'typeName': ['Zeta', 'Datacore', 'Attainment Decryptor', 'Zeta Blueprint']})], ignore_index=True)
+    industry_activity = pd.concat([industry_activity, pd.DataFrame({
+        'typeID': [301, 300, 300], 'activityID': [1, INVENTION, COPYING], 'time': [3600, 60000, 4800]})],
+        ignore_index=True)
+    activity_materials = pd.concat([activity_materials, pd.DataFrame({
+        'typeID': [301, 301, 300], 'activityID': [1, 1, INVENTION], 'materialTypeID': [5, 1, 7],
+        'quantity': [1, 10, 2]})], ignore_index=True)
+    activity_products = pd.concat([activity_products, pd.DataFrame({
+        'typeID': [301, 300], 'activityID': [1, INVENTION], 'productTypeID': [6, 301], 'quantity': [1, 10]})],
+        ignore_index=True)
+    return inv_types, industry_activity, activity_materials, activity_products
+
+
+def test_invention_chances():
+    skills = 1 + 8 / 30 + 4 / 40
+    chances = invention_chances([0.3, np.nan, 0.5], science_levels=(4, 4), encryption_level=4)
+    assert chances == pytest.approx([0.3 * skills, 0.3 * skills, 0.5 * skills])
+    # The decryptor multiplies the chance, which is capped at 1
+    chances = invention_chances([0.3, 0.5], (4, 4), 4, decryptor='Attainment Decryptor')
+    assert chances == pytest.approx([0.3 * skills * 1.8, 1.0])
+
+
+def test_expected_output():
+    assert expected_output({'quantity': 10, 'probability': 0.41}) == pytest.approx(4.1)
+    assert expected_output(pd.Series({'quantity': 2})) == 2
+
+
+def test_graph_adds_invention_and_copying(make_sde, t2_tables):
+    sde = InventionSde(make_sde(t2_tables), decryptor=None, owned_blueprints=set())
+    assert with_invention(sde) is sde
+    assert sde.is_invented(301) and not sde.is_invented(300)
+    assert sde.invented_levels == (2, 4)
+
+    # Real blueprints come from the SDE; the T2 blueprint from inventing, the T1 copy from copying
+    assert int(sde.get_blueprint_for_product(6)['typeID']) == 301
+    invention = sde.get_blueprint_for_product(301)
+    assert (invention['typeID'], invention['activityID'], invention['quantity']) == (300, INVENTION, 10)
+    assert invention['probability'] == pytest.approx(invention_chances([np.nan])[0])
+    assert sde.get_blueprint_for_product(300) == {'typeID': 300, 'activityID': COPYING, 'productTypeID': 300,
+                                                  'quantity': 1}
+    assert sde.get_blueprint_for_product(7) is None
+
+    # Inventing uses a copy, and each run from the invented blueprint uses one blueprint run
+    assert list(sde.iter_materials(300, INVENTION)) == [(7, 2), (300, 1)]
+    assert list(sde.iter_materials(301, 1)) == [(5, 1), (1, 10), (301, 1)]
+    assert list(sde.iter_materials(300, 1)) == [(4, 1), (1, 20)]
+    # Everything else passes through to the SDE
+    assert sde.get_type_name(6) == 'Zeta'
+
+
+def test_decryptor_and_probabilities(make_sde, t2_tables, tmp_path):
+    pd.DataFrame({'typeID': [300], 'activityID': [INVENTION], 'productTypeID': [301], 'probability': [0.34]}) \
+        .to_csv(tmp_path / 'industryActivityProbabilities.csv', index=False)
+    sde = InventionSde(make_sde(t2_tables), decryptor='Attainment Decryptor', owned_blueprints=set())
+    invention = sde.get_blueprint_for_product(301)
+    assert invention['quantity'] == 14
+    assert invention['probability'] == pytest.approx(invention_chances([0.34], decryptor='Attainment Decryptor')[0])
+    assert sde.invented_levels == (1, 8)
+    assert list(sde.iter_materials(300, INVENTION)) == [(7, 2), (300, 1), (8, 1)]
+
+
+def test_owned_blueprints_are_not_invented(make_sde, t2_tables):
+    sde = InventionSde(make_sde(t2_tables), decryptor=None, owned_blueprints={'Zeta Blueprint'})
+    assert not sde.is_invented(301)
+    assert sde.get_blueprint_for_product(301) is None
+    assert list(sde.iter_materials(301, 1)) == [(5, 1), (1, 10)]
+
+
+def test_unknown_decryptor(make_sde, t2_tables):
+    with pytest.raises(ValueError):
+        InventionSde(make_sde(t2_tables), decryptor='Nonexistent Decryptor')
+
+
+def test_invented_blueprints_use_the_invented_levels(make_sde, t2_tables):
+    from bonuses import BonusEngine
+
+    sde = InventionSde(make_sde(t2_tables), decryptor=None, owned_blueprints=set())
+    engine = BonusEngine(sde, levels={}, profiles={}, skill_time_multipliers={})
+    assert engine.multipliers(301, 1) == pytest.approx((0.98, 0.96))
+    assert engine.multipliers(300, 1) == pytest.approx((1.0, 1.0))
+    # ME reduces the materials but not the blueprint runs a job consumes
+    assert engine.job_materials(301, 1, 10) == {5: 10, 1: 98, 301: 10}
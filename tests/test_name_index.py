@@ -0,0 +1,62 @@
+import pytest
+
+from name_index import NameIndex, describe_miss, fold
+
+
+@pytest.fixture
+def index():
+    names = ['Tritanium', 'Pyerite', 'Mexallon', 'Fullerides', 'Fulleride Blueprint', 'Rifter', 'Rifter Blueprint',
+             'Capital Construction Parts', 'tritanium']
+    return NameIndex(range(1, len(names) + 1), names)
+
+
+def test_fold():
+    assert fold('  Capital   Construction\tParts ') == 'capital construction parts'
+
+
+def test_lookup_exact_then_any_case(index):
+    assert index.lookup('Tritanium') == 1
+    # An exact match wins over the same name in another case; otherwise the first one does
+    assert index.lookup('tritanium') == 9
+    assert index.lookup('TRITANIUM') == 1
+    assert index.lookup('capital  construction parts') == 8
+    assert index.lookup('Tritan') is None
+    assert len(index) == 8
+
+
+def test_prefix_is_shortest_first(index):
+    assert index.prefix('ful') == ['Fullerides', 'Fulleride Blueprint']
+    assert index.prefix('RIFTER') == ['Rifter', 'Rifter Blueprint']
+    assert index.prefix('rifter', limit=1) == ['Rifter']
+    assert index.prefix('zz') == [] and index.prefix('  ') == []
+
+
+def test_fuzzy_ranks_by_similarity(index):
+    assert index.fuzzy('Tritanim')[0] == 'Tritanium'
+    assert index.fuzzy('Mexalon') == ['Mexallon']
+    assert index.fuzzy('Pyrite')[0] == 'Pyerite'
+    assert index.fuzzy('qqqq') == [] and index.fuzzy('') == []
+
+
+def test_suggest_puts_prefixes_first_without_repeats(index):
+    suggestions = index.suggest('Rifter Blue')
+    assert suggestions[0] == 'Rifter Blueprint'
+    assert len(suggestions) == len(set(suggestions))
+    assert index.suggest('Fullerdes')[0] == 'Fullerides'
+    assert len(index.suggest('r', limit=2)) == 2
+
+
+def test_resolve_accepts_unique_prefixes_only(index):
+    assert index.resolve('pyerite') == (2, 'Pyerite')
+    assert index.resolve('Mexa') == (3, 'Mexallon')
+    assert index.resolve('Capital') == (8, 'Capital Construction Parts')
+    # Ambiguous prefixes and misspellings aren't guessed
+    assert index.resolve('Rift') is None
+    assert index.resolve('Tritanim') is None
+    # A full name is taken even when it is also a prefix of another name
+    assert index.resolve('rifter') == (6, 'Rifter')
+
+
+def test_describe_miss():
+    assert describe_miss('Tritanim', ['Tritanium']) == "'Tritanim' not found. Did you mean: Tritanium?"
+    assert describe_miss('qqqq', []) == "'qqqq' not found."
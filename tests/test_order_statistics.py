@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculator import _order_rows, order_statistics, select_hub_prices
+
+HUBS = [('Jita', '10000002', 60003760), ('Amarr', '10000043', 60008494)]
+
+
+def order(location, type_id, is_buy, price, volume):
+    return {'location_id': location, 'type_id': type_id, 'is_buy_order': is_buy, 'price': price,
+            'volume_remain': volume}
+
+
+@pytest.fixture
+def hub_prices():
+    orders = [
+        # Jita sells: a 1-unit troll order under the book, and a thin expensive tail
+        order(60003760, 34, False, 100.0, 800), order(60003760, 34, False, 5.0, 99),
+        order(60003760, 34, False, 1.0, 1), order(60003760, 34, False, 6.0, 100),
+        # Jita buys: a 1-unit troll order over the book
+        order(60003760, 34, True, 3.0, 150), order(60003760, 34, True, 1000.0, 1), order(60003760, 34, True, 4.0, 49),
+        order(60008494, 34, False, 7.0, 10),
+        order(60008494, 35, True, 2.0, 5),
+        # Not at a hub
+        order(60000001, 34, False, 0.5, 1000),
+    ]
+    rows = _order_rows(orders, {location for _, _, location in HUBS})
+    assert len(rows) == len(orders) - 1
+    return order_statistics(rows, HUBS, percentile=0.1)
+
+
+def test_best_vwap_and_depth(hub_prices):
+    jita = hub_prices['Jita']
+    assert jita.loc[34, 'sell'] == 1.0 and jita.loc[34, 'buy'] == 1000.0
+    assert jita.loc[34, 'sell_depth'] == 1000 and jita.loc[34, 'buy_depth'] == 200
+    assert jita.loc[34, 'sell_vwap'] == pytest.approx((1 + 5 * 99 + 6 * 100 + 100 * 800) / 1000)
+    assert jita.loc[34, 'buy_vwap'] == pytest.approx((1000 + 4 * 49 + 3 * 150) / 200)
+    assert hub_prices.loc[34, ('Amarr', 'sell_vwap')] == 7.0
+
+
+def test_percentile_cuts_partial_orders(hub_prices):
+    # The best 10% of volume: 100 of 1000 sell units (all of the 1 @ 1, 99 @ 5) and 20 of 200 buy
+    # units (1 @ 1000, then 19 of the 49 @ 4)
+    assert hub_prices.loc[34, ('Jita', 'sell_pct')] == pytest.approx((1 + 5 * 99) / 100)
+    assert hub_prices.loc[34, ('Jita', 'buy_pct')] == pytest.approx((1000 + 4 * 19) / 20)
+    # A group smaller than one cut-off is priced from its first order alone
+    assert hub_prices.loc[35, ('Amarr', 'buy_pct')] == 2.0
+
+
+def test_missing_sides_are_nan(hub_prices):
+    assert list(hub_prices.columns.get_level_values('hub').unique()) == ['Jita', 'Amarr']
+    assert np.isnan(hub_prices.loc[34, ('Amarr', 'buy')])
+    assert hub_prices.loc[35, 'Jita'].isna().all()
+
+
+def test_select_hub_prices_by_source(hub_prices):
+    percentile = select_hub_prices(hub_prices, source='percentile')
+    assert percentile.loc[34, 'input_sell'] == pytest.approx(4.96)
+    assert percentile.loc[34, 'input_sell_hub'] == 'Jita'
+    assert percentile.loc[34, 'output_buy'] == pytest.approx(53.8)
+    assert percentile.loc[35, 'output_buy'] == 2.0 and percentile.loc[35, 'output_buy_hub'] == 'Amarr'
+    # No sell orders anywhere: 0 and no hub
+    assert percentile.loc[35, 'input_sell'] == 0 and pd.isna(percentile.loc[35, 'input_sell_hub'])
+
+    vwap = select_hub_prices(hub_prices, source='vwap')
+    assert vwap.loc[34, 'input_sell'] == 7.0 and vwap.loc[34, 'input_sell_hub'] == 'Amarr'
+    assert vwap.loc[34, 'output_sell'] == pytest.approx(81.096)
+    assert vwap.loc[34, 'output_sell_hub'] == 'Jita'
+
+    best = select_hub_prices(hub_prices, source='best')
+    assert best.loc[34, 'input_sell'] == 1.0 and best.loc[34, 'output_buy'] == 1000.0
+
+    with pytest.raises(ValueError):
+        select_hub_prices(hub_prices, source='median')
+
+
+def test_no_orders():
+    stats = order_statistics(np.empty((0, 5)), HUBS)
+    assert stats.empty and stats.columns.nlevels == 2
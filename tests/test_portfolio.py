@@ -0,0 +1,75 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from portfolio import optimize_portfolio, assign_to_characters, _knapsack
+
+
+def brute_force(profit, capital, usage, slots, budget, availability):
+    best, best_profit = None, -np.inf
+    for counts in itertools.product(range(slots + 1), repeat=len(profit)):
+        counts = np.array(counts)
+        if counts.sum() > slots or counts @ capital > budget or np.any(counts @ usage > availability):
+            continue
+        if counts @ profit > best_profit:
+            best, best_profit = counts, counts @ profit
+    return best, best_profit
+
+
+def test_knapsack_picks_the_best_combination():
+    # Two slots of the 7-value item don't fit the capital; one of each beats two of the 5-value item
+    counts = _knapsack(np.array([7.0, 5.0, 1.0]), 1, np.array([6, 3, 1]), 2, 10, np.array([2, 2, 2]))
+    assert list(counts) == [1, 1, 0]
+
+
+def test_slots_only_fill_the_most_profitable_reaction():
+    counts = optimize_portfolio(np.array([100.0, 300.0, -50.0]), np.zeros(3), np.zeros((3, 0)), 4)
+    assert list(counts) == [0, 4, 0]
+
+
+def test_max_per_item_spreads_the_slots():
+    counts = optimize_portfolio(np.array([100.0, 300.0, -50.0]), np.zeros(3), np.zeros((3, 0)), 4,
+                                max_per_item=3)
+    assert list(counts) == [1, 3, 0]
+
+
+def test_capital_budget_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        profit = rng.integers(1, 100, 4).astype(float)
+        # Whole-bucket capital costs, so the DP discretization is exact
+        capital = rng.integers(1, 200, 4).astype(float)
+        counts = optimize_portfolio(profit, capital, np.zeros((4, 0)), 5, budget=400)
+        _, best_profit = brute_force(profit, capital, np.zeros((4, 0)), 5, 400, np.zeros(0))
+        assert counts.sum() <= 5 and counts @ capital <= 400
+        assert counts @ profit == best_profit
+
+
+def test_shared_input_limit_is_respected():
+    # Both reactions use input 0; reaction 0 earns more per slot but uses three times as much of it
+    profit = np.array([120.0, 100.0, 10.0])
+    usage = np.array([[3.0], [1.0], [0.0]])
+    counts = optimize_portfolio(profit, np.zeros(3), usage, 4, availability=np.array([6.0]))
+    best, best_profit = brute_force(profit, np.zeros(3), usage, 4, np.inf, np.array([6.0]))
+    assert np.all(counts @ usage <= 6.0)
+    assert counts @ profit == best_profit
+    assert list(counts) == list(best)
+
+
+def test_assign_to_characters_fills_pools_in_turn():
+    allocation = pd.DataFrame({'name': ['A', 'B'], 'slots': [5, 4]})
+    assert assign_to_characters(allocation, {'Main': 6, 'Alt': 3}) == ["Main x5", "Main x1, Alt x3"]
+
+
+def test_shared_inputs_stay_feasible_and_near_optimal():
+    # The Lagrangian path is a heuristic: it must always fit, and land close to the optimum
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        profit = rng.integers(1, 100, 3).astype(float)
+        usage = rng.integers(0, 4, (3, 2)).astype(float)
+        availability = rng.integers(2, 10, 2).astype(float)
+        counts = optimize_portfolio(profit, np.zeros(3), usage, 4, availability=availability)
+        _, best_profit = brute_force(profit, np.zeros(3), usage, 4, np.inf, availability)
+        assert counts.sum() <= 4 and np.all(counts @ usage <= availability)
+        assert counts @ profit >= 0.8 * best_profit
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_snapshot import PriceSnapshot, publish
+
+
+@pytest.fixture
+def hub_prices():
+    columns = pd.MultiIndex.from_product([['Jita', 'Amarr'], ['buy', 'sell']], names=['hub', 'side'])
+    frame = pd.DataFrame([[8.0, 10.0, 7.5, 11.0],
+                          [18.0, 20.0, np.nan, np.nan],
+                          [150.0, 200.0, 140.0, 210.0]],
+                         index=pd.Index([1, 2, 35], name='type_id'), columns=columns)
+    frame.attrs['expires'] = 1_700_000_600.0
+    return frame
+
+
+def test_publish_attach_round_trip(hub_prices, tmp_path):
+    path = publish(hub_prices, str(tmp_path / 'prices.snapshot'), 0.05, written_at=1_700_000_000.0)
+    with PriceSnapshot(path) as snapshot:
+        assert len(snapshot) == 3
+        assert snapshot.hubs == ['Jita', 'Amarr'] and snapshot.columns == ['buy', 'sell']
+        assert snapshot.percentile == 0.05
+        assert snapshot.written_at == 1_700_000_000.0 and snapshot.expires == 1_700_000_600.0
+        frame = snapshot.to_frame()
+        pd.testing.assert_frame_equal(frame, hub_prices, check_index_type=False)
+        assert frame.attrs['expires'] == 1_700_000_600.0
+    # The frame views the mapping, which outlives the closed snapshot
+    assert frame.loc[35, ('Jita', 'sell')] == 200.0
+
+
+def test_get_and_lookup(hub_prices, tmp_path):
+    path = publish(hub_prices, str(tmp_path / 'prices.snapshot'), 0.05)
+    with PriceSnapshot(path) as snapshot:
+        assert snapshot.get(35, 'Amarr', 'sell') == 210.0
+        assert snapshot.get(1, 'Jita') == 10.0
+        assert np.isnan(snapshot.get(2, 'Amarr', 'buy'))
+        assert np.isnan(snapshot.get(3, 'Jita')) and np.isnan(snapshot.get(10_000, 'Jita'))
+        assert snapshot.row(-1) == -1
+
+        values = snapshot.lookup([35, 4, 1, 99_999])
+        assert values.shape == (4, 2, 2)
+        assert list(values[0, 0]) == [150.0, 200.0] and list(values[2, 1]) == [7.5, 11.0]
+        assert np.isnan(values[1]).all() and np.isnan(values[3]).all()
+
+
+def test_to_frame_selects_hubs(hub_prices, tmp_path):
+    path = publish(hub_prices, str(tmp_path / 'prices.snapshot'), 0.05)
+    with PriceSnapshot(path) as snapshot:
+        frame = snapshot.to_frame(['Amarr'])
+        assert list(frame.columns) == [('Amarr', 'buy'), ('Amarr', 'sell')]
+        assert frame.loc[35, ('Amarr', 'sell')] == 210.0
+
+
+def test_missing_expires_round_trips_as_none(hub_prices, tmp_path):
+    hub_prices.attrs.pop('expires')
+    path = publish(hub_prices, str(tmp_path / 'prices.snapshot'), 0.05)
+    with PriceSnapshot(path) as snapshot:
+        assert snapshot.expires is None
+
+
+def test_attached_reader_keeps_its_snapshot_until_republished(hub_prices, tmp_path):
+    path = str(tmp_path / 'prices.snapshot')
+    publish(hub_prices, path, 0.05)
+    snapshot = PriceSnapshot(path)
+    assert snapshot.is_current()
+
+    updated = hub_prices * 2
+    updated.attrs['expires'] = None
+    publish(updated, path, 0.05)
+    assert not snapshot.is_current()
+    assert snapshot.get(1, 'Jita') == 10.0
+    snapshot.close()
+
+    with PriceSnapshot(path) as fresh:
+        assert fresh.is_current() and fresh.get(1, 'Jita') == 20.0
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'prices.snapshot'
+    path.write_bytes(b'not a snapshot at all, just some bytes padding it out')
+    with pytest.raises(ValueError):
+        PriceSnapshot(str(path))
+
+
+def test_failed_publish_removes_the_temporary_file(hub_prices, tmp_path, monkeypatch):
+    import price_snapshot
+
+    path = str(tmp_path / 'prices.snapshot')
+    publish(hub_prices, path, 0.05)
+
+    def disk_full(src, dst):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(price_snapshot.os, 'replace', disk_full)
+    with pytest.raises(OSError):
+        publish(hub_prices * 2, path, 0.05)
+    assert not (tmp_path / 'prices.snapshot.tmp').exists()
+    with PriceSnapshot(path) as snapshot:
+        assert snapshot.get(1, 'Jita') == 10.0
+
+
+def test_price_cache_is_saved_when_the_snapshot_cannot_be(hub_prices, tmp_path, monkeypatch):
+    import calculator
+
+    def read_only(*args):
+        raise OSError(30, 'Read-only file system')
+    monkeypatch.setattr(calculator, 'publish', read_only)
+    cache_file = tmp_path / 'price_cache.json'
+    hub_prices = hub_prices.reindex(columns=pd.MultiIndex.from_product([['Jita', 'Amarr'], calculator.STAT_COLUMNS],
+                                                                       names=['hub', 'side']))
+    calculator._save_price_cache(hub_prices, str(cache_file))
+    assert cache_file.exists()
+    loaded = calculator._load_price_cache([('Jita', '', 0), ('Amarr', '', 0)], str(cache_file))
+    assert loaded.loc[35, ('Amarr', 'sell')] == 210.0
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from profit_engine import ProfitEngine, SECONDS_PER_WEEK
+
+
+@pytest.fixture
+def engine(tiny_tables):
+    inv_types, industry_activity, activity_materials, activity_products = tiny_tables
+    formulas = inv_types[inv_types['typeID'].isin([100, 200])]
+    return ProfitEngine(formulas, industry_activity, activity_materials, activity_products, activity_id=11)
+
+
+@pytest.fixture
+def prices():
+    return pd.DataFrame({'input_sell': [10.0, 20.0, 0.0], 'input_buy': [8.0, 18.0, 0.0],
+                         'output_buy': [0.0, 0.0, 150.0], 'output_sell': [0.0, 0.0, 200.0]},
+                        index=pd.Index([1, 2, 3], name='type_id'))
+
+
+def test_compute_matches_hand_calculation(engine, prices):
+    results = engine.compute(prices, broker_fee=0.03, sales_tax=0.02)
+    gamma = results.loc[results['blueprint_id'] == 100].iloc[0]
+    assert gamma['input_cost_sell'] == pytest.approx(10 * 10 + 5 * 20)
+    assert gamma['input_cost_buy'] == pytest.approx(10 * 8 + 5 * 18)
+    assert gamma['output_revenue_buy'] == pytest.approx(2 * 150)
+    assert gamma['output_revenue_sell'] == pytest.approx(2 * 200)
+    assert gamma['net_profit_instant'] == pytest.approx(300 * 0.95 - 200)
+    assert gamma['net_profit_orders'] == pytest.approx(400 * 0.95 - 170)
+    assert gamma['profit_pct_instant'] == pytest.approx(85 / 200 * 100)
+    assert gamma['runs_per_week'] == pytest.approx(SECONDS_PER_WEEK / 3600)
+    assert gamma['net_profit_per_week'] == pytest.approx(210 * SECONDS_PER_WEEK / 3600)
+
+
+def test_unpriced_types_cost_nothing(engine, prices):
+    results = engine.compute(prices, 0.03, 0.02)
+    delta = results.loc[results['blueprint_id'] == 200].iloc[0]
+    # Type 3 has no sell price as an input and type 4 no prices at all
+    assert delta['input_cost_sell'] == 0
+    assert delta['output_revenue_buy'] == 0
+    assert delta['profit_pct_instant'] == 0
+
+
+def test_row_subset_matches_full_compute(engine, prices):
+    full = engine.compute(prices, 0.03, 0.02)
+    for row in range(len(engine)):
+        partial = engine.compute(prices, 0.03, 0.02, rows=[row])
+        pd.testing.assert_frame_equal(partial, full.loc[[row]])
+
+
+def test_where_used_finds_consumers_and_producers(engine):
+    where_used = engine.where_used()
+    rows = dict(zip(engine.blueprint_ids.tolist(), range(len(engine))))
+    assert where_used.rows_for([1]).tolist() == [rows[100]]
+    assert where_used.rows_for([3]).tolist() == sorted([rows[100], rows[200]])
+    assert where_used.rows_for([999]).tolist() == []
+    assert np.array_equal(where_used.rows_for([]), [])
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scan
+from profit_engine import ProfitEngine
+
+
+@pytest.fixture
+def tables(tiny_tables):
+    """tiny_tables plus 40 random formulas and 30 random blueprints with 1-4 inputs, some unpriced."""
+    inv_types, industry_activity, activity_materials, activity_products = tiny_tables
+    rng = np.random.default_rng(7)
+    blueprint_ids = np.arange(1000, 1070)
+    activity_ids = np.where(blueprint_ids < 1040, 11, 1)
+    product_ids = blueprint_ids + 1000
+    materials = [(bp, act, int(m), int(rng.integers(1, 100)))
+                 for bp, act in zip(blueprint_ids, activity_ids)
+                 for m in rng.choice(np.arange(1, 60), size=rng.integers(1, 5), replace=False)]
+    inv_types = pd.concat([inv_types, pd.DataFrame({
+        'typeID': np.concatenate([blueprint_ids, product_ids]),
+        'typeName': [f'Blueprint {b}' for b in blueprint_ids] + [f'Product {p}' for p in product_ids]})],
+        ignore_index=True)
+    industry_activity = pd.concat([industry_activity, pd.DataFrame({
+        'typeID': blueprint_ids, 'activityID': activity_ids, 'time': rng.integers(600, 20000, len(blueprint_ids))})],
+        ignore_index=True)
+    activity_materials = pd.concat([activity_materials, pd.DataFrame(
+        materials, columns=['typeID', 'activityID', 'materialTypeID', 'quantity'])], ignore_index=True)
+    activity_products = pd.concat([activity_products, pd.DataFrame({
+        'typeID': blueprint_ids, 'activityID': activity_ids, 'productTypeID': product_ids,
+        'quantity': rng.integers(1, 200, len(blueprint_ids))})], ignore_index=True)
+    return inv_types, industry_activity, activity_materials, activity_products
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(8)
+    type_ids = np.concatenate([np.arange(1, 50), np.arange(2000, 2070)])  # Types 50-59 have no prices
+    return pd.DataFrame({column: rng.uniform(1, 1000, len(type_ids)) for column in
+                         ('input_sell', 'input_buy', 'output_buy', 'output_sell')},
+                        index=pd.Index(type_ids, name='type_id'))
+
+
+@pytest.mark.parametrize('workers', [1, 2, 3])
+def test_scan_matches_the_engines(tables, prices, workers, monkeypatch):
+    inv_types, industry_activity, activity_materials, activity_products = tables
+    engines = scan.build_scan_engines(inv_types, industry_activity, activity_materials, activity_products,
+                                      industry_activity[['typeID']].drop_duplicates())
+    assert len(engines[1]) == 31 and len(engines[11]) == 42
+
+    # Uneven shards whose boundaries fall between the two activities' blueprints
+    monkeypatch.setattr(scan, 'SHARDS_PER_WORKER', 5)
+    result = scan.scan(engines, prices, workers=workers, broker_fee=0.03, sales_tax=0.02)
+    assert result['rank'].tolist() == list(range(1, 74))
+    assert result['net_profit_per_week'].is_monotonic_decreasing
+
+    for activity_id, engine in engines.items():
+        expected = engine.compute(prices, 0.03, 0.02).set_index('blueprint_id')
+        actual = result[result['activity'] == scan.SCAN_ACTIVITIES[activity_id]].set_index('blueprint_id')
+        assert sorted(actual.index) == sorted(expected.index)
+        columns = [c for c in expected.columns if c in actual.columns and c != 'name']
+        assert len(columns) >= 8
+        pd.testing.assert_frame_equal(actual.loc[expected.index, columns], expected[columns], check_dtype=False)
+        assert (actual.loc[expected.index, 'name'] == expected['name']).all()
+
+
+def test_shared_arrays_round_trip():
+    arrays = {'a': np.arange(5, dtype=np.int32), 'b': np.linspace(0, 1, 3), 'c': np.zeros((2, 3), dtype=np.int8)}
+    shared = scan.SharedArrays(arrays)
+    try:
+        shm, views = scan._attach(shared.name, shared.spec)
+        for name, array in arrays.items():
+            np.testing.assert_array_equal(views[name], array)
+        del views
+        shm.close()
+    finally:
+        shared.release()
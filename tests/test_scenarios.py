@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from profit_engine import ProfitEngine, SECONDS_PER_WEEK
+from scenarios import robustness, scenario_grid, sweep
+
+
+@pytest.fixture
+def profits(tiny_tables):
+    inv_types, industry_activity, activity_materials, activity_products = tiny_tables
+    engine = ProfitEngine(inv_types[inv_types['typeID'].isin([100, 200])], industry_activity, activity_materials,
+                          activity_products, activity_id=11)
+    prices = pd.DataFrame({'input_sell': [10.0, 20.0, 60.0, 0.0], 'input_buy': [8.0, 18.0, 50.0, 0.0],
+                           'output_buy': [0.0, 0.0, 150.0, 250.0], 'output_sell': [0.0, 0.0, 200.0, 300.0]},
+                          index=pd.Index([1, 2, 3, 4], name='type_id'))
+    return engine.compute(prices, broker_fee=0.03, sales_tax=0.02)
+
+
+def test_neutral_scenario_matches_the_engine(profits):
+    scenarios = scenario_grid(broker_fee=(0.03,), sales_tax=(0.02,), basis=('orders', 'instant'))
+    matrices = sweep(profits, scenarios)
+    assert matrices['net_profit'][0] == pytest.approx(profits['net_profit_orders'].to_numpy())
+    assert matrices['net_profit_per_week'][0] == pytest.approx(profits['net_profit_per_week'].to_numpy())
+    assert matrices['roi'][0] == pytest.approx(profits['profit_pct_orders'].to_numpy())
+    assert matrices['net_profit'][1] == pytest.approx(profits['net_profit_instant'].to_numpy())
+    assert matrices['roi'][1] == pytest.approx(profits['profit_pct_instant'].to_numpy())
+
+
+def test_shifted_scenario_by_hand(profits):
+    scenarios = scenario_grid(broker_fee=(0.02,), sales_tax=(0.03,), input_price_shift=(0.1,),
+                              output_price_shift=(-0.05,), material_bonus=(0.024,), time_bonus=(0.25,),
+                              basis=('orders', 'instant'))
+    matrices = sweep(profits, scenarios)
+    # Formula 100: 10 x Alpha + 5 x Beta -> 2 x Gamma in an hour
+    gamma = profits['blueprint_id'].tolist().index(100)
+
+    # Orders: inputs at buy orders (170), output at sell orders (400)
+    input_cost = 170 * 1.1 * (1 - 0.024)
+    net_profit = 400 * 0.95 * 0.95 - input_cost
+    assert matrices['input_cost'][0, gamma] == pytest.approx(input_cost)
+    assert matrices['output_revenue'][0, gamma] == pytest.approx(380)
+    assert matrices['net_profit'][0, gamma] == pytest.approx(net_profit)
+    assert matrices['net_profit_per_week'][0, gamma] == pytest.approx(net_profit * SECONDS_PER_WEEK / 3600 / 0.75)
+    assert matrices['roi'][0, gamma] == pytest.approx(net_profit / input_cost * 100)
+
+    # Instant: inputs at sell orders (200), output into buy orders (300)
+    input_cost = 200 * 1.1 * (1 - 0.024)
+    assert matrices['net_profit'][1, gamma] == pytest.approx(300 * 0.95 * 0.95 - input_cost)
+
+
+def test_robustness_summary(profits):
+    scenarios = scenario_grid(input_price_shift=(-0.1, 0.0, 0.1), basis=('orders', 'instant'))
+    matrices = sweep(profits, scenarios)
+    summary = robustness(profits, matrices)
+    assert len(summary) == len(profits)
+    assert list(summary['worst']) == sorted(summary['worst'], reverse=True)
+    row = summary.set_index('name').loc['Gamma Formula']
+    values = matrices['net_profit_per_week'][:, profits['blueprint_id'].tolist().index(100)]
+    assert row['worst'] == values.min() and row['best'] == values.max()
+    assert row['profitable_share'] == pytest.approx((values > 0).mean())
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bonuses import BonusEngine
+from dependency_calculator import DependencyCalculator
+from sde_store import STORE_FILE, STORE_VERSION, SdeStore, compile_store, current_store, load_sde
+
+
+@pytest.fixture
+def tables(tiny_tables):
+    """tiny_tables plus blueprint 301, which manufactures Gamma as well, and an invention row."""
+    inv_types, industry_activity, activity_materials, activity_products = tiny_tables
+    inv_types = pd.concat([inv_types, pd.DataFrame({'typeID': [301, 302], 'typeName': ['Gamma Blueprint',
+                                                                                      'Gamma Blueprint II']})],
+                          ignore_index=True)
+    industry_activity = pd.concat([industry_activity, pd.DataFrame({
+        'typeID': [301, 301], 'activityID': [1, 8], 'time': [600, 6000]})], ignore_index=True)
+    activity_materials = pd.concat([activity_materials, pd.DataFrame({
+        'typeID': [301], 'activityID': [1], 'materialTypeID': [2], 'quantity': [7]})], ignore_index=True)
+    activity_products = pd.concat([activity_products, pd.DataFrame({
+        'typeID': [301, 301], 'activityID': [1, 8], 'productTypeID': [3, 302], 'quantity': [3, 10]})],
+        ignore_index=True)
+    return inv_types, industry_activity, activity_materials, activity_products
+
+
+@pytest.fixture
+def loader_and_store(make_sde, tables, tmp_path):
+    loader = make_sde(tables)
+    return loader, SdeStore(compile_store(str(tmp_path)))
+
+
+def test_lookups_match_the_loader(loader_and_store, tables):
+    loader, store = loader_and_store
+    inv_types, industry_activity, _, _ = tables
+    for type_id, name in zip(inv_types['typeID'], inv_types['typeName']):
+        assert store.get_type_name(type_id) == loader.get_type_name(type_id) == name
+        assert store.get_type_id(name.upper()) == loader.get_type_id(name.upper()) == type_id
+
+        expected = loader.get_blueprint_for_product(type_id)
+        actual = store.get_blueprint_for_product(type_id)
+        if expected is None:
+            assert actual is None
+        else:
+            assert actual == {key: int(expected[key]) for key in ('typeID', 'activityID', 'productTypeID', 'quantity')}
+    # Manufacturing is preferred over the reaction that also makes Gamma
+    assert store.get_blueprint_for_product(3)['typeID'] == 301
+
+    for blueprint_id, activity_id in zip(industry_activity['typeID'], industry_activity['activityID']):
+        assert list(store.iter_materials(blueprint_id, activity_id)) == \
+               list(loader.iter_materials(blueprint_id, activity_id))
+        assert store.get_production_time(blueprint_id, activity_id) == \
+               loader.get_production_time(blueprint_id, activity_id)
+    assert list(store.iter_materials(999, 1)) == [] and store.get_production_time(999, 1) == 0
+    (store_invention,), (loader_invention,) = list(store.iter_inventions()), list(loader.iter_inventions())
+    assert store_invention[:3] == loader_invention[:3] == (301, 302, 10)
+    assert np.isnan(store_invention[3]) and np.isnan(loader_invention[3])
+
+
+@pytest.mark.parametrize('with_bonuses', [False, True])
+def test_requirements_match_the_loader(loader_and_store, with_bonuses):
+    results = []
+    for sde in loader_and_store:
+        bonuses = BonusEngine(sde, levels={}, profiles={1: ('Raitaru', 'T1', 'lowsec')}) if with_bonuses else None
+        raws, components = DependencyCalculator(sde, bonuses).get_total_requirements('epsilon', 7)
+        results.append((raws, {name: component.to_dict() for name, component in components.items()}))
+    (loader_raws, loader_components), (store_raws, store_components) = results
+    assert store_raws == pytest.approx(loader_raws)
+    assert store_components.keys() == loader_components.keys()
+    for name, component in loader_components.items():
+        assert store_components[name] == pytest.approx(component)
+    assert set(loader_raws) == {'Alpha', 'Beta'}
+
+
+def test_tables_round_trip(loader_and_store):
+    _, store = loader_and_store
+    inv_types, industry_activity, activity_materials, activity_products = store.tables()
+    assert inv_types['typeID'].tolist() == [1, 2, 3, 4, 5, 100, 200, 300, 301, 302]
+    assert len(industry_activity) == 5 and len(activity_materials) == 6
+    # Invention rows are kept apart from the product table
+    assert sorted(activity_products['activityID'].unique().tolist()) == [1, 11]
+
+
+def test_load_sde_compiles_and_reuses_the_store(make_sde, tables, tmp_path):
+    make_sde(tables)
+    assert current_store(str(tmp_path)) is None
+    assert isinstance(load_sde(str(tmp_path)), SdeStore)
+    mtime = (tmp_path / STORE_FILE).stat().st_mtime_ns
+    assert isinstance(load_sde(str(tmp_path)), SdeStore)
+    assert (tmp_path / STORE_FILE).stat().st_mtime_ns == mtime
+    assert current_store(str(tmp_path)).version == STORE_VERSION
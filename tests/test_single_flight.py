@@ -0,0 +1,118 @@
+"""Two processes race a refresh behind file_lock; the fetch must run exactly once."""
+import json
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import calculator
+from esi_manager import EsiIdentity, EsiManager
+
+HUBS = [('Jita', '10000002', 60003760)]
+pytestmark = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                                reason="the workers inherit the test's patches by forking")
+
+
+def count_call(counter_path):
+    with open(counter_path, 'a') as f:
+        f.write('call\n')
+    time.sleep(0.5)  # Long enough for the other process to reach the lock
+
+
+def calls(counter_path):
+    return counter_path.read_text().count('call') if counter_path.exists() else 0
+
+
+def fake_hub_prices(counter_path):
+    def fetch(hubs):
+        count_call(counter_path)
+        frame = pd.DataFrame(np.ones((2, len(calculator.STAT_COLUMNS))), index=pd.Index([34, 35], name='type_id'),
+                             columns=pd.MultiIndex.from_product([['Jita'], calculator.STAT_COLUMNS],
+                                                                names=['hub', 'side']))
+        frame.attrs['expires'] = None
+        frame.attrs['failed_hubs'] = []
+        return frame
+    return fetch
+
+
+def race(target, *args):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(2)
+    results = context.Queue()
+
+    def run():
+        barrier.wait()
+        results.put(target(*args))
+
+    workers = [context.Process(target=run) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert all(worker.exitcode == 0 for worker in workers)
+    return [results.get(timeout=5) for _ in workers]
+
+
+def test_price_refresh_runs_once(tmp_path, monkeypatch):
+    counter = tmp_path / 'fetches'
+    monkeypatch.setattr(calculator, 'fetch_hub_prices', fake_hub_prices(counter))
+    cache_file = str(tmp_path / 'price_cache.json')
+
+    sizes = race(lambda: len(calculator.get_market_prices(HUBS, cache_file=cache_file)))
+    assert sizes == [2, 2]
+    assert calls(counter) == 1
+
+
+def test_forced_price_refresh_runs_once(tmp_path, monkeypatch):
+    counter = tmp_path / 'fetches'
+    monkeypatch.setattr(calculator, 'fetch_hub_prices', fake_hub_prices(counter))
+    cache_file = str(tmp_path / 'price_cache.json')
+    calculator.get_market_prices(HUBS, cache_file=cache_file)
+    counter.unlink()
+
+    # Both callers' prices expired; whoever gets the lock second reuses the first one's fetch
+    newer_than = time.time()
+    race(lambda: calculator.refresh_market_prices(newer_than, HUBS, cache_file=cache_file).attrs['written_at'])
+    assert calls(counter) == 1
+
+
+class FakeResponse:
+    status_code = 200
+    content = b'{}'
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'access_token': 'new-access', 'expires_in': 1200, 'refresh_token': 'new-refresh'}
+
+
+class FakeSession:
+    def __init__(self, counter_path):
+        self.counter_path = counter_path
+
+    def post(self, url, headers=None, data=None):
+        assert data['refresh_token'] == 'old-refresh'
+        count_call(self.counter_path)
+        return FakeResponse()
+
+
+def test_token_refresh_runs_once(tmp_path):
+    counter = tmp_path / 'refreshes'
+    tokens_file = tmp_path / 'tokens.json'
+    tokens_file.write_text(json.dumps({'access_token': 'old-access', 'refresh_token': 'old-refresh',
+                                       'expires_at': time.time() - 10}))
+    manager = EsiManager.__new__(EsiManager)
+    manager.client_id, manager.client_secret = 'client', 'secret'
+    manager.session = FakeSession(counter)
+
+    def refresh():
+        identity = EsiIdentity('Some Pilot', str(tokens_file))
+        identity.tokens = json.loads(tokens_file.read_text())
+        return manager._refresh_tokens(identity), identity.tokens['access_token']
+
+    assert race(refresh) == [(True, 'new-access')] * 2
+    assert calls(counter) == 1
+    assert json.loads(tokens_file.read_text())['refresh_token'] == 'new-refresh'
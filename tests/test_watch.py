@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import calculator
+import watch
+from build_cost import BuildCostModel
+from profit_engine import ProfitEngine
+from results_store import read_history
+
+
+@pytest.fixture
+def hub_prices():
+    sell = {1: 10.0, 2: 20.0, 3: 60.0, 4: 300.0}
+    buy = {1: 8.0, 2: 18.0, 3: 50.0, 4: 250.0}
+    index = pd.Index(sorted(sell), name='type_id')
+    frame = pd.DataFrame({('Jita', side): np.nan for side in calculator.STAT_COLUMNS}, index=index)
+    frame.columns.names = ['hub', 'side']
+    frame[('Jita', 'sell')] = pd.Series(sell)
+    frame[('Jita', 'buy')] = pd.Series(buy)
+    return frame
+
+
+def test_watch_writes_the_calculator_schema(tiny_tables, hub_prices, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(calculator, 'load_sde_tables', lambda: tiny_tables)
+    monkeypatch.setattr(calculator, 'get_market_prices', lambda: hub_prices)
+    calculator.main()
+    calculator_csv = pd.read_csv(calculator.OUTPUT_CSV)
+
+    inv_types, industry_activity, activity_materials, activity_products = tiny_tables
+    reactions = calculator.filter_composite_reactions(inv_types, industry_activity)
+    engine = ProfitEngine(reactions[['typeID', 'typeName']], industry_activity, activity_materials,
+                          activity_products, activity_id=11, time_multiplier=calculator.REACTION_TIME_MULTIPLIER)
+    prices = calculator.select_hub_prices(hub_prices)
+    results = engine.compute(prices, calculator.BROKER_FEE, calculator.SALES_TAX)
+    typeid_to_name = inv_types.set_index('typeID')['typeName'].to_dict()
+    watch.write_results(engine, BuildCostModel(activity_materials, activity_products), results, prices,
+                        typeid_to_name)
+
+    # Same file, same columns and values, and one history schema with the build-or-buy columns filled
+    pd.testing.assert_frame_equal(pd.read_csv(calculator.OUTPUT_CSV), calculator_csv)
+    history = read_history('reactions')
+    assert history['run'].nunique() == 2
+    columns = [set(run.dropna(axis=1, how='all').columns) for _, run in history.groupby('run')]
+    assert columns[0] == columns[1] == set(history.columns)
+    assert history['input_cost_integrated'].notna().all()
+    assert history['net_profit_integrated'].notna().all()
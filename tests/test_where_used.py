@@ -0,0 +1,49 @@
+import pandas as pd
+
+from where_used import WhereUsedIndex
+
+
+def index_for(tiny_tables, extra_materials=None, extra_products=None):
+    _, _, activity_materials, activity_products = tiny_tables
+    if extra_materials is not None:
+        activity_materials = pd.concat([activity_materials, extra_materials], ignore_index=True)
+        activity_products = pd.concat([activity_products, extra_products], ignore_index=True)
+    return WhereUsedIndex(activity_materials, activity_products)
+
+
+def test_direct_consumers(tiny_tables):
+    index = index_for(tiny_tables)
+    assert sorted(index.direct_consumers(1)) == [3, 5]
+    assert sorted(index.direct_consumers(3)) == [4]
+    assert len(index.direct_consumers(5)) == 0
+    assert len(index.direct_consumers(999)) == 0
+
+
+def test_transitive_consumers_follow_the_chain(tiny_tables):
+    index = index_for(tiny_tables)
+    assert sorted(index.transitive_consumers(2)) == [3, 4, 5]
+    assert sorted(index.transitive_consumers(3)) == [4, 5]
+    assert sorted(index.transitive_consumers(4)) == [5]
+    assert index.depends_on(5, 2)
+    assert not index.depends_on(3, 4)
+    assert not index.depends_on(999, 1)
+
+
+def test_closure_with_a_recipe_cycle(tiny_tables):
+    # Formula 400 turns 2 x Delta back into Gamma: 3 -> 4 -> 3
+    index = index_for(tiny_tables,
+                      pd.DataFrame({'typeID': [400], 'activityID': [11], 'materialTypeID': [4], 'quantity': [2]}),
+                      pd.DataFrame({'typeID': [400], 'activityID': [11], 'productTypeID': [3], 'quantity': [1]}))
+    assert sorted(index.transitive_consumers(3)) == [3, 4, 5]
+    assert sorted(index.transitive_consumers(4)) == [3, 4, 5]
+    assert sorted(index.transitive_consumers(1)) == [3, 4, 5]
+    assert index.depends_on(3, 3)
+    assert not index.depends_on(4, 5)
+
+
+def test_activities_filter(tiny_tables):
+    _, _, activity_materials, activity_products = tiny_tables
+    index = WhereUsedIndex(activity_materials, activity_products, activities=(11,))
+    # Manufacturing blueprint 300 is excluded, so nothing consumes Delta
+    assert sorted(index.transitive_consumers(1)) == [3, 4]
+    assert len(index.transitive_consumers(4)) == 0